@@ -14,6 +14,18 @@ def create_app(config_name='default'):
     # Setup logging
     setup_logging(app)
     
+    # Request metrics, exposed at /api/metrics
+    from app.services.metrics import metrics
+    metrics.init_app(app)
+    
+    # Shared model registry (lazy or loaded at startup, see MODEL_LOADING)
+    from app.services.model_registry import model_registry
+    model_registry.init_app(app)
+    
+    # Background scoring jobs (SQLite-backed, see JOBS_DIR)
+    from app.services.job_queue import job_queue
+    job_queue.init_app(app)
+    
     # Register blueprints
     from app.routes.api import api_bp
     from app.routes.dashboard import dashboard_bp
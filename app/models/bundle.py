@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import joblib
+from app.models.data_processor import DataProcessor, TARGET_COLUMN
+from app.models.flat_forest import FlatForest
+from app.models.ml_model import YieldPredictor
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+ESTIMATOR_NAME = 'model.pkl'
+ARRAYS_NAME = 'arrays'
+ONNX_NAME = 'model.onnx'
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _bundle_files(dirpath):
+    """Relative paths of every file in a bundle except the manifest, sorted"""
+    files = []
+    for root, _, names in os.walk(dirpath):
+        for name in names:
+            relative = os.path.relpath(os.path.join(root, name), dirpath)
+            if relative != MANIFEST_NAME:
+                files.append(relative.replace(os.sep, '/'))
+    return sorted(files)
+
+def save_bundle(dirpath, model, processor, metrics=None, data_hash=None, export_arrays=True, export_onnx=False):
+    """Write the estimator, scaler parameters and feature manifest as one versioned directory
+    
+    The bundle is assembled in a versioned directory next to dirpath, which
+    is a symlink atomically switched to it, so a reader never sees a partly
+    written or missing bundle. The replaced version is kept for loads still
+    reading it and removed by the next save. Returns the manifest.
+    """
+    dirpath = os.path.normpath(dirpath)
+    staging = f'{dirpath}.tmp-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    
+    joblib.dump(model.model, os.path.join(staging, ESTIMATOR_NAME))
+    if export_arrays:
+        try:
+            FlatForest.from_estimator(model.model).save(os.path.join(staging, ARRAYS_NAME))
+        except ValueError as e:
+            print(f"Skipping array export: {str(e)}")
+    if export_onnx:
+        try:
+            model.export_onnx(os.path.join(staging, ONNX_NAME), processor)
+        except (ImportError, ValueError) as e:
+            print(f"Skipping ONNX export: {str(e)}")
+    
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model_type': model.model_type,
+        'target': TARGET_COLUMN,
+        'features': processor.feature_manifest(),
+        'scaler': processor.scaler_manifest(),
+        'data_hash': data_hash,
+        'metrics': {name: float(value) for name, value in (metrics or {}).items()},
+        'calibration': model.calibration,
+        'checksums': {name: _sha256(os.path.join(staging, name)) for name in _bundle_files(staging)}
+    }
+    with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    target = f'{dirpath}.v-{_sha256(os.path.join(staging, MANIFEST_NAME))[:12]}'
+    if os.path.exists(target):
+        shutil.rmtree(staging)
+    else:
+        os.rename(staging, target)
+    
+    # Point dirpath at the new version; replacing a symlink is atomic
+    link = f'{dirpath}.link-{os.getpid()}'
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(target), link)
+    previous = os.path.realpath(dirpath)
+    if os.path.isdir(dirpath) and not os.path.islink(dirpath):
+        # A bundle written before versioned directories; missing only until the link replaces it
+        previous = os.path.realpath(f'{dirpath}.v-{os.getpid()}')
+        os.rename(dirpath, previous)
+    os.replace(link, dirpath)
+    
+    keep = (os.path.realpath(target), previous)
+    parent, prefix = os.path.split(dirpath)
+    for name in os.listdir(parent or '.'):
+        path = os.path.join(parent, name)
+        if name.startswith(prefix + '.v-') and os.path.realpath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+    return manifest
+
+def read_manifest(dirpath, verify=None):
+    """Read and validate a bundle manifest, checking files against their checksums
+    
+    ``verify`` optionally limits the checksum pass to files under the given
+    relative paths; the file listing is always checked in full.
+    """
+    manifest_path = os.path.join(dirpath, MANIFEST_NAME)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version: {manifest.get('format_version')}")
+    
+    checksums = manifest.get('checksums', {})
+    files = _bundle_files(dirpath)
+    unexpected = sorted(set(files) - set(checksums))
+    missing = sorted(set(checksums) - set(files))
+    if unexpected or missing:
+        raise ValueError(f"Bundle files do not match the manifest (missing: {missing}, unexpected: {unexpected})")
+    for name in files:
+        if verify is not None and not any(name == path or name.startswith(path + '/') for path in verify):
+            continue
+        if _sha256(os.path.join(dirpath, name)) != checksums[name]:
+            raise ValueError(f"Bundle checksum mismatch: {name}")
+    
+    # The manifest hash covers every file through the checksums, so it versions the whole bundle
+    manifest['version'] = _sha256(manifest_path)[:12]
+    return manifest
+
+def load_bundle(dirpath, prefer_arrays=True, serving=False, max_threads=1, parallel_min_rows=10000,
+                verify_onnx=False, arrays_max_rows=256):
+    """Validate a bundle once and return (model, processor, manifest)
+    
+    The processor comes back compiled from the manifest's feature recipe and
+    scaler parameters. The memory-mappable arrays are used when present and
+    prefer_arrays is set, otherwise the pickled estimator. Arrays only score
+    batches of up to arrays_max_rows rows; larger ones go to the estimator,
+    which is checked and unpickled as well. With verify_onnx the ONNX graph,
+    if the bundle has one, is checked too. manifest['path'] is the version
+    directory everything was read from.
+    """
+    # Read one version even if a save switches the link meanwhile
+    dirpath = os.path.realpath(dirpath)
+    # Only the estimator file that will be loaded needs its checksum verified
+    artifact = ARRAYS_NAME if prefer_arrays and os.path.isdir(os.path.join(dirpath, ARRAYS_NAME)) else ESTIMATOR_NAME
+    verify = [artifact]
+    if verify_onnx and os.path.exists(os.path.join(dirpath, ONNX_NAME)):
+        verify.append(ONNX_NAME)
+    manifest = read_manifest(dirpath, verify=verify)
+    processor = DataProcessor.from_manifest(manifest['features'], manifest['scaler'])
+    
+    model = YieldPredictor(model_type=manifest['model_type'])
+    model.load(os.path.join(dirpath, artifact), serving=serving, max_threads=max_threads,
+               parallel_min_rows=parallel_min_rows, version=manifest['version'])
+    model.calibration = manifest['calibration']
+    if artifact == ARRAYS_NAME:
+        model.attach_estimator(os.path.join(dirpath, ESTIMATOR_NAME), max_rows=arrays_max_rows,
+                               sha256=manifest['checksums'][ESTIMATOR_NAME])
+    
+    n_features = model.model.n_features if isinstance(model.model, FlatForest) else model.model.n_features_in_
+    if n_features != len(processor.feature_columns):
+        raise ValueError(f"Model expects {n_features} features, manifest lists {len(processor.feature_columns)}")
+    
+    manifest['path'] = dirpath
+    return model, processor, manifest
\ No newline at end of file
@@ -1,18 +1,94 @@
+import operator
+import threading
+from functools import reduce
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
+from app.models.schema import FeatureSchema
+
+# Engineered features as (name, operation, operand columns); operands are folded left to right
+ENGINEERED_FEATURES = [
+    ('temp_rainfall_interaction', 'multiply', ['temperature_avg', 'rainfall_mm']),
+    ('npk_total', 'add', ['soil_nitrogen', 'soil_phosphorus', 'soil_potassium'])
+]
+
+_SCALAR_OPERATIONS = {'multiply': operator.mul, 'add': operator.add}
+
+TARGET_COLUMN = 'yield_tons_per_hectare'
 
 class DataProcessor:
     """Handle data preprocessing and feature engineering"""
     
     def __init__(self):
         self.scaler = StandardScaler()
-        self.feature_columns = [
+        self.input_columns = [
             'temperature_avg', 'rainfall_mm', 'humidity_percent',
             'soil_ph', 'soil_nitrogen', 'soil_phosphorus', 'soil_potassium',
             'fertilizer_used_kg', 'irrigation_hours', 'area_hectares'
         ]
+        self._compiled = None
+        self._local = threading.local()
+        self._set_features(self.input_columns, ENGINEERED_FEATURES)
+    
+    def _set_features(self, input_columns, engineered_features):
+        """Set the input columns and engineered feature recipe, and everything derived from them"""
+        self.input_columns = list(input_columns)
+        self.engineered_features = [(name, operation, list(operands)) for name, operation, operands in engineered_features]
+        self.engineered_columns = [name for name, _, _ in self.engineered_features]
+        self.feature_columns = self.input_columns + self.engineered_columns
+        self.schema = FeatureSchema.from_processor(self)
+        self._compiled = None
+    
+    @classmethod
+    def from_manifest(cls, features, scaler):
+        """Build a compiled processor from a bundle manifest's feature and scaler sections
+        
+        Raises ValueError if the recipe uses unknown operations or columns, or
+        the scaler does not match the feature list.
+        """
+        processor = cls()
+        known = set(features['input_columns'])
+        for name, operation, operands in features['engineered']:
+            if operation not in _SCALAR_OPERATIONS:
+                raise ValueError(f"Unknown feature operation in manifest: {operation}")
+            missing = [operand for operand in operands if operand not in known]
+            if missing:
+                raise ValueError(f"Engineered feature {name} uses unknown columns: {', '.join(missing)}")
+            known.add(name)
+        processor._set_features(features['input_columns'], features['engineered'])
+        if processor.feature_columns != features['feature_columns']:
+            raise ValueError("Manifest feature order does not match its input columns and recipe")
+        
+        mean = np.asarray(scaler['mean'], dtype=np.float64)
+        scale = np.asarray(scaler['scale'], dtype=np.float64)
+        if mean.shape != (len(processor.feature_columns),) or scale.shape != mean.shape:
+            raise ValueError(f"Scaler has {len(mean)} features, manifest lists {len(processor.feature_columns)}")
+        processor.scaler = StandardScaler()
+        processor.scaler.mean_, processor.scaler.scale_, processor.scaler.var_ = mean, scale, scale ** 2
+        processor.scaler.n_features_in_ = len(mean)
+        processor.scaler.feature_names_in_ = np.array(processor.feature_columns, dtype=object)
+        processor.scaler.n_samples_seen_ = scaler.get('n_samples_seen', 0)
+        return processor.compile()
+    
+    def feature_manifest(self):
+        """Ordered feature list and engineered recipe, as stored in a bundle manifest"""
+        return {
+            'input_columns': list(self.input_columns),
+            'engineered': [[name, operation, list(operands)] for name, operation, operands in self.engineered_features],
+            'feature_columns': list(self.feature_columns)
+        }
+    
+    def scaler_manifest(self):
+        """Fitted scaler parameters, as stored in a bundle manifest"""
+        n_features = len(self.feature_columns)
+        mean = self.scaler.mean_ if self.scaler.with_mean else np.zeros(n_features)
+        scale = self.scaler.scale_ if self.scaler.with_std else np.ones(n_features)
+        return {
+            'mean': [float(value) for value in mean],
+            'scale': [float(value) for value in scale],
+            'n_samples_seen': int(np.max(self.scaler.n_samples_seen_))
+        }
     
     def load_data(self, filepath):
         """Load data from CSV file"""
@@ -28,34 +104,167 @@ class DataProcessor:
         df = df.fillna(df.mean())
         
         # Feature engineering
-        df['temp_rainfall_interaction'] = df['temperature_avg'] * df['rainfall_mm']
-        df['npk_total'] = df['soil_nitrogen'] + df['soil_phosphorus'] + df['soil_potassium']
-        
-        # Update feature columns
-        self.feature_columns.extend(['temp_rainfall_interaction', 'npk_total'])
+        self._add_engineered_columns(df)
         
         X = df[self.feature_columns]
         
         if fit:
             X_scaled = self.scaler.fit_transform(X)
+            self._compiled = None
         else:
             X_scaled = self.scaler.transform(X)
         
-        return X_scaled, df['yield_tons_per_hectare'] if 'yield_tons_per_hectare' in df.columns else None
+        return X_scaled, df[TARGET_COLUMN] if TARGET_COLUMN in df.columns else None
+    
+    def preprocess_batches(self, make_batches, dtype=np.float32, block_rows=100000):
+        """Fit the scaler and build the training matrix from a stream of DataFrame chunks
+        
+        ``make_batches`` is called once per pass and must return a fresh iterator of
+        chunks. The first pass computes the fill values, the second fits the scaler
+        with ``partial_fit`` while copying the features into a single preallocated
+        matrix, which is then scaled in place. float32 is safe for the tree models
+        because sklearn's trees split on float32 features internally; the target
+        stays float64.
+        """
+        columns = self.input_columns + [TARGET_COLUMN]
+        
+        # Pass 1: global column means for missing values
+        sums = pd.Series(0.0, index=columns)
+        counts = pd.Series(0, index=columns)
+        n_rows = 0
+        for batch in make_batches():
+            sums += batch[columns].sum()
+            counts += batch[columns].count()
+            n_rows += len(batch)
+        if n_rows == 0:
+            raise ValueError("No rows to train on")
+        fill_values = sums / counts
+        
+        # Pass 2: fit the scaler incrementally and fill the preallocated matrix
+        X = np.empty((n_rows, len(self.feature_columns)), dtype=dtype)
+        y = np.empty(n_rows, dtype=np.float64)
+        self.scaler = StandardScaler()
+        self._compiled = None
+        start = 0
+        for batch in make_batches():
+            batch = batch[columns].fillna(fill_values)
+            self._add_engineered_columns(batch)
+            features = batch[self.feature_columns]
+            self.scaler.partial_fit(features)
+            
+            stop = start + len(batch)
+            X[start:stop] = features.to_numpy(dtype=np.float64)
+            y[start:stop] = batch[TARGET_COLUMN].to_numpy(dtype=np.float64)
+            start = stop
+        
+        mean, scale = self.scaler.mean_, self.scaler.scale_
+        for block_start in range(0, n_rows, block_rows):
+            block = X[block_start:block_start + block_rows].astype(np.float64)
+            block -= mean
+            block /= scale
+            X[block_start:block_start + block_rows] = block
+        
+        return X, y
+    
+    def compile(self):
+        """Capture the fitted scaler and feature recipe as flat arrays for fast inference"""
+        scaler = self.scaler
+        n_features = len(self.feature_columns)
+        column_index = {name: j for j, name in enumerate(self.feature_columns)}
+        
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        if len(mean) != n_features:
+            raise ValueError(f"Scaler expects {len(mean)} features, recipe has {n_features}")
+        
+        recipe = [
+            (column_index[name], operation, np.array([column_index[c] for c in operands], dtype=np.intp))
+            for name, operation, operands in self.engineered_features
+        ]
+        
+        self._compiled = {
+            'mean': np.ascontiguousarray(mean, dtype=np.float64),
+            'scale': np.ascontiguousarray(scale, dtype=np.float64),
+            'recipe': recipe
+        }
+        return self
+    
+    @property
+    def is_compiled(self):
+        """Whether the pandas-free inference path is available"""
+        return self._compiled is not None
     
     def prepare_input(self, input_data):
         """Prepare input data for prediction"""
+        if self._compiled is not None:
+            return self._prepare_input_compiled(input_data)
+        
         df = pd.DataFrame([input_data])
         
         # Feature engineering
-        df['temp_rainfall_interaction'] = df['temperature_avg'] * df['rainfall_mm']
-        df['npk_total'] = df['soil_nitrogen'] + df['soil_phosphorus'] + df['soil_potassium']
+        self._add_engineered_columns(df)
         
         X = df[self.feature_columns]
         X_scaled = self.scaler.transform(X)
         
         return X_scaled
     
+    def raw_input(self, input_data):
+        """Single record as a (1, n_inputs) matrix of its input columns, without engineering or scaling"""
+        return np.array([[float(input_data[column]) for column in self.input_columns]])
+    
+    def _prepare_input_compiled(self, input_data):
+        """Prepare a single record without building a DataFrame"""
+        compiled = self._compiled
+        values = [float(input_data[column]) for column in self.input_columns]
+        for _, operation, operands in compiled['recipe']:
+            values.append(reduce(_SCALAR_OPERATIONS[operation], [values[j] for j in operands]))
+        
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty(len(self.feature_columns), dtype=np.float64)
+        buffer[:] = values
+        
+        X_scaled = (buffer - compiled['mean']) / compiled['scale']
+        return X_scaled.reshape(1, -1)
+    
+    def records_to_matrix(self, records):
+        """Validate a batch of input records and stack them into a raw feature matrix
+        
+        Returns the matrix (one row per record, ``input_columns`` order), a boolean
+        mask of the rows that passed validation, a dict of row index -> error and
+        the validated fields of each record (None for invalid rows).
+        """
+        return self.schema.validate_batch(records)
+    
+    def add_engineered_features(self, X_raw):
+        """Append the engineered feature columns to a raw input matrix"""
+        X = np.empty((X_raw.shape[0], len(self.feature_columns)), dtype=np.float64)
+        X[:, :X_raw.shape[1]] = X_raw
+        
+        column_index = {name: j for j, name in enumerate(self.feature_columns)}
+        for name, operation, operands in self.engineered_features:
+            ufunc = getattr(np, operation)
+            X[:, column_index[name]] = reduce(ufunc, [X[:, column_index[c]] for c in operands])
+        
+        return X
+    
+    def prepare_batch(self, X_raw):
+        """Prepare a raw input matrix for prediction"""
+        X = self.add_engineered_features(X_raw)
+        
+        if self._compiled is not None:
+            X -= self._compiled['mean']
+            X /= self._compiled['scale']
+            return X
+        
+        return self.scaler.transform(pd.DataFrame(X, columns=self.feature_columns))
+    
     def split_data(self, X, y, test_size=0.2, random_state=42):
         """Split data into train and test sets"""
-        return train_test_split(X, y, test_size=test_size, random_state=random_state)
\ No newline at end of file
+        return train_test_split(X, y, test_size=test_size, random_state=random_state)
+    
+    def _add_engineered_columns(self, df):
+        """Add the engineered feature columns to a DataFrame in place"""
+        for name, operation, operands in self.engineered_features:
+            df[name] = reduce(_SCALAR_OPERATIONS[operation], [df[column] for column in operands])
\ No newline at end of file
@@ -0,0 +1,190 @@
+import os
+import json
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor
+
+FORMAT_VERSION = 2
+ARRAY_NAMES = ('feature', 'threshold', 'children', 'value', 'roots', 'depths')
+
+# Upper bound on rows x trees evaluated together, to keep the node index matrix small
+MAX_BLOCK_NODES = 1 << 18
+
+# Same bound when leaves come from sklearn's apply, whose per-call dispatch over every tree favours large blocks
+MAX_APPLY_BLOCK_NODES = 1 << 22
+
+def _row_quantiles(values, quantiles):
+    """Per-row quantiles with linear interpolation, as np.quantile(values, quantiles, axis=1).T"""
+    positions = np.asarray(quantiles, dtype=np.float64) * (values.shape[1] - 1)
+    below = np.floor(positions).astype(np.intp)
+    above = np.minimum(below + 1, values.shape[1] - 1)
+    weight = positions - below
+    # Only the order statistics being interpolated need to be in place
+    values = np.partition(values, np.unique(np.concatenate([below, above])), axis=1)
+    return values[:, below] * (1 - weight) + values[:, above] * weight
+
+class FlatForest:
+    """Tree ensemble flattened into contiguous node arrays
+    
+    All trees share one set of node arrays indexed globally; the children of
+    node i are stored at children[2 * i] (left) and children[2 * i + 1]
+    (right). Leaves point to themselves, so every tree can be advanced in
+    lockstep for a fixed number of levels without checking which rows have
+    already reached a leaf. Inputs must be finite, as with sklearn. The
+    arrays are written as plain .npy files and can be memory-mapped, letting
+    every worker on a host share the same read-only pages.
+    """
+    
+    def __init__(self, arrays, n_features, aggregation='mean', offset=0.0, learning_rate=1.0):
+        for name in ARRAY_NAMES:
+            # Plain ndarray views, so indexing a memmap does not go through np.memmap
+            setattr(self, name, np.asarray(arrays[name]))
+        self.n_features = n_features
+        self.aggregation = aggregation
+        self.offset = offset
+        self.learning_rate = learning_rate
+        self.max_depth = int(self.depths.max()) if len(self.depths) else 0
+    
+    @property
+    def n_trees(self):
+        return len(self.roots)
+    
+    @classmethod
+    def from_estimator(cls, estimator):
+        """Flatten a fitted forest or gradient boosting regressor"""
+        if isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor)):
+            trees = [tree.tree_ for tree in estimator.estimators_]
+            options = {'aggregation': 'mean'}
+        elif isinstance(estimator, GradientBoostingRegressor):
+            if not hasattr(estimator.init_, 'constant_'):
+                raise ValueError("Only GradientBoostingRegressor with a constant init estimator can be flattened")
+            trees = [tree.tree_ for tree in estimator.estimators_[:, 0]]
+            options = {
+                'aggregation': 'sum',
+                'offset': float(np.ravel(estimator.init_.constant_)[0]),
+                'learning_rate': float(estimator.learning_rate)
+            }
+        else:
+            raise ValueError(f"Cannot flatten estimator of type {type(estimator).__name__}")
+        
+        features, thresholds, children, values, roots, depths = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([
+                np.where(is_leaf, node_ids, tree.children_left),
+                np.where(is_leaf, node_ids, tree.children_right)
+            ]).ravel() + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            offset += tree.node_count
+        
+        arrays = {
+            'feature': np.concatenate(features).astype(np.intp),
+            'threshold': np.concatenate(thresholds).astype(np.float64),
+            'children': np.concatenate(children).astype(np.intp),
+            'value': np.concatenate(values).astype(np.float64),
+            'roots': np.array(roots, dtype=np.intp),
+            'depths': np.array(depths, dtype=np.intp)
+        }
+        return cls(arrays, n_features=int(estimator.n_features_in_), **options)
+    
+    def predict(self, X):
+        """Predict by advancing all trees one level at a time for a block of rows"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X has shape {X.shape}, expected (n_samples, {self.n_features})")
+        
+        totals = np.empty(X.shape[0], dtype=np.float64)
+        block_rows = max(1, MAX_BLOCK_NODES // self.n_trees)
+        for start in range(0, X.shape[0], block_rows):
+            block = X[start:start + block_rows]
+            totals[start:start + len(block)] = self._leaf_values(block).sum(axis=1)
+        
+        return self._aggregate(totals)
+    
+    def predict_interval(self, X, quantiles, apply=None):
+        """Predictions plus per-row quantiles of the individual tree outputs, in one pass
+        
+        Only meaningful for averaging forests. ``apply`` may be the source
+        estimator's apply method, which finds the leaves faster than the
+        level-by-level traversal for large blocks. Returns the predictions
+        and an (n_samples, len(quantiles)) array.
+        """
+        if self.aggregation != 'mean':
+            raise ValueError("Tree output quantiles need an averaging forest")
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X has shape {X.shape}, expected (n_samples, {self.n_features})")
+        
+        predictions = np.empty(X.shape[0], dtype=np.float64)
+        bounds = np.empty((X.shape[0], len(quantiles)), dtype=np.float64)
+        block_rows = max(1, (MAX_BLOCK_NODES if apply is None else MAX_APPLY_BLOCK_NODES) // self.n_trees)
+        for start in range(0, X.shape[0], block_rows):
+            block = X[start:start + block_rows]
+            # Local leaf ids from apply map to global ones through the tree roots
+            leaves = self.value[apply(block) + self.roots] if apply is not None else self._leaf_values(block)
+            predictions[start:start + len(block)] = self._aggregate(leaves.sum(axis=1))
+            bounds[start:start + len(block)] = _row_quantiles(leaves, quantiles)
+        
+        return predictions, bounds
+    
+    def _leaf_values(self, X):
+        """Return the (n_samples, n_trees) matrix of leaf values reached by each row"""
+        n_samples = X.shape[0]
+        X_flat = X.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.intp) * self.n_features)[:, np.newaxis]
+        
+        node = np.broadcast_to(self.roots, (n_samples, self.n_trees))
+        for _ in range(self.max_depth):
+            go_right = X_flat[row_offsets + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + go_right]
+        
+        return self.value[node]
+    
+    def _aggregate(self, total):
+        """Combine summed tree outputs the way the source estimator does"""
+        if self.aggregation == 'mean':
+            return total / self.n_trees
+        return self.offset + self.learning_rate * total
+    
+    def save(self, dirpath):
+        """Write the node arrays as uncompressed .npy files plus a metadata file"""
+        os.makedirs(dirpath, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(dirpath, f'{name}.npy'), getattr(self, name))
+        
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'n_features': self.n_features,
+            'n_trees': self.n_trees,
+            'aggregation': self.aggregation,
+            'offset': self.offset,
+            'learning_rate': self.learning_rate
+        }
+        with open(os.path.join(dirpath, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+    
+    @classmethod
+    def load(cls, dirpath, mmap_mode='r'):
+        """Load node arrays, memory-mapped read-only by default"""
+        with open(os.path.join(dirpath, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest format version: {meta.get('format_version')}")
+        
+        arrays = {
+            name: np.load(os.path.join(dirpath, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES
+        }
+        return cls(
+            arrays,
+            n_features=meta['n_features'],
+            aggregation=meta['aggregation'],
+            offset=meta['offset'],
+            learning_rate=meta['learning_rate']
+        )
\ No newline at end of file
@@ -1,47 +1,111 @@
+import os
+import json
+import math
+import hashlib
 import joblib
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.model_selection import cross_val_score
+from app.models.flat_forest import FlatForest
+from app.models.onnx_model import export_onnx
+
+# Estimator class and default hyperparameters for each model type
+MODEL_CLASSES = {
+    'random_forest': RandomForestRegressor,
+    'gradient_boosting': GradientBoostingRegressor,
+    'hist_gradient_boosting': HistGradientBoostingRegressor
+}
+
+DEFAULT_PARAMS = {
+    'random_forest': {
+        'n_estimators': 200,
+        'max_depth': 15,
+        'min_samples_split': 5,
+        'min_samples_leaf': 2,
+        'random_state': 42,
+        'n_jobs': -1
+    },
+    'gradient_boosting': {
+        'n_estimators': 200,
+        'learning_rate': 0.1,
+        'max_depth': 5,
+        'random_state': 42
+    },
+    'hist_gradient_boosting': {
+        'max_iter': 200,
+        'learning_rate': 0.1,
+        'max_leaf_nodes': 31,
+        'min_samples_leaf': 20,
+        'early_stopping': False,
+        'random_state': 42
+    }
+}
+
+# Coverage levels of the conformal residual table stored by calibrate
+CALIBRATION_LEVELS = (0.5, 0.8, 0.9, 0.95, 0.99)
+
+def calibration_path(path):
+    """Sidecar file holding the conformal residual table of a model artifact"""
+    return os.path.normpath(path) + '.intervals.json'
+
+def artifact_digest(path, length=12):
+    """Content hash of a model artifact file or array directory"""
+    digest = hashlib.sha256()
+    paths = [path]
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    
+    for filepath in paths:
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:length]
 
 class YieldPredictor:
     """Machine Learning model for yield prediction"""
     
-    def __init__(self, model_type='random_forest'):
+    def __init__(self, model_type='random_forest', params=None):
         self.model_type = model_type
+        self.params = params or {}
         self.model = self._initialize_model()
         self.is_trained = False
+        self.version = None
+        self.evaluator = None
+        self.compiled_max_rows = None
+        self.calibration = None
+        self._tree_outputs = None
+        self.max_threads = 1
+        self.parallel_min_rows = None
+        self._executor = None
+        self.estimator_path = None
+        self._estimator = None
     
     def _initialize_model(self):
-        """Initialize the ML model"""
-        if self.model_type == 'random_forest':
-            return RandomForestRegressor(
-                n_estimators=200,
-                max_depth=15,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                random_state=42,
-                n_jobs=-1
-            )
-        elif self.model_type == 'gradient_boosting':
-            return GradientBoostingRegressor(
-                n_estimators=200,
-                learning_rate=0.1,
-                max_depth=5,
-                random_state=42
-            )
-        else:
+        """Initialize the ML model, overriding the defaults with self.params"""
+        if self.model_type not in MODEL_CLASSES:
             raise ValueError(f"Unknown model type: {self.model_type}")
+        
+        params = dict(DEFAULT_PARAMS[self.model_type], **self.params)
+        return MODEL_CLASSES[self.model_type](**params)
     
     def train(self, X_train, y_train, X_test=None, y_test=None):
         """Train the model"""
         self.model.fit(X_train, y_train)
         self.is_trained = True
+        self.version = None
+        self.evaluator = None
+        self.calibration = None
+        self._tree_outputs = None
         
-        # Evaluate if test data provided
+        # Evaluate if test data provided; held-out residuals also calibrate the intervals
         metrics = {}
         if X_test is not None and y_test is not None:
             metrics = self.evaluate(X_test, y_test)
+            self.calibrate(X_test, y_test)
         
         return metrics
     
@@ -50,9 +114,163 @@ class YieldPredictor:
         if not self.is_trained:
             raise Exception("Model not trained yet!")
         
-        predictions = self.model.predict(X)
+        if self._executor is not None and len(X) >= self.parallel_min_rows:
+            return np.concatenate(self._map_chunks(self._predict_rows, X))
+        
+        predictions = self._predict_rows(X)
         return predictions
     
+    def _predict_rows(self, X):
+        """Score rows with the compiled evaluator when available and worthwhile"""
+        if self.evaluator is not None and len(X) <= self.compiled_max_rows:
+            return self.evaluator.predict(X)
+        return self._batch_model(len(X)).predict(X)
+    
+    def _batch_model(self, n_rows):
+        """Model for n_rows rows: the attached estimator for large batches behind memory-mapped arrays"""
+        if self._estimator is None or n_rows <= self.compiled_max_rows:
+            return self.model
+        return self._estimator
+    
+    def _map_chunks(self, function, X):
+        """Apply function to row chunks of a large batch on the bounded serving thread pool"""
+        chunks = np.array_split(X, self.max_threads)
+        executor = self._executor
+        if executor is not None:
+            try:
+                return list(executor.map(function, chunks))
+            except RuntimeError:
+                # close() shut the pool down after this call checked it
+                pass
+        return [function(chunk) for chunk in chunks]
+    
+    def calibrate(self, X_cal, y_cal):
+        """Store split-conformal residual quantiles from data not used for training
+        
+        For each level in CALIBRATION_LEVELS the table holds the absolute
+        residual that at least that share of new predictions stays within.
+        """
+        residuals = np.sort(np.abs(np.asarray(y_cal, dtype=np.float64) - self.predict(X_cal)))
+        n = len(residuals)
+        self.calibration = {
+            'levels': list(CALIBRATION_LEVELS),
+            'half_widths': [float(residuals[min(n - 1, math.ceil((n + 1) * level) - 1)]) for level in CALIBRATION_LEVELS],
+            'n_samples': n
+        }
+        return self.calibration
+    
+    def predict_interval(self, X, coverage=0.9):
+        """Predictions with lower and upper bounds, computed in the same pass
+        
+        Averaging forests use quantiles of the individual tree outputs; other
+        models use the calibrated conformal residual table, and uncalibrated
+        ones a +/-10% band. Returns (predictions, lower, upper, method).
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet!")
+        
+        if self._tree_output_forest() is not None:
+            quantiles = ((1 - coverage) / 2, (1 + coverage) / 2)
+            if self._executor is not None and len(X) >= self.parallel_min_rows:
+                parts = self._map_chunks(lambda chunk: self._interval_rows(chunk, quantiles), X)
+                predictions = np.concatenate([part[0] for part in parts])
+                bounds = np.concatenate([part[1] for part in parts])
+            else:
+                predictions, bounds = self._interval_rows(X, quantiles)
+            return predictions, bounds[:, 0], bounds[:, 1], 'tree_quantiles'
+        
+        predictions = self.predict(X)
+        if self.calibration is not None:
+            half_width = np.interp(coverage, self.calibration['levels'], self.calibration['half_widths'])
+            return predictions, predictions - half_width, predictions + half_width, 'conformal'
+        return predictions, predictions * 0.9, predictions * 1.1, 'heuristic'
+    
+    def _tree_output_forest(self):
+        """FlatForest giving per-tree outputs for averaging forests, else None"""
+        if isinstance(self.model, FlatForest):
+            return self.model if self.model.aggregation == 'mean' else None
+        if not isinstance(self.model, RandomForestRegressor):
+            return None
+        if self._tree_outputs is None:
+            self._tree_outputs = self.evaluator or FlatForest.from_estimator(self.model)
+        return self._tree_outputs
+    
+    def _interval_rows(self, X, quantiles):
+        """Per-tree quantiles through the flat traversal for small batches, sklearn's apply otherwise"""
+        forest = self._tree_output_forest()
+        if self.evaluator is not None and len(X) <= self.compiled_max_rows:
+            return forest.predict_interval(X, quantiles)
+        estimator = self._batch_model(len(X))
+        if estimator is forest:
+            return forest.predict_interval(X, quantiles)
+        return forest.predict_interval(X, quantiles, apply=estimator.apply)
+    
+    def compile(self, max_rows=256):
+        """Export the trained trees to a vectorized FlatForest evaluator
+        
+        The evaluator is used for batches of up to max_rows rows, where
+        sklearn's per-tree dispatch dominates; larger batches stay on the
+        estimator's own compiled traversal, which is faster there.
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet!")
+        
+        if not isinstance(self.model, FlatForest):
+            self.evaluator = FlatForest.from_estimator(self.model)
+            self.compiled_max_rows = max_rows
+            self._tree_outputs = None
+        return self
+    
+    def attach_estimator(self, filepath, max_rows=256, sha256=None):
+        """Score batches of more than max_rows rows with the pickled estimator behind memory-mapped arrays
+        
+        The flattened arrays share pages across workers but, like the compiled
+        evaluator, are slower than sklearn on large batches. The estimator is
+        unpickled here, after checking sha256 if given, so a later retrain
+        replacing the file cannot break a model that is still serving.
+        """
+        if not isinstance(self.model, FlatForest):
+            raise ValueError("An estimator can only be attached to memory-mapped arrays")
+        if sha256 is not None and artifact_digest(filepath, length=None) != sha256:
+            raise ValueError(f"Estimator checksum mismatch: {filepath}")
+        estimator = joblib.load(filepath)
+        if hasattr(estimator, 'get_params') and 'n_jobs' in estimator.get_params():
+            estimator.set_params(n_jobs=1)
+        self.estimator_path = filepath
+        self._estimator = estimator
+        self.compiled_max_rows = max_rows
+        return self
+    
+    def configure_serving(self, max_threads=1, parallel_min_rows=10000):
+        """Reset estimator parallelism for inference
+        
+        Prediction runs single-threaded; batches of at least parallel_min_rows
+        rows are split across a pool of at most max_threads threads instead of
+        the estimator's own joblib pool.
+        """
+        if hasattr(self.model, 'get_params') and 'n_jobs' in self.model.get_params():
+            self.model.set_params(n_jobs=1)
+        
+        self.close()
+        
+        self.max_threads = max(1, int(max_threads))
+        self.parallel_min_rows = parallel_min_rows
+        if self.max_threads > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_threads,
+                thread_name_prefix='yield-predictor'
+            )
+    
+    def close(self):
+        """Stop the serving thread pool once the chunks already submitted are done
+        
+        Later large batches, e.g. from requests still holding a replaced
+        model, run on the calling thread.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
     def evaluate(self, X_test, y_test):
         """Evaluate model performance"""
         predictions = self.predict(X_test)
@@ -66,12 +284,18 @@ class YieldPredictor:
         
         return metrics
     
-    def cross_validate(self, X, y, cv=5):
-        """Perform cross-validation"""
+    def cross_validate(self, X, y, cv=5, n_jobs=None):
+        """Perform cross-validation, running folds in n_jobs worker processes"""
+        estimator = self.model
+        if n_jobs not in (None, 1) and 'n_jobs' in estimator.get_params():
+            # Parallelize across folds, not within each fit, to avoid oversubscription
+            estimator = clone(estimator).set_params(n_jobs=1)
+        
         scores = cross_val_score(
-            self.model, X, y,
+            estimator, X, y,
             cv=cv,
-            scoring='neg_mean_squared_error'
+            scoring='neg_mean_squared_error',
+            n_jobs=n_jobs
         )
         rmse_scores = np.sqrt(-scores)
         
@@ -80,17 +304,70 @@ class YieldPredictor:
             'cv_rmse_std': rmse_scores.std()
         }
     
-    def get_feature_importance(self):
-        """Get feature importance"""
+    def get_feature_importance(self, X=None, y=None, n_repeats=5):
+        """Get feature importance
+        
+        Models without impurity-based importances (hist_gradient_boosting) fall
+        back to permutation importance on X, y when they are given.
+        """
         if hasattr(self.model, 'feature_importances_'):
             return self.model.feature_importances_
+        if X is not None and y is not None:
+            result = permutation_importance(
+                self.model, X, y,
+                scoring='neg_mean_squared_error',
+                n_repeats=n_repeats,
+                random_state=42
+            )
+            return result.importances_mean
         return None
     
     def save(self, filepath):
         """Save model to disk"""
         joblib.dump(self.model, filepath)
+        self._save_calibration(filepath)
+    
+    def save_arrays(self, dirpath):
+        """Save the trees as a memory-mappable array directory"""
+        FlatForest.from_estimator(self.model).save(dirpath)
+        self._save_calibration(dirpath)
     
-    def load(self, filepath):
-        """Load model from disk"""
-        self.model = joblib.load(filepath)
-        self.is_trained = True
\ No newline at end of file
+    def export_onnx(self, filepath, processor):
+        """Write the processor's feature engineering and scaler plus the estimator as one ONNX graph
+        
+        Requires skl2onnx; raises ValueError for models it cannot convert.
+        """
+        if not self.is_trained or isinstance(self.model, FlatForest):
+            raise ValueError("ONNX export needs a trained sklearn estimator")
+        with open(filepath, 'wb') as f:
+            f.write(export_onnx(self.model, processor).SerializeToString())
+    
+    def _save_calibration(self, path):
+        if self.calibration is not None:
+            with open(calibration_path(path), 'w') as f:
+                json.dump(self.calibration, f, indent=2)
+    
+    def load(self, filepath, serving=False, max_threads=1, parallel_min_rows=10000, version=None):
+        """Load model from disk, optionally configured for serving
+        
+        A directory written by save_arrays is memory-mapped read-only instead
+        of being unpickled. The version defaults to a digest of the artifact.
+        """
+        if os.path.isdir(filepath):
+            self.model = FlatForest.load(filepath, mmap_mode='r')
+        else:
+            self.model = joblib.load(filepath)
+        self.is_trained = True
+        self.version = version or artifact_digest(filepath)
+        self.evaluator = None
+        self.compiled_max_rows = None
+        self.estimator_path = None
+        self._estimator = None
+        self._tree_outputs = None
+        self.calibration = None
+        if os.path.exists(calibration_path(filepath)):
+            with open(calibration_path(filepath)) as f:
+                self.calibration = json.load(f)
+        
+        if serving:
+            self.configure_serving(max_threads, parallel_min_rows)
\ No newline at end of file
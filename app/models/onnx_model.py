@@ -0,0 +1,188 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+from app.models.flat_forest import _row_quantiles
+
+try:
+    import onnx
+    from onnx import TensorProto, compose, helper, numpy_helper
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:  # pragma: no cover - skl2onnx is optional
+    onnx = None
+
+try:
+    import onnxruntime
+except ImportError:  # pragma: no cover - onnxruntime is optional
+    onnxruntime = None
+
+# Opsets of the exported graph; the tree ensemble operator lives in the ai.onnx.ml domain
+TARGET_OPSET = {'': 15, 'ai.onnx.ml': 3}
+
+INPUT_NAME = 'X'
+# Averaging forests output every tree's value so intervals can use their quantiles
+TREE_OUTPUTS_NAME = 'tree_outputs'
+PREDICTIONS_NAME = 'predictions'
+
+_ONNX_OPERATIONS = {'multiply': 'Mul', 'add': 'Add'}
+
+def onnx_export_available():
+    """Whether skl2onnx and onnx are installed"""
+    return onnx is not None
+
+def onnx_runtime_available():
+    """Whether onnxruntime is installed"""
+    return onnxruntime is not None
+
+def _preprocessing_graph(processor, output_name, opset_imports, ir_version):
+    """Engineered features and scaling as ONNX nodes, from raw float64 inputs to float32 features
+    
+    Arithmetic runs in float64 like the numpy path; the result is cast to
+    float32, which is what sklearn's trees compare against.
+    """
+    nodes, initializers = [], []
+    column = {name: j for j, name in enumerate(processor.input_columns)}
+    outputs = [INPUT_NAME]
+    for name, operation, operands in processor.engineered_features:
+        inputs = []
+        for operand in operands:
+            if operand in column:
+                index_name = f'{name}.{operand}.index'
+                initializers.append(numpy_helper.from_array(np.array([column[operand]], dtype=np.int64), index_name))
+                nodes.append(helper.make_node('Gather', [INPUT_NAME, index_name], [f'{name}.{operand}'], axis=1))
+                inputs.append(f'{name}.{operand}')
+            else:
+                inputs.append(operand)
+        # Fold operands left to right, as the numpy and scalar paths do
+        result = inputs[0]
+        for i, operand in enumerate(inputs[1:]):
+            step = name if i == len(inputs) - 2 else f'{name}.{i}'
+            nodes.append(helper.make_node(_ONNX_OPERATIONS[operation], [result, operand], [step]))
+            result = step
+        outputs.append(name)
+    
+    scaler = processor.scaler_manifest()
+    initializers.append(numpy_helper.from_array(np.array(scaler['mean'], dtype=np.float64), 'scaler.mean'))
+    initializers.append(numpy_helper.from_array(np.array(scaler['scale'], dtype=np.float64), 'scaler.scale'))
+    nodes += [
+        helper.make_node('Concat', outputs, ['features'], axis=1),
+        helper.make_node('Sub', ['features', 'scaler.mean'], ['features.centered']),
+        helper.make_node('Div', ['features.centered', 'scaler.scale'], ['features.scaled']),
+        helper.make_node('Cast', ['features.scaled'], [output_name], to=TensorProto.FLOAT)
+    ]
+    
+    graph = helper.make_graph(
+        nodes, 'preprocessing',
+        [helper.make_tensor_value_info(INPUT_NAME, TensorProto.DOUBLE, [None, len(processor.input_columns)])],
+        [helper.make_tensor_value_info(output_name, TensorProto.FLOAT, [None, len(processor.feature_columns)])],
+        initializers
+    )
+    return helper.make_model(graph, opset_imports=opset_imports, ir_version=ir_version)
+
+def _split_tree_outputs(model, estimator):
+    """Make an averaging forest's tree ensemble emit one target per tree instead of their mean"""
+    node = next(node for node in model.graph.node if node.op_type == 'TreeEnsembleRegressor')
+    attributes = {attribute.name: attribute for attribute in node.attribute}
+    
+    # Leaf values straight from the trees, rather than skl2onnx's pre-divided weights
+    tree_ids = list(attributes['target_treeids'].ints)
+    node_ids = list(attributes['target_nodeids'].ints)
+    weights = [float(estimator.estimators_[tree].tree_.value[leaf, 0, 0]) for tree, leaf in zip(tree_ids, node_ids)]
+    
+    attributes['target_ids'].ints[:] = tree_ids
+    attributes['target_weights'].floats[:] = weights
+    attributes['n_targets'].i = len(estimator.estimators_)
+    for name in ('base_values', 'aggregate_function'):
+        if name in attributes:
+            node.attribute.remove(attributes[name])
+    node.attribute.append(helper.make_attribute('aggregate_function', 'SUM'))
+
+def export_onnx(estimator, processor):
+    """Convert a fitted estimator plus the processor's feature engineering and scaler into one graph
+    
+    The graph takes raw input columns as float64 and outputs either the
+    per-tree values (averaging forests) or the predictions.
+    """
+    if onnx is None:
+        raise ImportError("skl2onnx is required for ONNX export")
+    if not hasattr(processor.scaler, 'mean_'):
+        raise ValueError("The processor's scaler must be fitted before export")
+    
+    n_features = len(processor.feature_columns)
+    if estimator.n_features_in_ != n_features:
+        raise ValueError(f"Estimator expects {estimator.n_features_in_} features, processor has {n_features}")
+    
+    try:
+        trees = convert_sklearn(
+            estimator,
+            initial_types=[('features', FloatTensorType([None, n_features]))],
+            target_opset=TARGET_OPSET
+        )
+    except Exception as e:
+        raise ValueError(f"skl2onnx cannot convert {type(estimator).__name__}") from e
+    output_name, n_outputs = PREDICTIONS_NAME, 1
+    if isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor)):
+        _split_tree_outputs(trees, estimator)
+        output_name, n_outputs = TREE_OUTPUTS_NAME, len(estimator.estimators_)
+    
+    trees = compose.add_prefix(trees, 'model.')
+    producer = trees.graph.output[0].name
+    for node in trees.graph.node:
+        node.output[:] = [output_name if name == producer else name for name in node.output]
+    del trees.graph.output[:]
+    trees.graph.output.append(helper.make_tensor_value_info(output_name, TensorProto.FLOAT, [None, n_outputs]))
+    
+    preprocessing = _preprocessing_graph(processor, 'model.features', trees.opset_import, trees.ir_version)
+    model = compose.merge_models(preprocessing, trees, io_map=[('model.features', 'model.features')])
+    onnx.checker.check_model(model)
+    return model
+
+class OnnxPredictor:
+    """Exported graph run through onnxruntime's CPU provider
+    
+    Takes raw input rows (the processor's input columns), since feature
+    engineering and scaling are part of the graph. Provides predict and
+    predict_interval like YieldPredictor; onnxruntime releases the GIL
+    while it runs.
+    """
+    
+    def __init__(self, path, calibration=None, threads=1, version=None):
+        if onnxruntime is None:
+            raise ImportError("onnxruntime is required for the ONNX backend")
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = max(1, int(threads))
+        options.inter_op_num_threads = 1
+        # Idle pool threads would otherwise spin and take CPU from other workers
+        options.add_session_config_entry('session.intra_op.allow_spinning', '0')
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.n_inputs = self.session.get_inputs()[0].shape[1]
+        self.output_name = self.session.get_outputs()[0].name
+        self.calibration = calibration
+        self.version = version
+        self.is_trained = True
+    
+    def _run(self, X_raw):
+        X_raw = np.ascontiguousarray(X_raw, dtype=np.float64)
+        if X_raw.ndim != 2 or X_raw.shape[1] != self.n_inputs:
+            raise ValueError(f"X has shape {X_raw.shape}, expected (n_samples, {self.n_inputs})")
+        return self.session.run([self.output_name], {INPUT_NAME: X_raw})[0]
+    
+    def predict(self, X_raw):
+        """Predictions for raw input rows"""
+        outputs = self._run(X_raw)
+        if self.output_name == TREE_OUTPUTS_NAME:
+            return outputs.mean(axis=1, dtype=np.float64)
+        return outputs[:, 0].astype(np.float64)
+    
+    def predict_interval(self, X_raw, coverage=0.9):
+        """Predictions with lower and upper bounds, by the same methods as YieldPredictor.predict_interval"""
+        outputs = self._run(X_raw)
+        if self.output_name == TREE_OUTPUTS_NAME:
+            values = outputs.astype(np.float64)
+            bounds = _row_quantiles(values, ((1 - coverage) / 2, (1 + coverage) / 2))
+            return values.mean(axis=1), bounds[:, 0], bounds[:, 1], 'tree_quantiles'
+        
+        predictions = outputs[:, 0].astype(np.float64)
+        if self.calibration is not None:
+            half_width = np.interp(coverage, self.calibration['levels'], self.calibration['half_widths'])
+            return predictions, predictions - half_width, predictions + half_width, 'conformal'
+        return predictions, predictions * 0.9, predictions * 1.1, 'heuristic'
\ No newline at end of file
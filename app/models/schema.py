@@ -0,0 +1,137 @@
+import math
+import numpy as np
+
+# Physically plausible (min, max) for each input field, inclusive
+FIELD_BOUNDS = {
+    'temperature_avg': (-50.0, 60.0),
+    'rainfall_mm': (0.0, 12000.0),
+    'humidity_percent': (0.0, 100.0),
+    'soil_ph': (0.0, 14.0),
+    'soil_nitrogen': (0.0, 1000.0),
+    'soil_phosphorus': (0.0, 1000.0),
+    'soil_potassium': (0.0, 1000.0),
+    'fertilizer_used_kg': (0.0, 100000.0),
+    'irrigation_hours': (0.0, 8784.0),
+    'area_hectares': (0.0, 1000000.0)
+}
+
+class ValidationError(ValueError):
+    """Invalid input record(s); ``errors`` maps record index to message for batches"""
+    
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or {}
+
+class FeatureSchema:
+    """Types and bounds of the model's input fields, compiled to arrays for fast checks
+    
+    Values must be numbers or numeric strings (booleans are rejected),
+    finite and within the field's bounds. Fields without configured bounds
+    only need to be finite.
+    """
+    
+    def __init__(self, fields, bounds=None):
+        bounds = FIELD_BOUNDS if bounds is None else bounds
+        self.fields = list(fields)
+        self.lower = np.array([bounds.get(field, (-np.inf, np.inf))[0] for field in self.fields])
+        self.upper = np.array([bounds.get(field, (-np.inf, np.inf))[1] for field in self.fields])
+        self._checks = list(zip(self.fields, self.lower.tolist(), self.upper.tolist()))
+    
+    @classmethod
+    def from_processor(cls, processor, bounds=None):
+        """Schema for the fields a client supplies: the processor's non-engineered feature columns"""
+        engineered = set(processor.engineered_columns)
+        return cls([column for column in processor.feature_columns if column not in engineered], bounds)
+    
+    @staticmethod
+    def _range_error(field, lower, upper):
+        return f'Value out of range for field: {field} (expected {lower:g} to {upper:g})'
+    
+    @staticmethod
+    def _to_float(value):
+        """Convert a single value to float, mapping anything unparseable or boolean to NaN"""
+        if isinstance(value, bool):
+            return math.nan
+        try:
+            return float(value)
+        except (TypeError, ValueError, OverflowError):
+            return math.nan
+    
+    def validate_record(self, record):
+        """Validate one record and return its fields; numeric strings are converted to float
+        
+        Raises ValidationError with the first problem found, in field order.
+        """
+        if not isinstance(record, dict):
+            raise ValidationError('Record must be a JSON object')
+        
+        clean = {}
+        for field, lower, upper in self._checks:
+            value = record.get(field)
+            if value is None:
+                raise ValidationError(f'Missing required field: {field}')
+            
+            number = self._to_float(value)
+            if not math.isfinite(number):
+                raise ValidationError(f'Invalid value for field: {field}')
+            if not lower <= number <= upper:
+                raise ValidationError(self._range_error(field, lower, upper))
+            
+            # Keep numbers as given so messages echo the client's formatting
+            clean[field] = value if type(value) in (int, float) else number
+        return clean
+    
+    def validate_batch(self, records):
+        """Validate a batch of records and stack them into a raw feature matrix
+        
+        Returns the matrix (one row per record, ``fields`` order), a boolean
+        mask of the rows that passed validation, a dict of row index -> error,
+        the same first error validate_record would raise for that row, and
+        the fields of each record as validate_record returns them (None for
+        invalid rows).
+        """
+        n_records = len(records)
+        X = np.empty((n_records, len(self.fields)), dtype=np.float64)
+        valid = np.ones(n_records, dtype=bool)
+        errors = {}
+        
+        is_record = [isinstance(record, dict) for record in records]
+        for i, ok in enumerate(is_record):
+            if not ok:
+                valid[i] = False
+                errors[i] = 'Record must be a JSON object'
+        rows = [record if ok else {} for record, ok in zip(records, is_record)]
+        
+        columns = []
+        for j, field in enumerate(self.fields):
+            values = [row.get(field) for row in rows]
+            try:
+                if any(value is True or value is False for value in values):
+                    raise TypeError
+                X[:, j] = np.array(values, dtype=np.float64)
+            except (TypeError, ValueError, OverflowError):
+                X[:, j] = [self._to_float(value) for value in values]
+            
+            column = X[:, j]
+            bad = ~np.isfinite(column) & valid
+            for i in np.flatnonzero(bad).tolist():
+                valid[i] = False
+                if rows[i].get(field) is None:
+                    errors[i] = f'Missing required field: {field}'
+                else:
+                    errors[i] = f'Invalid value for field: {field}'
+            
+            out_of_range = ((column < self.lower[j]) | (column > self.upper[j])) & valid
+            for i in np.flatnonzero(out_of_range).tolist():
+                valid[i] = False
+                errors[i] = self._range_error(field, self.lower[j], self.upper[j])
+        
+            # Keep numbers as given and convert anything else, like validate_record
+            if {type(value) for value in values} <= {int, float}:
+                columns.append(values)
+            else:
+                columns.append([value if type(value) in (int, float) else number
+                                for value, number in zip(values, column.tolist())])
+        
+        clean = [dict(zip(self.fields, row)) if ok else None for row, ok in zip(zip(*columns), valid.tolist())]
+        return X, valid, errors, clean
\ No newline at end of file
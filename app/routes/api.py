@@ -1,31 +1,56 @@
-from flask import Blueprint, request, jsonify
-from app.services.prediction_service import PredictionService
+import hmac
+import json
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app.models.schema import ValidationError
+from app.services.model_registry import model_registry
 from app.services.data_service import DataService
+from app.services.job_queue import job_queue
+from app.services.metrics import metrics
 
 api_bp = Blueprint('api', __name__)
 
-prediction_service = PredictionService()
 data_service = DataService()
 
 @api_bp.route('/predict', methods=['POST'])
 def predict():
     """API endpoint for yield prediction"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
-        # Validate input
-        required_fields = [
-            'temperature_avg', 'rainfall_mm', 'humidity_percent',
-            'soil_ph', 'soil_nitrogen', 'soil_phosphorus', 'soil_potassium',
-            'fertilizer_used_kg', 'irrigation_hours', 'area_hectares'
-        ]
+        # Validate and predict; schema violations are client errors
+        try:
+            result = model_registry.prediction_service.predict_yield(data)
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
         
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        return jsonify({
+            'success': True,
+            'data': result
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """API endpoint for batch yield prediction"""
+    try:
+        data = request.get_json(silent=True)
+        records = data.get('records') if isinstance(data, dict) else data
+        
+        # Validate payload shape
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'Request body must contain a non-empty list of records'}), 400
         
-        # Make prediction
-        result = prediction_service.predict_yield(data)
+        max_records = current_app.config['BATCH_MAX_RECORDS']
+        if len(records) > max_records:
+            return jsonify({'error': f'Batch too large: {len(records)} records (maximum {max_records})'}), 413
+        
+        # Make predictions
+        result = model_registry.prediction_service.predict_batch(records)
         
         return jsonify({
             'success': True,
@@ -38,18 +63,125 @@ def predict():
             'error': str(e)
         }), 500
 
+def _read_lines(stream, max_line_bytes):
+    """Read lines from the request body incrementally, truncating overlong lines"""
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Discard the rest of the line without buffering it
+            rest = line
+            while rest and not rest.endswith(b'\n'):
+                rest = stream.readline(max_line_bytes + 1)
+        yield line
+
+@api_bp.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """API endpoint for streaming NDJSON yield prediction"""
+    try:
+        service = model_registry.prediction_service
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    max_line_bytes = current_app.config['STREAM_MAX_LINE_BYTES']
+    lines = _read_lines(request.stream, max_line_bytes)
+    
+    def generate():
+        try:
+            for item in service.predict_stream(lines, batch_size=batch_size, max_line_bytes=max_line_bytes):
+                yield json.dumps(item) + '\n'
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band and stop
+            yield json.dumps({'error': str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@api_bp.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a large scoring request as a background job"""
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            if not upload.filename.lower().endswith('.csv'):
+                return jsonify({'error': 'Uploaded file must be a CSV'}), 400
+            job_id = job_queue.submit_csv(upload)
+        else:
+            data = request.get_json(silent=True)
+            records = data.get('records') if isinstance(data, dict) else data
+            
+            # Validate payload shape
+            if not isinstance(records, list) or not records:
+                return jsonify({'error': 'Request must contain a non-empty list of records or a CSV file'}), 400
+            
+            max_records = current_app.config['JOB_MAX_RECORDS']
+            if len(records) > max_records:
+                return jsonify({'error': f'Job too large: {len(records)} records (maximum {max_records})'}), 413
+            job_id = job_queue.submit_records(records)
+        
+        return jsonify({
+            'success': True,
+            'data': job_queue.get(job_id, limit=0)
+        }), 202
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get job progress and a page of its results"""
+    try:
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', 100, type=int)
+        
+        if limit < 0 or offset < 0:
+            return jsonify({'error': 'limit and offset must be non-negative'}), 400
+        
+        job = job_queue.get(job_id, offset=offset, limit=min(limit, current_app.config['JOB_RESULTS_PAGE_MAX']))
+        if job is None:
+            return jsonify({'error': f'Unknown job: {job_id}'}), 404
+        
+        return jsonify({
+            'success': True,
+            'data': job
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @api_bp.route('/historical', methods=['GET'])
 def get_historical():
     """Get historical data"""
     try:
         limit = request.args.get('limit', 100, type=int)
-        data = data_service.get_historical_data(limit)
+        offset = request.args.get('offset', 0, type=int)
+        cursor = request.args.get('cursor')
+        columns = request.args.get('columns')
+        columns = [column.strip() for column in columns.split(',') if column.strip()] if columns else None
+        
+        if limit < 0 or offset < 0:
+            return jsonify({'error': 'limit and offset must be non-negative'}), 400
+        
+        page = data_service.get_historical_page(limit, offset=offset, columns=columns, cursor=cursor)
         
         return jsonify({
             'success': True,
-            'data': data
+            'data': page['records'],
+            'next_cursor': page['next_cursor']
         }), 200
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -73,10 +205,59 @@ def get_statistics():
             'error': str(e)
         }), 500
 
+@api_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Prediction cache hit/miss counters"""
+    return jsonify({
+        'success': True,
+        'data': model_registry.prediction_service.cache_stats()
+    }), 200
+
+@api_bp.route('/shadow/stats', methods=['GET'])
+def get_shadow_stats():
+    """Latency and prediction deltas of the shadow model against the primary, for this worker"""
+    return jsonify({
+        'success': True,
+        'data': model_registry.prediction_service.shadow_stats()
+    }), 200
+
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text-format metrics, aggregated across workers"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@api_bp.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """Load new model artifacts into this worker without a restart (requires ADMIN_TOKEN)"""
+    token = current_app.config.get('ADMIN_TOKEN')
+    if not token:
+        return jsonify({'error': 'Admin endpoints are disabled'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    
+    try:
+        model_version = model_registry.reload()
+        return jsonify({
+            'success': True,
+            'data': {
+                'model_version': model_version,
+                'load_seconds': round(model_registry.load_seconds, 3)
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'model_version': model_registry.model_version
+        }), 500
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'service': 'Agriculture Yield Predictor API'
+        'service': 'Agriculture Yield Predictor API',
+        'model_loaded': model_registry.is_loaded,
+        'model_version': model_registry.model_version,
+        'model_loaded_at': model_registry.loaded_at
     }), 200
\ No newline at end of file
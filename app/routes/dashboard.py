@@ -1,10 +1,9 @@
 from flask import Blueprint, render_template, request, jsonify
-from app.services.prediction_service import PredictionService
+from app.services.model_registry import model_registry
 from app.services.data_service import DataService
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
-prediction_service = PredictionService()
 data_service = DataService()
 
 @dashboard_bp.route('/')
@@ -26,13 +25,12 @@ def predict_page():
     """Prediction page"""
     if request.method == 'POST':
         try:
-            data = request.form.to_dict()
+            service = model_registry.prediction_service
             
-            # Convert to float
-            for key in data:
-                data[key] = float(data[key])
+            # Validate and convert the form fields to numbers
+            data = service.processor.schema.validate_record(request.form.to_dict())
             
-            result = prediction_service.predict_yield(data)
+            result = service.predict_yield(data)
             return render_template('prediction.html', result=result, input_data=data)
         
         except Exception as e:
@@ -0,0 +1,71 @@
+import io
+import pandas as pd
+
+BLOCK_SIZE = 1 << 16
+
+def read_csv_tail(filepath, limit, offset=0, columns=None, cursor=None):
+    """Read the last rows of a CSV without parsing the rest of the file
+    
+    Seeks backwards from the end (or from cursor, a byte offset returned by
+    a previous call) to find line boundaries, then parses only the header
+    and the selected rows. offset skips that many rows from the end.
+    Returns (DataFrame, next_cursor); next_cursor is the byte offset of the
+    first returned row, or None once the start of the data is reached.
+    Assumes one record per line (no quoted newlines), as written by pandas
+    for this dataset.
+    """
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+        header_end = f.tell()
+        
+        f.seek(0, io.SEEK_END)
+        end = f.tell() if cursor is None else min(int(cursor), f.tell())
+        if end < header_end:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        
+        end = _find_rows_start(f, header_end, end, offset)
+        start = _find_rows_start(f, header_end, end, limit)
+        
+        f.seek(start)
+        body = f.read(end - start)
+    
+    names = pd.read_csv(io.BytesIO(header), nrows=0).columns
+    if columns:
+        unknown = [column for column in columns if column not in names]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    
+    if body.strip():
+        df = pd.read_csv(io.BytesIO(header + body), usecols=columns)
+    else:
+        df = pd.DataFrame(columns=columns if columns else names)
+    
+    next_cursor = start if start > header_end else None
+    return df, next_cursor
+
+def _find_rows_start(f, header_end, end, n_rows):
+    """Byte offset at which the last n_rows lines before end begin"""
+    if n_rows <= 0 or end <= header_end:
+        return end
+    
+    # The newline terminating the last line does not start a new row
+    f.seek(end - 1)
+    pos = end - 1 if f.read(1) == b'\n' else end
+    
+    remaining = n_rows
+    while pos > header_end:
+        block_start = max(header_end, pos - BLOCK_SIZE)
+        f.seek(block_start)
+        block = f.read(pos - block_start)
+        
+        index = len(block)
+        while True:
+            index = block.rfind(b'\n', 0, index)
+            if index < 0:
+                break
+            remaining -= 1
+            if remaining == 0:
+                return block_start + index + 1
+        pos = block_start
+    
+    return header_end
\ No newline at end of file
@@ -1,5 +1,7 @@
-import pandas as pd
 import os
+from app.services.storage import open_store
+from app.services.statistics_cache import statistics_cache
+from app.services.metrics import metrics
 from config.config import Config
 
 class DataService:
@@ -7,34 +9,60 @@ class DataService:
     
     def __init__(self):
         self.data_dir = Config.DATA_DIR
+        self.columnar_path = Config.COLUMNAR_DATA_PATH
+    
+    def _store(self):
+        """Columnar copy of the history when present, else the raw CSV"""
+        csv_path = os.path.join(self.data_dir, 'raw', 'sample_data.csv')
+        return open_store(csv_path, self.columnar_path)
     
     def get_historical_data(self, limit=100):
         """Get historical yield data"""
+        return self.get_historical_page(limit)['records']
+    
+    def get_historical_page(self, limit=100, offset=0, columns=None, cursor=None):
+        """Get the most recent records, reading only the tail of the file
+        
+        Pages walk backwards through the history: pass the returned
+        next_cursor to fetch the records preceding this page. A cursor only
+        fits the file it came from; after a switch between the CSV and its
+        columnar copy, or a rewrite, it raises ValueError.
+        """
         try:
-            filepath = os.path.join(self.data_dir, 'raw', 'sample_data.csv')
-            if os.path.exists(filepath):
-                df = pd.read_csv(filepath)
-                return df.tail(limit).to_dict('records')
-            return []
+            with metrics.timer('agri_data_service_seconds', operation='historical'):
+                store = self._store()
+                if os.path.exists(store.path) and os.path.getsize(store.path) > 0:
+                    df, next_cursor = store.tail(limit, offset=offset, columns=columns, cursor=cursor)
+                    return {'records': df.to_dict('records'), 'next_cursor': next_cursor}
+                if cursor is not None:
+                    # No page of an empty history could have issued it
+                    raise ValueError(f"Invalid cursor: {cursor}")
+                return {'records': [], 'next_cursor': None}
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error fetching historical data: {str(e)}")
     
     def get_statistics(self):
-        """Get data statistics"""
+        """Get data statistics from the process-wide running statistics cache"""
         try:
-            filepath = os.path.join(self.data_dir, 'raw', 'sample_data.csv')
-            if os.path.exists(filepath):
-                df = pd.read_csv(filepath)
-                
-                stats = {
-                    'total_records': len(df),
-                    'average_yield': round(df['yield_tons_per_hectare'].mean(), 2),
-                    'max_yield': round(df['yield_tons_per_hectare'].max(), 2),
-                    'min_yield': round(df['yield_tons_per_hectare'].min(), 2),
-                    'std_yield': round(df['yield_tons_per_hectare'].std(), 2)
-                }
-                
-                return stats
-            return {}
+            with metrics.timer('agri_data_service_seconds', operation='statistics'):
+                store = self._store()
+                if os.path.exists(store.path) and os.path.getsize(store.path) > 0:
+                    total_records, yield_stats = statistics_cache.get(store.path, 'yield_tons_per_hectare')
+                    if yield_stats.count == 0:
+                        return {}
+
+                    stats = {
+                        'total_records': total_records,
+                        'average_yield': round(yield_stats.mean, 2),
+                        'max_yield': round(yield_stats.max, 2),
+                        'min_yield': round(yield_stats.min, 2),
+                        # The sample standard deviation is undefined (NaN) for a single row
+                        'std_yield': round(yield_stats.std, 2) if yield_stats.count > 1 else None
+                    }
+
+                    return stats
+                return {}
         except Exception as e:
             raise Exception(f"Error calculating statistics: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from app.services.model_registry import model_registry
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    total INTEGER,
+    processed INTEGER NOT NULL DEFAULT 0,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+_JOB_FIELDS = ('id', 'status', 'source', 'total', 'processed', 'succeeded', 'failed', 'error',
+               'created_at', 'updated_at')
+
+class JobQueue:
+    """SQLite-backed queue of scoring jobs run by a local thread pool
+    
+    Inputs are spooled to disk, scored in chunks through
+    PredictionService.predict_batch and results are stored per record so
+    clients can poll progress and page through them. Jobs survive restarts:
+    each serving process starts its pool on its first request (or at worker
+    boot), picks up queued jobs and then rescans every recovery_interval
+    seconds for running jobs whose worker stopped updating them, which are
+    resumed from the last completed chunk.
+    """
+    
+    def __init__(self, jobs_dir=None, workers=2, chunk_size=5000, stale_seconds=600, recovery_interval=60,
+                 service_provider=None):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.stale_seconds = stale_seconds
+        self.recovery_interval = recovery_interval
+        self._service_provider = service_provider or (lambda: model_registry.prediction_service)
+        self._executor = None
+        self._executor_pid = None
+        self._scheduled = set()
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Attach the queue to the app using its JOBS_* settings"""
+        app.extensions['job_queue'] = self
+        self.configure(
+            jobs_dir=app.config['JOBS_DIR'],
+            workers=app.config['JOB_WORKERS'],
+            chunk_size=app.config['JOB_CHUNK_SIZE'],
+            stale_seconds=app.config['JOB_STALE_SECONDS'],
+            recovery_interval=app.config['JOB_RECOVERY_INTERVAL']
+        )
+        # Resume pending jobs without waiting for the next submission
+        app.before_request(self.start)
+    
+    def configure(self, jobs_dir, workers=2, chunk_size=5000, stale_seconds=600, recovery_interval=60):
+        """Set the storage location and pool size and create the database"""
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.stale_seconds = stale_seconds
+        self.recovery_interval = recovery_interval
+        os.makedirs(os.path.join(jobs_dir, 'inputs'), exist_ok=True)
+        with self._connect() as conn:
+            # WAL lets status polls read while a worker writes results
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+    
+    @property
+    def db_path(self):
+        return os.path.join(self.jobs_dir, 'jobs.db')
+    
+    @contextmanager
+    def _connect(self):
+        """Open a connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def submit_records(self, records):
+        """Queue a list of input records and return the job id"""
+        job_id = uuid.uuid4().hex
+        input_path = os.path.join(self.jobs_dir, 'inputs', f'{job_id}.json')
+        with open(input_path, 'w') as f:
+            json.dump(records, f)
+        return self._create(job_id, 'records', input_path, total=len(records))
+    
+    def submit_csv(self, upload):
+        """Queue an uploaded CSV file (anything with a save(path) method) and return the job id"""
+        job_id = uuid.uuid4().hex
+        input_path = os.path.join(self.jobs_dir, 'inputs', f'{job_id}.csv')
+        upload.save(input_path)
+        return self._create(job_id, 'csv', input_path, total=None)
+    
+    def _create(self, job_id, source, input_path, total):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, source, input_path, total, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', source, input_path, total, now, now)
+            )
+        self.start()
+        self._schedule(job_id)
+        return job_id
+    
+    def start(self):
+        """Start this process' worker pool and resume pending jobs; a no-op once started"""
+        if self._executor_pid != os.getpid() and self.jobs_dir is not None:
+            self._start_executor()
+    
+    def close(self):
+        """Stop this process' recovery thread and worker pool, letting the running job finish"""
+        with self._lock:
+            executor, self._executor, self._executor_pid = self._executor, None, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+    
+    def _start_executor(self):
+        """Create the pool and the recovery thread once per process (threads do not survive a fork)"""
+        with self._lock:
+            if self._executor_pid == os.getpid():
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scoring-job')
+            self._executor_pid = os.getpid()
+            self._scheduled = set()
+        self._resume_pending()
+        threading.Thread(target=self._recover, args=(os.getpid(),), name='job-recovery', daemon=True).start()
+    
+    def _recover(self, pid):
+        # A worker that died mid-job leaves it running; it becomes recoverable once stale
+        while self._executor_pid == pid:
+            time.sleep(self.recovery_interval)
+            try:
+                self._resume_pending()
+            except Exception as e:
+                print(f"Warning: Job recovery failed: {str(e)}")
+    
+    def _resume_pending(self):
+        for job_id in self._recoverable_jobs():
+            self._schedule(job_id)
+    
+    def _schedule(self, job_id):
+        """Submit a job to this process' pool unless it is already waiting or running here"""
+        with self._lock:
+            if job_id in self._scheduled:
+                return
+            self._scheduled.add(job_id)
+        self._executor.submit(self._run_scheduled, job_id)
+    
+    def _run_scheduled(self, job_id):
+        try:
+            self._run(job_id)
+        finally:
+            with self._lock:
+                self._scheduled.discard(job_id)
+    
+    def _recoverable_jobs(self):
+        stale_before = time.time() - self.stale_seconds
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated_at < ?) "
+                "ORDER BY created_at",
+                (stale_before,)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def _claim(self, job_id):
+        """Mark a job running; False if another worker already has it"""
+        stale_before = time.time() - self.stale_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? "
+                "WHERE id = ? AND (status = 'queued' OR (status = 'running' AND updated_at < ?))",
+                (time.time(), job_id, stale_before)
+            )
+            return cursor.rowcount == 1
+    
+    def _run(self, job_id):
+        """Score a job chunk by chunk, resuming after the last stored chunk"""
+        if not self._claim(job_id):
+            return
+        
+        try:
+            with self._connect() as conn:
+                source, input_path, total, processed = conn.execute(
+                    'SELECT source, input_path, total, processed FROM jobs WHERE id = ?', (job_id,)
+                ).fetchone()
+            
+            if total is None:
+                total = self._count_csv_rows(input_path)
+                with self._connect() as conn:
+                    conn.execute('UPDATE jobs SET total = ? WHERE id = ?', (total, job_id))
+            
+            service = self._service_provider()
+            for start, records in self._iter_chunks(source, input_path, processed):
+                result = service.predict_batch(records)
+                rows = [(job_id, start + item['index'], json.dumps(dict(item, index=start + item['index'])))
+                        for item in result['predictions'] + result['errors']]
+                
+                with self._connect() as conn:
+                    conn.executemany('INSERT OR REPLACE INTO job_results VALUES (?, ?, ?)', rows)
+                    conn.execute(
+                        'UPDATE jobs SET processed = ?, succeeded = succeeded + ?, failed = failed + ?, '
+                        'updated_at = ? WHERE id = ?',
+                        (start + len(records), result['succeeded'], result['failed'], time.time(), job_id)
+                    )
+            
+            self._finish(job_id, 'completed')
+            os.remove(input_path)
+        except Exception as e:
+            self._finish(job_id, 'failed', f"Job error: {str(e)}")
+    
+    def _finish(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute('UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?',
+                         (status, error, time.time(), job_id))
+    
+    def _iter_chunks(self, source, input_path, start):
+        """Yield (first index, records) chunks from the spooled input, skipping done rows"""
+        if source == 'records':
+            with open(input_path) as f:
+                records = json.load(f)
+            for offset in range(start, len(records), self.chunk_size):
+                yield offset, records[offset:offset + self.chunk_size]
+            return
+        
+        offset = 0
+        for chunk in pd.read_csv(input_path, chunksize=self.chunk_size):
+            if offset >= start:
+                # Empty CSV cells become missing fields rather than NaN values
+                records = [{k: v for k, v in row.items() if v == v} for row in chunk.to_dict('records')]
+                yield offset, records
+            offset += len(chunk)
+    
+    @staticmethod
+    def _count_csv_rows(input_path):
+        lines, last = 0, b''
+        with open(input_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                lines += block.count(b'\n')
+                last = block[-1:]
+        if last and last != b'\n':
+            lines += 1
+        # Minus the header row
+        return max(lines - 1, 0)
+    
+    def get(self, job_id, offset=0, limit=100):
+        """Return job status and a page of results, or None for an unknown job"""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(_JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            results = conn.execute(
+                'SELECT result FROM job_results WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?',
+                (job_id, offset, limit)
+            ).fetchall()
+        
+        job = dict(zip(_JOB_FIELDS, row))
+        job['progress'] = round(100.0 * job['processed'] / job['total'], 1) if job['total'] else 0.0
+        job['results'] = [json.loads(result) for (result,) in results]
+        next_offset = job['results'][-1]['index'] + 1 if job['results'] else offset
+        finished = job['status'] in ('completed', 'failed')
+        job['next_offset'] = None if finished and next_offset >= job['processed'] else next_offset
+        return job
+
+job_queue = JobQueue()
\ No newline at end of file
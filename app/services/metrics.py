@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import glob
+import bisect
+import threading
+from config.config import Config
+
+_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+_SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+
+# Metric name -> (type, help, histogram buckets)
+METRICS = {
+    'agri_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status', None),
+    'agri_http_request_duration_seconds': ('histogram', 'HTTP request latency', _LATENCY_BUCKETS),
+    'agri_http_request_size_bytes': ('histogram', 'HTTP request body size', _SIZE_BUCKETS),
+    'agri_http_response_size_bytes': ('histogram', 'HTTP response body size', _SIZE_BUCKETS),
+    'agri_prediction_stage_seconds': ('histogram', 'Time spent in each single-prediction stage', _LATENCY_BUCKETS),
+    'agri_data_service_seconds': ('histogram', 'Time spent in DataService operations', _LATENCY_BUCKETS),
+    'agri_shadow_requests_total': ('counter', 'Calls sampled for the shadow model by outcome', None),
+    'agri_shadow_latency_seconds': ('histogram', 'Scoring latency of shadow-sampled calls by model', _LATENCY_BUCKETS)
+}
+
+class _Timer:
+    """Context manager observing its elapsed time into a histogram"""
+    
+    __slots__ = ('_metrics', '_key', '_start')
+    
+    def __init__(self, metrics, key):
+        self._metrics = metrics
+        self._key = key
+    
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics._observe(self._key, time.perf_counter() - self._start)
+
+class Metrics:
+    """Process-local counters and histograms, shared across workers through a directory
+    
+    Each process keeps its values in memory and a background thread writes
+    a snapshot to ``<directory>/metrics_<pid>.json`` every flush_seconds
+    when something changed, so the hot path is a dict update under a lock.
+    Rendering merges the snapshots of every process in the directory.
+    """
+    
+    def __init__(self, directory=None, flush_seconds=1.0):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flusher_pid = None
+    
+    def inc(self, name, amount=1, **labels):
+        """Increment a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+    
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram"""
+        self._observe((name, tuple(sorted(labels.items()))), value)
+    
+    def _observe(self, key, value):
+        buckets = METRICS[key[0]][2]
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), then sum
+                state = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            state[bisect.bisect_left(buckets, value)] += 1
+            state[-1] += value
+            self._dirty = True
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+    
+    def timer(self, name, **labels):
+        """Time a block into a histogram"""
+        return _Timer(self, (name, tuple(sorted(labels.items()))))
+    
+    def init_app(self, app):
+        """Record request counts, latency and sizes for every request of the app"""
+        from flask import g, request
+        
+        @app.before_request
+        def _start_timer():
+            g.metrics_start = time.perf_counter()
+        
+        @app.after_request
+        def _record_request(response):
+            start = g.pop('metrics_start', None)
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            self.inc('agri_http_requests_total', endpoint=endpoint, method=request.method,
+                     status=str(response.status_code))
+            if start is not None:
+                self.observe('agri_http_request_duration_seconds', time.perf_counter() - start, endpoint=endpoint)
+            if request.content_length is not None:
+                self.observe('agri_http_request_size_bytes', request.content_length, endpoint=endpoint)
+            if response.content_length is not None:
+                self.observe('agri_http_response_size_bytes', response.content_length, endpoint=endpoint)
+            return response
+    
+    def _start_flusher(self):
+        """Start the snapshot thread once per process (threads do not survive a fork)"""
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        if self.directory:
+            threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            if self._dirty:
+                self.flush()
+    
+    def _snapshot(self):
+        with self._lock:
+            self._dirty = False
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(state)] for (name, labels), state in self._histograms.items()]
+            }
+    
+    def flush(self):
+        """Write this process' values to the shared directory"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._snapshot(), f)
+        os.replace(path + '.tmp', path)
+    
+    def reset(self):
+        """Drop in-memory values and, for a fresh server start, any worker snapshots"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+                os.remove(path)
+    
+    def _collect(self):
+        """Merge the snapshots of all processes"""
+        snapshots = []
+        if self.directory:
+            self.flush()
+            for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        else:
+            snapshots.append(self._snapshot())
+        
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, state in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged = histograms.setdefault(key, [0] * len(state))
+                for i, value in enumerate(state):
+                    merged[i] += value
+        return counters, histograms
+    
+    def render(self):
+        """Prometheus text exposition of all metrics"""
+        counters, histograms = self._collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            series = counters if kind == 'counter' else histograms
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key in keys:
+                labels = key[1]
+                if kind == 'counter':
+                    lines.append(f'{name}{_format_labels(labels)} {series[key]}')
+                    continue
+                state = series[key]
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], state[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {state[-1]}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+metrics = Metrics(Config.METRICS_DIR, Config.METRICS_FLUSH_SECONDS)
\ No newline at end of file
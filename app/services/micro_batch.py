@@ -0,0 +1,91 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from app.services.model_registry import model_registry
+
+class PredictionBatcher:
+    """Collects concurrent single predictions on an event loop and scores them together
+    
+    The first request of a batch opens a window of window_ms milliseconds;
+    the batch is scored when the window closes or max_size requests have
+    arrived, whichever is first. Scoring runs through
+    PredictionService.predict_many on one background thread, so the event
+    loop keeps accepting requests. While a batch is being scored, requests
+    keep collecting and everything pending is scored as one batch once it
+    returns. Each caller gets back exactly what predict_yield would have
+    returned or raised for its record.
+    """
+    
+    def __init__(self, window_ms=2.0, max_size=64, service_provider=None):
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._service_provider = service_provider or (lambda: model_registry.prediction_service)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict-batch')
+        self._pending = []
+        self._timer = None
+        self._scoring = False
+        self.batches = 0
+        self.records = 0
+    
+    def init_app(self, app):
+        """Use the app's PREDICT_BATCH_* settings"""
+        self.window = app.config['PREDICT_BATCH_WINDOW_MS'] / 1000
+        self.max_size = app.config['PREDICT_BATCH_MAX_SIZE']
+    
+    async def predict(self, record):
+        """Score one record as part of the next batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((record, future))
+        if self._scoring:
+            # Flushed when the batch being scored returns
+            return await future
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            self._scoring = True
+            asyncio.get_running_loop().create_task(self._score(pending))
+    
+    async def _score(self, pending):
+        records = [record for record, _ in pending]
+        try:
+            answers = await asyncio.get_running_loop().run_in_executor(self._executor, self._predict_many, records)
+        except Exception as e:
+            answers = [e] * len(pending)
+        finally:
+            self._scoring = False
+            self._flush()
+        
+        self.batches += 1
+        self.records += len(pending)
+        for (_, future), answer in zip(pending, answers):
+            # Skip callers that went away while their batch was scored
+            if future.done():
+                continue
+            if isinstance(answer, Exception):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+    
+    def _predict_many(self, records):
+        return self._service_provider().predict_many(records)
+    
+    def stats(self):
+        """Batches scored so far and their mean size"""
+        return {
+            'batches': self.batches,
+            'records': self.records,
+            'mean_batch_size': round(self.records / self.batches, 2) if self.batches else None
+        }
+    
+    def close(self):
+        """Stop the scoring thread once queued batches are done"""
+        self._executor.shutdown(wait=True)
\ No newline at end of file
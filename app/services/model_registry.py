@@ -0,0 +1,202 @@
+import os
+import math
+import random
+import resource
+import threading
+import time
+from app.models.ml_model import calibration_path
+from app.services.prediction_service import PredictionService
+from config.config import Config
+
+# Typical field values used to smoke-test a freshly loaded model before it serves
+SMOKE_RECORD = {
+    'temperature_avg': 25.0, 'rainfall_mm': 800.0, 'humidity_percent': 65.0,
+    'soil_ph': 6.5, 'soil_nitrogen': 20.0, 'soil_phosphorus': 15.0, 'soil_potassium': 18.0,
+    'fertilizer_used_kg': 100.0, 'irrigation_hours': 200.0, 'area_hectares': 5.0
+}
+
+def process_memory():
+    """Return resident, proportional and private memory of the current process in MB"""
+    try:
+        fields = {}
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+        return {
+            'rss_mb': round(fields['Rss'], 1),
+            'pss_mb': round(fields['Pss'], 1),
+            'private_mb': round(fields['Private_Clean'] + fields['Private_Dirty'], 1)
+        }
+    except (OSError, KeyError, ValueError):
+        # Non-Linux fallback: peak RSS (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss_mb': round(peak / 1024, 1), 'pss_mb': None, 'private_mb': None}
+
+def artifact_paths():
+    """Files a PredictionService is built from"""
+    paths = [Config.MODEL_BUNDLE_PATH, Config.MODEL_PATH, Config.MODEL_ARRAYS_PATH, Config.SCALER_PATH,
+             calibration_path(Config.MODEL_PATH), calibration_path(Config.MODEL_ARRAYS_PATH)]
+    if Config.RECOMMENDATION_RULES_PATH:
+        paths.append(Config.RECOMMENDATION_RULES_PATH)
+    if Config.SHADOW_MODEL_PATH:
+        paths.append(Config.SHADOW_MODEL_PATH)
+    return paths
+
+def artifact_fingerprint(paths):
+    """(path, size, mtime) of every existing file under paths, to detect new artifacts"""
+    fingerprint = []
+    for path in paths:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path))
+        for file in files:
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            fingerprint.append((file, stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+class ModelRegistry:
+    """Process-wide holder of the PredictionService shared by all blueprints
+    
+    The service can be replaced while serving: reload builds a new one
+    outside the request path, smoke-tests it and swaps the reference, so
+    requests that already hold the old service finish on it. With a reload
+    interval set, each process watches the artifact files and reloads once
+    a change has settled, polling with random jitter so workers do not all
+    load at the same moment.
+    """
+    
+    def __init__(self, service_factory=PredictionService, paths=artifact_paths):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._prediction_service = None
+        self._service_factory = service_factory
+        self._paths = paths
+        self._fingerprint = None
+        self._pending_fingerprint = None
+        self._watcher_pid = None
+        self.reload_interval = 0
+        self.reload_jitter = 0
+        self.load_seconds = None
+        self.loaded_at = None
+    
+    def init_app(self, app):
+        """Attach the registry to the app and load eagerly if configured"""
+        app.extensions['model_registry'] = self
+        self.reload_interval = app.config['MODEL_RELOAD_INTERVAL']
+        self.reload_jitter = app.config['MODEL_RELOAD_JITTER']
+        
+        if app.config.get('MODEL_LOADING', 'lazy') == 'startup':
+            self.load()
+            memory = process_memory()
+            app.logger.info(
+                f"Model loaded at startup in {self.load_seconds:.2f}s "
+                f"(pid {os.getpid()}, rss {memory['rss_mb']} MB, private {memory['private_mb']} MB)"
+            )
+    
+    @property
+    def prediction_service(self):
+        """Return the shared PredictionService, loading it on first use"""
+        if self.reload_interval and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        service = self._prediction_service
+        if service is None:
+            service = self.load()
+        return service
+    
+    @property
+    def is_loaded(self):
+        """Whether the model has been loaded in this process"""
+        return self._prediction_service is not None
+    
+    @property
+    def model_version(self):
+        """Version of the model and scaler currently serving, None before loading"""
+        service = self._prediction_service
+        return service.model_version if service is not None else None
+    
+    def load(self):
+        """Load the model once per process"""
+        with self._lock:
+            if self._prediction_service is None:
+                fingerprint = artifact_fingerprint(self._paths())
+                start = time.perf_counter()
+                self._prediction_service = self._service_factory()
+                self.load_seconds = time.perf_counter() - start
+                self.loaded_at = time.time()
+                self._fingerprint = fingerprint
+            return self._prediction_service
+
+    def reload(self):
+        """Load the current artifacts into a new service, smoke-test it and swap it in
+        
+        Returns the new model version. If loading or the smoke prediction
+        fails, the exception propagates and the current service keeps serving.
+        """
+        with self._reload_lock:
+            fingerprint = artifact_fingerprint(self._paths())
+            start = time.perf_counter()
+            candidate = self._service_factory()
+            self._smoke_test(candidate)
+            
+            with self._lock:
+                # A single reference swap: requests already holding the old service finish on it
+                previous, self._prediction_service = self._prediction_service, candidate
+                self.load_seconds = time.perf_counter() - start
+                self.loaded_at = time.time()
+                self._fingerprint = fingerprint
+            if previous is not None:
+                previous.close()
+            print(f"Model reloaded in {self.load_seconds:.2f}s (version {candidate.model_version}, pid {os.getpid()})")
+            return candidate.model_version
+    
+    @staticmethod
+    def _smoke_test(service):
+        if not service.model.is_trained:
+            raise Exception("Reload error: no trained model could be loaded")
+        result = service.predict_batch([SMOKE_RECORD])
+        if result['succeeded'] != 1 or not math.isfinite(result['predictions'][0]['predicted_yield']):
+            raise Exception(f"Reload error: smoke prediction failed: {result['errors'] or result['predictions']}")
+    
+    def check_for_changes(self):
+        """Reload if the artifacts changed and have been stable since the previous check
+        
+        Returns True when a reload was attempted. A failed reload is reported
+        and not retried until the artifacts change again.
+        """
+        fingerprint = artifact_fingerprint(self._paths())
+        if fingerprint == self._fingerprint:
+            self._pending_fingerprint = None
+            return False
+        if fingerprint != self._pending_fingerprint:
+            # Still being written, or just appeared: wait for one more quiet interval
+            self._pending_fingerprint = fingerprint
+            return False
+        
+        self._pending_fingerprint = None
+        try:
+            self.reload()
+        except Exception as e:
+            self._fingerprint = fingerprint
+            print(f"Warning: Keeping model version {self.model_version}: {str(e)}")
+        return True
+    
+    def _start_watcher(self):
+        """Start the artifact watcher once per process (threads do not survive a fork)"""
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name='model-watcher', daemon=True).start()
+    
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_interval + random.uniform(0, self.reload_jitter))
+            if self._prediction_service is not None:
+                self.check_for_changes()
+
+model_registry = ModelRegistry()
\ No newline at end of file
@@ -1,59 +1,361 @@
 import os
+import json
+import time
 import joblib
-from app.models.ml_model import YieldPredictor
+import numpy as np
+from app.models.ml_model import YieldPredictor, artifact_digest
 from app.models.data_processor import DataProcessor
+from app.models.schema import ValidationError
+from app.models.bundle import ONNX_NAME, load_bundle
+from app.models.onnx_model import OnnxPredictor
+from app.services.prediction_cache import PredictionCache
+from app.services.recommendations import RecommendationEngine
+from app.services.shadow import ShadowScorer
+from app.services.metrics import metrics
 from config.config import Config
 
 class PredictionService:
-    """Service for making predictions"""
+    """Service for making predictions
     
-    def __init__(self):
-        self.model = YieldPredictor()
-        self.processor = DataProcessor()
-        self._load_models()
+    By default the model and processor are loaded from the configured
+    artifacts; a trained model and fitted processor may be passed instead.
+    """
+    
+    def __init__(self, model=None, processor=None, model_version=None):
+        self.model = model or YieldPredictor()
+        self.processor = processor or DataProcessor()
+        self.onnx_model = None
+        self.model_version = model_version
+        self.bundle_path = None
+        self.interval_coverage = Config.PREDICTION_INTERVAL_COVERAGE
+        self.cache = None
+        if Config.PREDICTION_CACHE_SIZE > 0:
+            self.cache = PredictionCache(
+                max_size=Config.PREDICTION_CACHE_SIZE,
+                ttl_seconds=Config.PREDICTION_CACHE_TTL,
+                decimals=Config.PREDICTION_CACHE_DECIMALS
+            )
+        if model is None:
+            self._load_models()
+        self.recommendations = self._load_recommendations()
+        self.shadow = self._load_shadow()
+    
+    def _load_recommendations(self):
+        """Load the recommendation rule table, falling back to the built-in rules"""
+        try:
+            engine = RecommendationEngine.load(self.processor.input_columns, Config.RECOMMENDATION_RULES_PATH)
+            if Config.RECOMMENDATION_RULES_PATH:
+                print(f"Recommendation rules loaded from {Config.RECOMMENDATION_RULES_PATH}")
+            return engine
+        except Exception as e:
+            print(f"Warning: Using default recommendation rules: {str(e)}")
+            return RecommendationEngine(self.processor.input_columns)
+    
+    def _load_shadow(self):
+        """Load the optional shadow model compared against the primary on sampled requests"""
+        if not Config.SHADOW_MODEL_PATH:
+            return None
+        try:
+            shadow = ShadowScorer.load(
+                Config.SHADOW_MODEL_PATH,
+                self.processor.input_columns,
+                compile_model=Config.INFERENCE_BACKEND == 'compiled',
+                sample_rate=Config.SHADOW_SAMPLE_RATE,
+                workers=Config.SHADOW_WORKERS,
+                queue_size=Config.SHADOW_QUEUE_SIZE,
+                coverage=self.interval_coverage
+            )
+            print(f"Shadow model {shadow.version} loaded from {Config.SHADOW_MODEL_PATH} "
+                  f"(sample rate {shadow.sample_rate})")
+            return shadow
+        except Exception as e:
+            print(f"Warning: Could not load shadow model: {str(e)}")
+            return None
+    
+    def close(self):
+        """Release background resources once the service has been replaced"""
+        self.model.close()
+        if self.shadow is not None:
+            self.shadow.close()
     
     def _load_models(self):
-        """Load trained models"""
+        """Load trained models, preferring the model bundle over the separate legacy artifacts"""
         try:
-            if os.path.exists(Config.MODEL_PATH):
-                self.model.load(Config.MODEL_PATH)
-                print(f"Model loaded from {Config.MODEL_PATH}")
+            if os.path.isdir(Config.MODEL_BUNDLE_PATH):
+                self._load_bundle()
+            else:
+                self._load_legacy_artifacts()
+                
+            if self.model.is_trained and Config.INFERENCE_BACKEND == 'onnx':
+                self._load_onnx()
+            elif self.model.is_trained and Config.INFERENCE_BACKEND == 'compiled':
+                try:
+                    self.model.compile(max_rows=Config.COMPILED_MAX_ROWS)
+                    print("Model compiled to the vectorized forest evaluator")
+                except ValueError as e:
+                    print(f"Warning: Falling back to sklearn inference: {str(e)}")
             
-            if os.path.exists(Config.SCALER_PATH):
-                self.processor.scaler = joblib.load(Config.SCALER_PATH)
-                print(f"Scaler loaded from {Config.SCALER_PATH}")
+            # Cached predictions are only valid for this exact model and scaler
+            if self.cache is not None:
+                self.cache.clear()
         except Exception as e:
             print(f"Warning: Could not load models: {str(e)}")
     
+    def _load_bundle(self):
+        """Load and validate the bundle; the processor is compiled from its feature manifest"""
+        self.model, self.processor, manifest = load_bundle(
+            Config.MODEL_BUNDLE_PATH,
+            serving=True,
+            max_threads=Config.INFERENCE_THREADS,
+            parallel_min_rows=Config.INFERENCE_PARALLEL_MIN_ROWS,
+            verify_onnx=Config.INFERENCE_BACKEND == 'onnx',
+            arrays_max_rows=Config.COMPILED_MAX_ROWS
+        )
+        self.model_version = manifest['version']
+        self.bundle_path = manifest['path']
+        print(f"Model bundle {manifest['version']} ({manifest['model_type']}, created {manifest['created_at']}) "
+              f"loaded from {self.bundle_path}")
+    
+    def _load_onnx(self):
+        """Score through the bundle's ONNX graph, which includes feature engineering and scaling"""
+        # The graph must come from the bundle version the model was loaded from
+        onnx_path = os.path.join(self.bundle_path, ONNX_NAME) if self.bundle_path else None
+        if onnx_path is None or not os.path.exists(onnx_path):
+            print("Warning: Falling back to sklearn inference: no ONNX graph in the model bundle")
+            return
+        try:
+            self.onnx_model = OnnxPredictor(
+                onnx_path,
+                calibration=self.model.calibration,
+                threads=Config.INFERENCE_THREADS,
+                version=self.model_version
+            )
+            if self.onnx_model.n_inputs != len(self.processor.input_columns):
+                raise ValueError(f"graph takes {self.onnx_model.n_inputs} inputs, "
+                                 f"expected {len(self.processor.input_columns)}")
+            print(f"ONNX graph loaded from {onnx_path}")
+        except (ImportError, ValueError) as e:
+            self.onnx_model = None
+            print(f"Warning: Falling back to sklearn inference: {str(e)}")
+    
+    def _load_legacy_artifacts(self):
+        """Load the separate model and scaler files written before model bundles"""
+        # Prefer the memory-mapped array artifact over the pickle
+        model_path = Config.MODEL_ARRAYS_PATH if os.path.isdir(Config.MODEL_ARRAYS_PATH) else Config.MODEL_PATH
+        if os.path.exists(model_path):
+            self.model.load(
+                model_path,
+                serving=True,
+                max_threads=Config.INFERENCE_THREADS,
+                parallel_min_rows=Config.INFERENCE_PARALLEL_MIN_ROWS
+            )
+            if model_path == Config.MODEL_ARRAYS_PATH and os.path.exists(Config.MODEL_PATH):
+                self.model.attach_estimator(Config.MODEL_PATH, max_rows=Config.COMPILED_MAX_ROWS)
+            print(f"Model loaded from {model_path}")
+        
+        if os.path.exists(Config.SCALER_PATH):
+            self.processor.scaler = joblib.load(Config.SCALER_PATH)
+            self.processor.compile()
+            print(f"Scaler loaded from {Config.SCALER_PATH}")
+            
+            if self.model.version is not None:
+                self.model_version = f"{self.model.version}-{artifact_digest(Config.SCALER_PATH)}"
+    
     def predict_yield(self, input_data):
-        """Predict crop yield"""
+        """Predict crop yield
+        
+        Raises ValidationError for records that fail the input schema.
+        """
+        with metrics.timer('agri_prediction_stage_seconds', stage='validate'):
+            input_data = self.processor.schema.validate_record(input_data)
+        
         try:
-            # Prepare input
-            X_scaled = self.processor.prepare_input(input_data)
+            # Make prediction and its interval
+            prediction, lower, upper, method = self._predict_single(input_data)
             
-            # Make prediction
-            prediction = self.model.predict(X_scaled)[0]
+            with metrics.timer('agri_prediction_stage_seconds', stage='recommendations'):
+                recommendations = self._generate_recommendations(input_data, prediction)
             
-            # Calculate confidence interval (simple approach)
-            confidence = self._calculate_confidence(prediction)
+            return self._format_result(prediction, lower, upper, method, recommendations)
+        except Exception as e:
+            raise Exception(f"Prediction error: {str(e)}")
+    
+    def _predict_single(self, input_data):
+        """Score one record as (prediction, lower, upper, method), using the prediction cache when possible"""
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(self.model_version, input_data, self.processor.input_columns)
+            if key is not None:
+                scored = self.cache.get(key)
+                if scored is not None:
+                    return scored
+        
+        start = time.perf_counter()
+        if self.onnx_model is not None:
+            # The graph engineers and scales features itself, so it takes the raw row
+            with metrics.timer('agri_prediction_stage_seconds', stage='prepare_input'):
+                X_raw = self.processor.raw_input(input_data)
+            with metrics.timer('agri_prediction_stage_seconds', stage='predict'):
+                predictions, lower, upper, method = self.onnx_model.predict_interval(X_raw, self.interval_coverage)
+        else:
+            with metrics.timer('agri_prediction_stage_seconds', stage='prepare_input'):
+                X_scaled = self.processor.prepare_input(input_data)
+            with metrics.timer('agri_prediction_stage_seconds', stage='predict'):
+                predictions, lower, upper, method = self.model.predict_interval(X_scaled, self.interval_coverage)
+        scored = (float(predictions[0]), float(lower[0]), float(upper[0]), method)
+        
+        if self.shadow is not None and self.shadow.sample():
+            self.shadow.submit(input_data, predictions, time.perf_counter() - start)
+        
+        if key is not None:
+            self.cache.put(key, scored)
+        return scored
+    
+    def _format_result(self, prediction, lower, upper, method, recommendations):
+        return {
+            'predicted_yield': round(prediction, 2),
+            'unit': 'tons per hectare',
+            'confidence_interval': {
+                'lower': round(lower, 2),
+                'upper': round(upper, 2),
+                'coverage': self.interval_coverage,
+                'method': method
+            },
+            'confidence_score': self._calculate_confidence(prediction, lower, upper, method),
+            'recommendations': recommendations
+        }
+    
+    def cache_stats(self):
+        """Prediction cache counters, tagged with the model version"""
+        if self.cache is None:
+            return {'enabled': False, 'model_version': self.model_version}
+        return dict(self.cache.stats(), enabled=True, model_version=self.model_version)
+    
+    def shadow_stats(self):
+        """Primary versus shadow model comparison, tagged with both versions"""
+        if self.shadow is None:
+            return {'enabled': False, 'model_version': self.model_version}
+        return dict(self.shadow.stats(), enabled=True, model_version=self.model_version)
+    
+    def predict_batch(self, records):
+        """Predict crop yield for a batch of input records
+        
+        Invalid records are reported by their index in ``errors`` and the
+        remaining rows are scored together in a single model call.
+        """
+        try:
+            scored, errors = self._score_records(records)
+            results = [dict(index=index, **result) for index, result in scored]
             
             return {
-                'predicted_yield': round(float(prediction), 2),
-                'unit': 'tons per hectare',
-                'confidence_interval': {
-                    'lower': round(float(prediction * 0.9), 2),
-                    'upper': round(float(prediction * 1.1), 2)
-                },
-                'confidence_score': confidence,
-                'recommendations': self._generate_recommendations(input_data, prediction)
+                'predictions': results,
+                'errors': [{'index': i, 'error': errors[i]} for i in sorted(errors)],
+                'total': len(records),
+                'succeeded': len(results),
+                'failed': len(errors)
             }
+        except Exception as e:
+            raise Exception(f"Batch prediction error: {str(e)}")
+    
+    def predict_many(self, records):
+        """Answer independent single-prediction requests with one model call
+        
+        Returns one entry per record: the predict_yield result, or the
+        ValidationError predict_yield would have raised for it.
+        """
+        try:
+            scored, errors = self._score_records(records)
         except Exception as e:
             raise Exception(f"Prediction error: {str(e)}")
+        
+        answers = [None] * len(records)
+        for index, result in scored:
+            answers[index] = result
+        for index, error in errors.items():
+            answers[index] = ValidationError(error)
+        return answers
     
-    def _calculate_confidence(self, prediction):
-        """Calculate confidence score (0-100)"""
-        # Simplified confidence calculation
-        # In production, use prediction intervals from the model
+    def _score_records(self, records):
+        """Validate and score records together; returns ([(index, result)], {index: error})"""
+        X_raw, valid, errors, clean = self.processor.records_to_matrix(records)
+        indices = np.flatnonzero(valid)
+        if not len(indices):
+            return [], errors
+        
+        X_valid = X_raw[indices]
+        start = time.perf_counter()
+        if self.onnx_model is not None:
+            predictions, lower, upper, method = self.onnx_model.predict_interval(X_valid, self.interval_coverage)
+        else:
+            X_scaled = self.processor.prepare_batch(X_valid)
+            predictions, lower, upper, method = self.model.predict_interval(X_scaled, self.interval_coverage)
+        if self.shadow is not None and self.shadow.sample():
+            self.shadow.submit(X_valid, predictions, time.perf_counter() - start)
+        recommendations = self._generate_batch_recommendations(
+            [clean[i] for i in indices], X_valid, predictions
+        )
+        
+        scored = []
+        for index, prediction, row_lower, row_upper, row_recommendations in zip(
+                indices.tolist(), predictions.tolist(), lower.tolist(), upper.tolist(), recommendations):
+            scored.append((index, self._format_result(prediction, row_lower, row_upper, method, row_recommendations)))
+        return scored, errors
+    
+    def predict_stream(self, lines, batch_size=256, max_line_bytes=65536):
+        """Score newline-delimited JSON records in micro-batches, yielding results in input order
+        
+        Blank lines are skipped; lines that are not valid JSON or are too long
+        are reported by index like any other invalid record.
+        """
+        pending = []
+        index = 0
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            
+            if len(line) > max_line_bytes:
+                pending.append((index, None, f'Line exceeds {max_line_bytes} bytes'))
+            else:
+                try:
+                    pending.append((index, json.loads(line), None))
+                except ValueError:
+                    pending.append((index, None, 'Invalid JSON'))
+            index += 1
+            
+            if len(pending) >= batch_size:
+                yield from self._score_pending(pending)
+                pending = []
+        
+        if pending:
+            yield from self._score_pending(pending)
+    
+    def _score_pending(self, pending):
+        """Score one micro-batch of (index, record, parse error) entries"""
+        records = [record for _, record, error in pending if error is None]
+        results = {}
+        if records:
+            result = self.predict_batch(records)
+            results = {item['index']: item for item in result['predictions'] + result['errors']}
+        
+        position = 0
+        for index, record, error in pending:
+            if error is not None:
+                yield {'index': index, 'error': error}
+            else:
+                yield dict(results[position], index=index)
+                position += 1
+    
+    def _calculate_confidence(self, prediction, lower, upper, method):
+        """Calculate confidence score (0-100)
+        
+        Model-derived intervals score 100 minus the interval half-width as a
+        percentage of the prediction; the heuristic band keeps the old scale.
+        """
+        if method != 'heuristic':
+            relative_half_width = (upper - lower) / 2 / max(abs(prediction), 1e-9)
+            return round(min(max(100 * (1 - relative_half_width), 0.0), 100.0), 2)
+        
         base_confidence = 75
         variability_factor = min(abs(prediction) / 10, 10)
         confidence = base_confidence + variability_factor
@@ -61,42 +363,8 @@ class PredictionService:
     
     def _generate_recommendations(self, input_data, predicted_yield):
         """Generate recommendations based on input and prediction"""
-        recommendations = []
-        
-        # Rainfall recommendations
-        if input_data['rainfall_mm'] < 500:
-            recommendations.append({
-                'type': 'irrigation',
-                'priority': 'high',
-                'message': 'Low rainfall detected. Increase irrigation to maintain optimal soil moisture.'
-            })
-        
-        # Soil nutrient recommendations
-        npk_total = (input_data['soil_nitrogen'] + 
-                    input_data['soil_phosphorus'] + 
-                    input_data['soil_potassium'])
-        
-        if npk_total < 50:
-            recommendations.append({
-                'type': 'fertilizer',
-                'priority': 'high',
-                'message': 'Soil nutrient levels are low. Consider applying balanced NPK fertilizer.'
-            })
-        
-        # Soil pH recommendations
-        if input_data['soil_ph'] < 6.0 or input_data['soil_ph'] > 7.5:
-            recommendations.append({
-                'type': 'soil_management',
-                'priority': 'medium',
-                'message': f'Soil pH ({input_data["soil_ph"]}) is outside optimal range (6.0-7.5). Consider soil amendment.'
-            })
-        
-        # Yield optimization
-        if predicted_yield < 3.0:
-            recommendations.append({
-                'type': 'yield_optimization',
-                'priority': 'medium',
-                'message': 'Predicted yield is below average. Review crop management practices and consider soil testing.'
-            })
-        
-        return recommendations
\ No newline at end of file
+        return self.recommendations.evaluate(input_data, predicted_yield)
+    
+    def _generate_batch_recommendations(self, records, X_raw, predictions):
+        """Generate recommendations for a batch using column-wise masks"""
+        return self.recommendations.evaluate_batch(records, X_raw, predictions)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import json
+import string
+from functools import reduce
+import numpy as np
+from app.models.data_processor import ENGINEERED_FEATURES, _SCALAR_OPERATIONS
+
+# Each rule fires when its feature is below ``below`` or above ``above``;
+# rules are reported in table order. ``feature`` may be an input field, an
+# engineered feature or ``predicted_yield``, and the message is a format
+# template over the same names (input fields as validate_record returns them).
+DEFAULT_RULES = [
+    {
+        'type': 'irrigation',
+        'priority': 'high',
+        'feature': 'rainfall_mm',
+        'below': 500,
+        'message': 'Low rainfall detected. Increase irrigation to maintain optimal soil moisture.'
+    },
+    {
+        'type': 'fertilizer',
+        'priority': 'high',
+        'feature': 'npk_total',
+        'below': 50,
+        'message': 'Soil nutrient levels are low. Consider applying balanced NPK fertilizer.'
+    },
+    {
+        'type': 'soil_management',
+        'priority': 'medium',
+        'feature': 'soil_ph',
+        'below': 6.0,
+        'above': 7.5,
+        'message': 'Soil pH ({soil_ph}) is outside optimal range (6.0-7.5). Consider soil amendment.'
+    },
+    {
+        'type': 'yield_optimization',
+        'priority': 'medium',
+        'feature': 'predicted_yield',
+        'below': 3.0,
+        'message': 'Predicted yield is below average. Review crop management practices and consider soil testing.'
+    }
+]
+
+_ENGINEERED = {name: (operation, operands) for name, operation, operands in ENGINEERED_FEATURES}
+
+class RecommendationEngine:
+    """Evaluate a table of threshold rules over single records or whole batches
+    
+    Batches are evaluated with one boolean mask per rule, so Python work is
+    only spent building the recommendations that actually fire.
+    """
+    
+    def __init__(self, input_columns, rules=None):
+        self.input_columns = list(input_columns)
+        self._inputs = set(self.input_columns)
+        self.rules = [self._compile(rule) for rule in (DEFAULT_RULES if rules is None else rules)]
+    
+    @classmethod
+    def load(cls, input_columns, path=None):
+        """Engine for the rules in a JSON file (a list or {"rules": [...]}), or the defaults"""
+        if not path:
+            return cls(input_columns)
+        try:
+            with open(path) as f:
+                rules = json.load(f)
+            if isinstance(rules, dict):
+                rules = rules.get('rules')
+            return cls(input_columns, rules)
+        except Exception as e:
+            raise Exception(f"Recommendation rules error: {str(e)}")
+    
+    def _compile(self, rule):
+        known = set(self.input_columns) | set(_ENGINEERED) | {'predicted_yield'}
+        missing = [key for key in ('type', 'priority', 'feature', 'message') if key not in rule]
+        if missing:
+            raise ValueError(f"Rule is missing {', '.join(missing)}: {rule}")
+        if 'below' not in rule and 'above' not in rule:
+            raise ValueError(f"Rule needs a 'below' or 'above' threshold: {rule}")
+        
+        # Rewrite named placeholders as positional ones so formatting skips building a dict
+        fields, template = [], []
+        for literal, name, format_spec, conversion in string.Formatter().parse(rule['message']):
+            template.append(literal.replace('{', '{{').replace('}', '}}'))
+            if name is None:
+                continue
+            if name not in known:
+                raise ValueError(f"Unknown feature in rule {rule['type']!r}: {name}")
+            if name not in fields:
+                fields.append(name)
+            template.append('{' + str(fields.index(name)) + (f'!{conversion}' if conversion else '')
+                            + (f':{format_spec}' if format_spec else '') + '}')
+        if rule['feature'] not in known:
+            raise ValueError(f"Unknown feature in rule {rule['type']!r}: {rule['feature']}")
+        
+        return {
+            'type': rule['type'],
+            'priority': rule['priority'],
+            'feature': rule['feature'],
+            'below': float(rule['below']) if 'below' in rule else None,
+            'above': float(rule['above']) if 'above' in rule else None,
+            'message': ''.join(template) if fields else rule['message'],
+            'fields': fields
+        }
+    
+    def _value(self, name, columns, predictions, derived):
+        """Input column, prediction or engineered feature, computed once per call"""
+        if name == 'predicted_yield':
+            return predictions
+        if name in self._inputs:
+            return columns[name]
+        if name not in derived:
+            operation, operands = _ENGINEERED[name]
+            derived[name] = reduce(_SCALAR_OPERATIONS[operation],
+                                   [self._value(operand, columns, predictions, derived) for operand in operands])
+        return derived[name]
+    
+    @staticmethod
+    def _fires(rule, value):
+        """Element-wise mask of the rows a rule fires for"""
+        fired = value < rule['below'] if rule['below'] is not None else False
+        if rule['above'] is not None:
+            fired = fired | (value > rule['above'])
+        return fired
+    
+    def evaluate(self, record, predicted_yield):
+        """Recommendations for one validated record"""
+        derived = {}
+        recommendations = []
+        for rule in self.rules:
+            feature, below, above = rule['feature'], rule['below'], rule['above']
+            value = record[feature] if feature in self._inputs else self._value(feature, record, predicted_yield, derived)
+            if not ((below is not None and value < below) or (above is not None and value > above)):
+                continue
+            message = rule['message']
+            if rule['fields']:
+                message = message.format(*[
+                    record[name] if name in self._inputs else float(self._value(name, record, predicted_yield, derived))
+                    for name in rule['fields']
+                ])
+            recommendations.append({'type': rule['type'], 'priority': rule['priority'], 'message': message})
+        return recommendations
+    
+    def evaluate_batch(self, records, X_raw, predictions):
+        """Recommendations for each row of a raw input matrix (``input_columns`` order)
+        
+        records are the validated records behind the rows, whose input fields
+        are formatted into messages exactly as evaluate does.
+        """
+        columns = {name: X_raw[:, j] for j, name in enumerate(self.input_columns)}
+        predictions = np.asarray(predictions)
+        derived = {}
+        batch_recommendations = [[] for _ in range(len(X_raw))]
+        for rule in self.rules:
+            fired = np.flatnonzero(self._fires(rule, self._value(rule['feature'], columns, predictions, derived)))
+            if not len(fired):
+                continue
+            
+            rule_type, priority, message = rule['type'], rule['priority'], rule['message']
+            rows = fired.tolist()
+            if not rule['fields']:
+                for i in rows:
+                    batch_recommendations[i].append({'type': rule_type, 'priority': priority, 'message': message})
+                continue
+            
+            # Input fields are formatted as validated, anything else as a float
+            values = [
+                [records[i][name] for i in rows] if name in self._inputs
+                else self._value(name, columns, predictions, derived)[fired].tolist()
+                for name in rule['fields']
+            ]
+            for i, row_values in zip(rows, zip(*values)):
+                batch_recommendations[i].append({
+                    'type': rule_type,
+                    'priority': priority,
+                    'message': message.format(*row_values)
+                })
+        return batch_recommendations
\ No newline at end of file
@@ -0,0 +1,153 @@
+import os
+import time
+import random
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from app.models.bundle import load_bundle
+from app.services.metrics import metrics
+from app.services.statistics_cache import RunningStats
+
+def _summary(stats):
+    """Count, mean, std, min and max of a RunningStats, JSON-safe"""
+    if stats.count == 0:
+        return {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None}
+    std = stats.std
+    return {
+        'count': stats.count,
+        'mean': stats.mean,
+        'std': None if np.isnan(std) else std,
+        'min': stats.min,
+        'max': stats.max
+    }
+
+class ShadowScorer:
+    """Scores a sample of live requests with a candidate model, off the request path
+    
+    The request thread only decides whether to sample and hands the
+    validated input, the primary predictions and the primary latency to a
+    small thread pool. At most queue_size calls are pending at once; beyond
+    that work is dropped rather than queued, so a slow or overloaded shadow
+    never delays clients. Latencies and shadow-minus-primary deltas are
+    aggregated per process.
+    """
+    
+    def __init__(self, model, processor, version=None, sample_rate=0.1, workers=1, queue_size=64,
+                 coverage=0.9):
+        self.model = model
+        self.processor = processor
+        self.version = version
+        self.sample_rate = sample_rate
+        self.workers = workers
+        self.queue_size = queue_size
+        self.coverage = coverage
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._counts = {'sampled': 0, 'scored': 0, 'dropped': 0, 'failed': 0}
+        self._latency = {'primary': RunningStats(), 'shadow': RunningStats()}
+        self._latency_ratio = RunningStats()
+        self._delta = RunningStats()
+        self._abs_delta = RunningStats()
+        self._rows = 0
+    
+    @classmethod
+    def load(cls, path, input_columns, compile_model=False, **kwargs):
+        """Load a shadow model bundle that takes the same inputs as the primary model"""
+        model, processor, manifest = load_bundle(path, serving=True, max_threads=1)
+        if list(processor.input_columns) != list(input_columns):
+            raise ValueError(f"Shadow model inputs {processor.input_columns} do not match {list(input_columns)}")
+        if compile_model:
+            model.compile()
+        return cls(model, processor, version=manifest['version'], **kwargs)
+    
+    def sample(self):
+        """Decide whether the current request is shadow-scored"""
+        return random.random() < self.sample_rate
+    
+    def submit(self, inputs, primary_predictions, primary_seconds):
+        """Queue a call already answered by the primary model; returns False if it was dropped
+        
+        inputs is a validated record (scored like a single prediction) or a
+        raw input matrix (scored like a batch).
+        """
+        if self._executor_pid != os.getpid():
+            self._start_executor()
+        self._count('sampled')
+        
+        if not self._slots.acquire(blocking=False):
+            self._count('dropped')
+            return False
+        try:
+            self._executor.submit(self._score, inputs, primary_predictions, primary_seconds)
+        except RuntimeError:
+            # The pool was shut down by a model reload
+            self._slots.release()
+            self._count('dropped')
+            return False
+        return True
+    
+    def _start_executor(self):
+        """Create the pool once per process (threads do not survive a fork)"""
+        with self._lock:
+            if self._executor_pid == os.getpid():
+                return
+            self._slots = threading.BoundedSemaphore(self.queue_size)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='shadow-model')
+            self._executor_pid = os.getpid()
+    
+    def _score(self, inputs, primary_predictions, primary_seconds):
+        try:
+            start = time.perf_counter()
+            if isinstance(inputs, dict):
+                X_scaled = self.processor.prepare_input(inputs)
+            else:
+                X_scaled = self.processor.prepare_batch(inputs)
+            predictions, _, _, _ = self.model.predict_interval(X_scaled, self.coverage)
+            shadow_seconds = time.perf_counter() - start
+            
+            delta = np.asarray(predictions, dtype=np.float64) - primary_predictions
+            with self._lock:
+                self._counts['scored'] += 1
+                self._rows += len(delta)
+                self._latency['primary'].update([primary_seconds])
+                self._latency['shadow'].update([shadow_seconds])
+                self._latency_ratio.update([shadow_seconds / max(primary_seconds, 1e-9)])
+                self._delta.update(delta)
+                self._abs_delta.update(np.abs(delta))
+            metrics.inc('agri_shadow_requests_total', outcome='scored')
+            metrics.observe('agri_shadow_latency_seconds', primary_seconds, model='primary')
+            metrics.observe('agri_shadow_latency_seconds', shadow_seconds, model='shadow')
+        except Exception as e:
+            self._count('failed')
+            print(f"Warning: Shadow scoring failed: {str(e)}")
+        finally:
+            self._slots.release()
+    
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+        if name in ('dropped', 'failed'):
+            metrics.inc('agri_shadow_requests_total', outcome=name)
+    
+    def stats(self):
+        """Per-model latency (seconds per call) and prediction deltas aggregated in this process"""
+        with self._lock:
+            return dict(
+                self._counts,
+                shadow_version=self.version,
+                sample_rate=self.sample_rate,
+                rows=self._rows,
+                latency_seconds={name: _summary(stats) for name, stats in self._latency.items()},
+                latency_ratio=_summary(self._latency_ratio),
+                delta=_summary(self._delta),
+                abs_delta=_summary(self._abs_delta),
+                pid=os.getpid()
+            )
+    
+    def close(self, wait=False):
+        """Stop the pool; queued work is finished when wait is set, otherwise abandoned"""
+        # Later submits from requests still holding this service are counted as dropped
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import io
+import os
+import threading
+import numpy as np
+import pandas as pd
+from app.services.storage import CsvStore, store_for
+
+class RunningStats:
+    """Mergeable running count, mean, variance, min and max (Welford/Chan)"""
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+    
+    def update(self, values):
+        """Fold a chunk of values into the aggregate, skipping NaN"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        
+        chunk = RunningStats()
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        return self.merge(chunk)
+    
+    def merge(self, other):
+        """Combine another aggregate into this one"""
+        if other.count == 0:
+            return self
+        
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+    
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as in pandas)"""
+        if self.count < 2:
+            return np.nan
+        return float(np.sqrt(self.m2 / (self.count - 1)))
+
+class _PrefixReader(io.RawIOBase):
+    """Read-only view of the first size bytes of a file"""
+    
+    def __init__(self, f, size):
+        self._f = f
+        self._remaining = size
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        n = self._f.readinto(memoryview(buffer)[:self._remaining])
+        self._remaining -= n
+        return n
+
+class FileStatisticsCache:
+    """Per-file running statistics for one column of a CSV or columnar file
+    
+    Entries are keyed on the file's size and mtime. When a CSV has only
+    grown (its previously seen tail is unchanged), just the complete lines
+    appended since the last refresh are parsed and folded in; a partly
+    written last line is left for the next refresh. Any other change
+    triggers a full rebuild, which for columnar files reads only the
+    requested column.
+    """
+    
+    SIGNATURE_BYTES = 64
+    
+    def __init__(self, chunksize=200000):
+        self.chunksize = chunksize
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def clear(self):
+        """Forget all cached statistics"""
+        with self._lock:
+            self._entries.clear()
+    
+    def get(self, filepath, column):
+        """Return (total_records, RunningStats) for a column, refreshing if the file changed"""
+        stat = os.stat(filepath)
+        key = (filepath, column)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+                return entry['total_records'], entry['stats']
+            
+            if entry is not None and self._is_append(filepath, entry, stat):
+                entry = self._fold_appended(filepath, column, entry, stat)
+            else:
+                entry = self._rebuild(filepath, column, stat)
+            
+            self._entries[key] = entry
+            return entry['total_records'], entry['stats']
+    
+    def _rebuild(self, filepath, column, stat):
+        """Compute statistics from scratch, streaming the file in chunks"""
+        total_records = 0
+        stats = RunningStats()
+        
+        store = store_for(filepath)
+        if not isinstance(store, CsvStore):
+            for chunk in store.iter_batches(columns=[column], batch_size=self.chunksize):
+                total_records += len(chunk)
+                stats.update(chunk[column].to_numpy())
+            return self._entry(filepath, stat, stat.st_size, None, total_records, stats)
+        
+        with open(filepath, 'rb') as f:
+            header = f.readline()
+        
+        # Parse exactly stat.st_size bytes so rows appended meanwhile are left for the next refresh
+        with open(filepath, 'rb') as f:
+            reader = io.BufferedReader(_PrefixReader(f, stat.st_size))
+            for chunk in pd.read_csv(reader, usecols=[column], chunksize=self.chunksize):
+                total_records += len(chunk)
+                stats.update(chunk[column].to_numpy())
+        
+        return self._entry(filepath, stat, stat.st_size, header, total_records, stats)
+    
+    def _fold_appended(self, filepath, column, entry, stat):
+        """Parse only the complete lines appended since the last refresh"""
+        with open(filepath, 'rb') as f:
+            f.seek(entry['offset'])
+            appended = f.read(stat.st_size - entry['offset'])
+        
+        # A writer may be mid-append; its unfinished line is read once it ends
+        appended = appended[:appended.rfind(b'\n') + 1]
+        stats = RunningStats().merge(entry['stats'])
+        total_records = entry['total_records']
+        if appended:
+            names = pd.read_csv(io.BytesIO(entry['header']), nrows=0).columns
+            new_rows = pd.read_csv(io.BytesIO(appended), header=None, names=names, usecols=[column])
+            stats.update(new_rows[column].to_numpy())
+            total_records += len(new_rows)
+        
+        return self._entry(filepath, stat, entry['offset'] + len(appended), entry['header'], total_records, stats)
+    
+    def _is_append(self, filepath, entry, stat):
+        """Whether the CSV only grew after the last whole line folded into the entry"""
+        if entry['header'] is None or stat.st_size <= entry['offset'] or not entry['signature'].endswith(b'\n'):
+            return False
+        return self._signature(filepath, entry['offset']) == entry['signature']
+    
+    def _entry(self, filepath, stat, offset, header, total_records, stats):
+        """Cache entry for a file seen at stat whose statistics cover its first offset bytes"""
+        return {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'offset': offset,
+            'signature': self._signature(filepath, offset),
+            'header': header,
+            'total_records': total_records,
+            'stats': stats
+        }
+    
+    def _signature(self, filepath, size):
+        """Last bytes before offset size, used to recognise appends"""
+        with open(filepath, 'rb') as f:
+            f.seek(max(0, size - self.SIGNATURE_BYTES))
+            return f.read(min(size, self.SIGNATURE_BYTES))
+
+statistics_cache = FileStatisticsCache()
\ No newline at end of file
@@ -0,0 +1,243 @@
+import os
+import hashlib
+import operator
+import pandas as pd
+from app.services.csv_tail import read_csv_tail
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+    pq = None
+
+_FILTER_OPERATORS = {
+    '==': operator.eq, '=': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge
+}
+
+def columnar_available():
+    """Whether pyarrow is installed"""
+    return pa is not None
+
+def store_for(path):
+    """Return the store matching a file's extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        return ParquetStore(path)
+    if extension in ('.feather', '.arrow'):
+        return FeatherStore(path)
+    return CsvStore(path)
+
+def open_store(csv_path, columnar_path=None):
+    """Prefer the columnar copy when it exists and pyarrow is available, else the CSV
+    
+    A columnar copy older than the CSV is stale (rows were appended after the
+    conversion) and is ignored until it is regenerated.
+    """
+    if columnar_path and columnar_available() and os.path.exists(columnar_path):
+        if not os.path.exists(csv_path) or os.path.getmtime(columnar_path) >= os.path.getmtime(csv_path):
+            return store_for(columnar_path)
+    return CsvStore(csv_path)
+
+def convert_csv(csv_path, output_path, chunksize=100000):
+    """Convert a CSV once into Parquet (one row group per chunk) or uncompressed Feather"""
+    if not columnar_available():
+        raise ImportError("pyarrow is required for columnar storage")
+    
+    store = store_for(output_path)
+    if isinstance(store, CsvStore):
+        raise ValueError(f"Output must be a .parquet or .feather file: {output_path}")
+    
+    tmp_path = f'{output_path}.tmp'
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    writer, schema = None, None
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = store._writer(tmp_path, schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    if writer is None:
+        raise ValueError(f"No rows found in {csv_path}")
+    os.replace(tmp_path, output_path)
+    return store
+
+def _encode_cursor(store, position):
+    """Page cursor tagged with the store format and file identity, so it cannot be replayed on other data"""
+    if position is None:
+        return None
+    return f'{store.format}-{store._identity()}-{position}'
+
+def _decode_cursor(store, cursor):
+    """Position held by a cursor from _encode_cursor; raises ValueError for cursors of another file"""
+    if cursor is None:
+        return None
+    parts = str(cursor).split('-')
+    if len(parts) != 3 or not parts[2].isdigit():
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if parts[:2] != [store.format, store._identity()]:
+        raise ValueError("Cursor belongs to a different version of the data; start again without a cursor")
+    return int(parts[2])
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def _apply_filters(df, filters):
+    """Apply pyarrow-style [(column, op, value), ...] filters to a DataFrame"""
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        if op == 'in':
+            mask &= df[column].isin(value)
+        elif op == 'not in':
+            mask &= ~df[column].isin(value)
+        else:
+            mask &= _FILTER_OPERATORS[op](df[column], value)
+    return df[mask].reset_index(drop=True)
+
+class CsvStore:
+    """Historical data stored as a raw CSV file"""
+    
+    format = 'csv'
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def read(self, columns=None, filters=None):
+        """Read the whole file, optionally projected and filtered"""
+        return _apply_filters(pd.read_csv(self.path, usecols=columns), filters)
+    
+    def iter_batches(self, columns=None, batch_size=100000):
+        """Yield DataFrames of at most batch_size rows"""
+        yield from pd.read_csv(self.path, usecols=columns, chunksize=batch_size)
+    
+    def tail(self, limit, offset=0, columns=None, cursor=None):
+        """Read the last rows; the cursor wraps a byte offset, which appends leave valid"""
+        df, next_cursor = read_csv_tail(self.path, limit, offset=offset, columns=columns,
+                                        cursor=_decode_cursor(self, cursor))
+        return df, _encode_cursor(self, next_cursor)
+    
+    def _identity(self):
+        """Digest of the header and first row, which stay the same while rows are appended"""
+        with open(self.path, 'rb') as f:
+            return _digest(f.readline() + f.readline())
+
+class _ArrowStore:
+    """Shared logic for columnar files made of independently readable fragments"""
+    
+    def __init__(self, path):
+        if not columnar_available():
+            raise ImportError("pyarrow is required for columnar storage")
+        self.path = path
+    
+    def tail(self, limit, offset=0, columns=None, cursor=None):
+        """Read the last rows, touching only the fragments that hold them; the cursor wraps a row index"""
+        position = _decode_cursor(self, cursor)
+        sizes = self._fragment_sizes()
+        n_rows = sum(sizes)
+        end = n_rows if position is None else min(position, n_rows)
+        end = max(0, end - offset)
+        start = max(0, end - limit)
+        
+        fragments, first_row, position = [], None, 0
+        for index, size in enumerate(sizes):
+            if position < end and position + size > start:
+                fragments.append(index)
+                if first_row is None:
+                    first_row = position
+            position += size
+        
+        self._check_columns(columns)
+        if fragments:
+            table = self._read_fragments(fragments, columns).slice(start - first_row, end - start)
+            df = table.to_pandas()
+        else:
+            df = pd.DataFrame(columns=columns if columns else self._schema().names)
+        
+        return df, _encode_cursor(self, start if start > 0 else None)
+    
+    def _identity(self):
+        """Digest of the file's inode, size and mtime; columnar copies are replaced, never appended to"""
+        stat = os.stat(self.path)
+        return _digest(f'{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    
+    def _check_columns(self, columns):
+        names = self._schema().names
+        unknown = [column for column in columns or [] if column not in names]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+class ParquetStore(_ArrowStore):
+    """Historical data stored as Parquet, with column pruning and row-group filtering"""
+    
+    format = 'parquet'
+    
+    def read(self, columns=None, filters=None):
+        """Read the file; filters prune row groups using their statistics"""
+        return pq.read_table(self.path, columns=columns, filters=filters, memory_map=True).to_pandas()
+    
+    def iter_batches(self, columns=None, batch_size=100000):
+        """Yield DataFrames of at most batch_size rows"""
+        parquet_file = pq.ParquetFile(self.path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+    
+    def _schema(self):
+        return pq.read_schema(self.path)
+    
+    def _fragment_sizes(self):
+        metadata = pq.ParquetFile(self.path, memory_map=True).metadata
+        return [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    
+    def _read_fragments(self, indices, columns):
+        return pq.ParquetFile(self.path, memory_map=True).read_row_groups(indices, columns=columns)
+    
+    def _writer(self, path, schema):
+        return pq.ParquetWriter(path, schema)
+
+class FeatherStore(_ArrowStore):
+    """Historical data stored as uncompressed Feather (Arrow IPC), read zero-copy via mmap"""
+    
+    format = 'feather'
+    
+    def read(self, columns=None, filters=None):
+        """Read the file, optionally projected and filtered"""
+        table = self._open().read_all()
+        if columns:
+            table = table.select(columns)
+        return _apply_filters(table.to_pandas(), filters)
+    
+    def iter_batches(self, columns=None, batch_size=100000):
+        """Yield DataFrames of at most batch_size rows"""
+        reader = self._open()
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns:
+                batch = batch.select(columns)
+            for start in range(0, batch.num_rows, batch_size):
+                yield batch.slice(start, batch_size).to_pandas()
+    
+    def _open(self):
+        return pa.ipc.open_file(pa.memory_map(self.path))
+    
+    def _schema(self):
+        return self._open().schema
+    
+    def _fragment_sizes(self):
+        reader = self._open()
+        return [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+    
+    def _read_fragments(self, indices, columns):
+        reader = self._open()
+        table = pa.Table.from_batches([reader.get_batch(i) for i in indices])
+        return table.select(columns) if columns else table
+    
+    def _writer(self, path, schema):
+        return pa.ipc.new_file(path, schema)
\ No newline at end of file
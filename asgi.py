@@ -0,0 +1,100 @@
+import os
+import json
+import time
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+from app.models.schema import ValidationError
+from app.services.job_queue import job_queue
+from app.services.metrics import metrics
+from app.services.micro_batch import PredictionBatcher
+from config.config import Config
+
+PREDICT_PATH = '/api/predict'
+
+def _is_json(content_type):
+    """Whether a Content-Type header is JSON, as Flask's request.is_json decides"""
+    mimetype = content_type.split(b';')[0].strip().lower()
+    return mimetype == b'application/json' or (mimetype.startswith(b'application/') and mimetype.endswith(b'+json'))
+
+class BatchingApp:
+    """ASGI app answering POST /api/predict through the micro-batcher and every other route through Flask
+    
+    Single predictions that arrive together are scored in one model call;
+    responses keep the status codes and bodies of the Flask endpoint.
+    """
+    
+    def __init__(self, flask_app, batcher=None):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.batcher = batcher or PredictionBatcher()
+        self.batcher.init_app(flask_app)
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == PREDICT_PATH:
+            await self._predict(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                job_queue.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.batcher.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def _predict(self, scope, receive, send):
+        start = time.perf_counter()
+        headers = dict(scope['headers'])
+        body = await self._read_body(receive)
+        
+        # Like request.get_json(silent=True): anything unparseable is no record at all
+        record = None
+        if _is_json(headers.get(b'content-type', b'')):
+            try:
+                record = json.loads(body)
+            except ValueError:
+                record = None
+        
+        try:
+            status, payload = 200, {'success': True, 'data': await self.batcher.predict(record)}
+        except ValidationError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'success': False, 'error': str(e)}
+        
+        content = f"{self.flask_app.json.dumps(payload, separators=(',', ':'))}\n".encode()
+        response_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(content)).encode())]
+        if b'origin' in headers:
+            response_headers.append((b'access-control-allow-origin', b'*'))
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': content})
+        
+        metrics.inc('agri_http_requests_total', endpoint=PREDICT_PATH, method='POST', status=str(status))
+        metrics.observe('agri_http_request_duration_seconds', time.perf_counter() - start, endpoint=PREDICT_PATH)
+        if b'content-length' in headers:
+            metrics.observe('agri_http_request_size_bytes', len(body), endpoint=PREDICT_PATH)
+        metrics.observe('agri_http_response_size_bytes', len(content), endpoint=PREDICT_PATH)
+    
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+app = BatchingApp(create_app(os.getenv('FLASK_ENV', 'development')))
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    print(f"Starting Agriculture Yield Predictor (ASGI) on {Config.HOST}:{Config.PORT}")
+    print(f"Batching /api/predict over {Config.PREDICT_BATCH_WINDOW_MS} ms or {Config.PREDICT_BATCH_MAX_SIZE} requests")
+    uvicorn.run('asgi:app', host=Config.HOST, port=Config.PORT)
\ No newline at end of file
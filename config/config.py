@@ -13,13 +13,56 @@ class Config:
     # Paths
     BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
     DATA_DIR = os.path.join(BASE_DIR, 'data')
+    COLUMNAR_DATA_PATH = os.getenv('COLUMNAR_DATA_PATH', os.path.join(DATA_DIR, 'processed', 'yield_data.parquet'))
+    MODEL_BUNDLE_PATH = os.getenv('MODEL_BUNDLE_PATH', os.path.join(DATA_DIR, 'models', 'yield_predictor_bundle'))
+    # Separate artifacts from before model bundles, used when no bundle exists
     MODEL_PATH = os.getenv('MODEL_PATH', os.path.join(DATA_DIR, 'models', 'yield_predictor.pkl'))
     SCALER_PATH = os.getenv('SCALER_PATH', os.path.join(DATA_DIR, 'models', 'scaler.pkl'))
+    MODEL_ARRAYS_PATH = os.getenv('MODEL_ARRAYS_PATH', os.path.join(DATA_DIR, 'models', 'yield_predictor_arrays'))
     
     # Model parameters
     RANDOM_STATE = 42
     TEST_SIZE = 0.2
     
+    # Serving
+    MODEL_LOADING = os.getenv('MODEL_LOADING', 'lazy')  # 'lazy' or 'startup'
+    MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', 0))  # seconds between artifact checks; 0 disables
+    MODEL_RELOAD_JITTER = float(os.getenv('MODEL_RELOAD_JITTER', 5.0))  # random extra delay per check, staggers workers
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')  # enables POST /api/admin/reload
+    BATCH_MAX_RECORDS = int(os.getenv('BATCH_MAX_RECORDS', 10000))
+    INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 2))
+    INFERENCE_PARALLEL_MIN_ROWS = int(os.getenv('INFERENCE_PARALLEL_MIN_ROWS', 5000))
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'sklearn')  # 'sklearn', 'compiled' or 'onnx'
+    COMPILED_MAX_ROWS = int(os.getenv('COMPILED_MAX_ROWS', 256))  # larger batches skip flattened trees for sklearn
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 10000))  # 0 disables the cache
+    PREDICTION_CACHE_TTL = int(os.getenv('PREDICTION_CACHE_TTL', 3600))
+    PREDICTION_CACHE_DECIMALS = int(os.getenv('PREDICTION_CACHE_DECIMALS', 6))
+    PREDICTION_INTERVAL_COVERAGE = float(os.getenv('PREDICTION_INTERVAL_COVERAGE', 0.9))
+    PREDICT_BATCH_WINDOW_MS = float(os.getenv('PREDICT_BATCH_WINDOW_MS', 2.0))  # asgi.py: /api/predict batching window
+    PREDICT_BATCH_MAX_SIZE = int(os.getenv('PREDICT_BATCH_MAX_SIZE', 64))  # asgi.py: score early once this many wait
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 256))
+    STREAM_MAX_LINE_BYTES = int(os.getenv('STREAM_MAX_LINE_BYTES', 65536))
+    RECOMMENDATION_RULES_PATH = os.getenv('RECOMMENDATION_RULES_PATH')  # JSON rule table; built-in rules if unset
+
+    # Shadow model: a candidate bundle scored on a sample of requests off the request path
+    SHADOW_MODEL_PATH = os.getenv('SHADOW_MODEL_PATH')  # disabled if unset
+    SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', 0.1))
+    SHADOW_WORKERS = int(os.getenv('SHADOW_WORKERS', 1))
+    SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', 64))  # pending calls beyond this are dropped
+    
+    # Metrics; set METRICS_DIR to aggregate across worker processes
+    METRICS_DIR = os.getenv('METRICS_DIR')
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 1.0))
+    
+    # Background scoring jobs
+    JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(DATA_DIR, 'jobs'))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_CHUNK_SIZE = int(os.getenv('JOB_CHUNK_SIZE', 5000))
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 600))  # requeue running jobs idle this long
+    JOB_RECOVERY_INTERVAL = int(os.getenv('JOB_RECOVERY_INTERVAL', 60))  # seconds between scans for stale jobs
+    JOB_MAX_RECORDS = int(os.getenv('JOB_MAX_RECORDS', 1000000))
+    JOB_RESULTS_PAGE_MAX = int(os.getenv('JOB_RESULTS_PAGE_MAX', 1000))
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
@@ -27,6 +70,7 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
+    MODEL_LOADING = os.getenv('MODEL_LOADING', 'startup')
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,30 @@
+import gc
+import os
+import logging
+import tempfile
+
+# Workers share metrics through per-process snapshots in this directory
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'agri-ai-metrics'))
+
+from app.services.model_registry import process_memory
+from app.services.metrics import metrics
+from app.services.job_queue import job_queue
+
+logger = logging.getLogger('gunicorn.error')
+
+def on_starting(server):
+    """Start each server with empty metrics instead of a previous run's snapshots"""
+    metrics.reset()
+
+def pre_fork(server, worker):
+    """Move preloaded objects out of the GC's reach so workers keep pages shared"""
+    gc.freeze()
+
+def post_worker_init(worker):
+    """Resume pending scoring jobs and report the memory footprint of each worker once it is ready to serve"""
+    job_queue.start()
+    memory = process_memory()
+    logger.info(
+        f"Worker {worker.pid} booted (rss {memory['rss_mb']} MB, "
+        f"pss {memory['pss_mb']} MB, private {memory['private_mb']} MB)"
+    )
\ No newline at end of file
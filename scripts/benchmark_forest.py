@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.ml_model import YieldPredictor
+from app.models.data_processor import DataProcessor
+from app.models.flat_forest import FlatForest
+from scripts.generate_sample_data import generate_sample_data
+from scripts.benchmark_utils import time_callable, format_timing
+
+def benchmark_forest(batch_sizes=(1, 32, 1000, 100000), n_samples=5000):
+    """Compare sklearn and FlatForest prediction latency across batch sizes"""
+    print(f"Training random forest on {n_samples} samples...")
+    processor = DataProcessor()
+    X, y = processor.preprocess(generate_sample_data(n_samples), fit=True)
+    model = YieldPredictor(model_type='random_forest')
+    model.train(X, y)
+    model.configure_serving(max_threads=1)
+    
+    flat = FlatForest.from_estimator(model.model)
+    print(f"{flat.n_trees} trees, {len(flat.feature)} nodes, max depth {flat.max_depth}\n")
+    
+    rng = np.random.RandomState(0)
+    for batch_size in batch_sizes:
+        X_batch = X[rng.randint(0, len(X), batch_size)]
+        max_error = np.abs(flat.predict(X_batch) - model.model.predict(X_batch)).max()
+        
+        repeat = max(3, min(200, 200000 // batch_size))
+        warmup = max(1, repeat // 10)
+        sklearn_stats = time_callable(lambda: model.model.predict(X_batch), warmup, repeat)
+        flat_stats = time_callable(lambda: flat.predict(X_batch), warmup, repeat)
+        
+        print(format_timing(f'sklearn     batch {batch_size}', sklearn_stats))
+        print(format_timing(f'flat forest batch {batch_size}', flat_stats))
+        print(f"  speedup (p50) {sklearn_stats['p50_us'] / flat_stats['p50_us']:.1f}x, max |diff| {max_error:.2e}\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the flattened forest evaluator')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 1000, 100000])
+    parser.add_argument('--samples', type=int, default=5000)
+    args = parser.parse_args()
+    benchmark_forest(args.batch_sizes, args.samples)
\ No newline at end of file
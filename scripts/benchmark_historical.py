@@ -0,0 +1,40 @@
+import os
+import sys
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.csv_tail import read_csv_tail
+from scripts.generate_sample_data import generate_sample_data
+from scripts.benchmark_utils import time_callable, format_timing
+
+def benchmark_historical(sizes=(10000, 1000000, 10000000), limit=100):
+    """Compare full-parse tail against the seeking tail reader at several file sizes"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n_rows in sizes:
+            filepath = os.path.join(tmpdir, f'history_{n_rows}.csv')
+            generate_sample_data(n_rows).to_csv(filepath, index=False)
+            size_mb = os.path.getsize(filepath) / (1024 * 1024)
+            
+            repeat = 3 if n_rows >= 1000000 else 20
+            full = time_callable(lambda: pd.read_csv(filepath).tail(limit).to_dict('records'), 1, repeat)
+            tail = time_callable(lambda: read_csv_tail(filepath, limit)[0].to_dict('records'), 5, 200)
+            projected = time_callable(
+                lambda: read_csv_tail(filepath, limit, columns=['yield_tons_per_hectare'])[0].to_dict('records'), 5, 200
+            )
+            
+            print(f"{n_rows} rows ({size_mb:.0f} MB), last {limit} records")
+            print(format_timing('  read_csv + tail', full))
+            print(format_timing('  read_csv_tail', tail))
+            print(format_timing('  read_csv_tail (1 column)', projected))
+            print(f"  speedup (p50) {full['p50_us'] / tail['p50_us']:.0f}x\n")
+            os.remove(filepath)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark historical data reads')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 1000000, 10000000])
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+    benchmark_historical(args.sizes, args.limit)
\ No newline at end of file
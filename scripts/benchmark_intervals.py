@@ -0,0 +1,55 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.ml_model import YieldPredictor
+from app.models.data_processor import DataProcessor
+from scripts.generate_sample_data import generate_sample_data
+from scripts.benchmark_utils import time_callable, format_timing
+
+def benchmark_intervals(batch_sizes=(1, 32, 1000, 100000), n_samples=5000, coverage=0.9):
+    """Compare point prediction latency with prediction plus interval, and report interval coverage"""
+    print(f"Training models on {n_samples} samples...")
+    processor = DataProcessor()
+    X, y = processor.preprocess(generate_sample_data(n_samples * 2), fit=True)
+    X_train, X_test, y_train, y_test = X[:n_samples], X[n_samples:], y[:n_samples], y[n_samples:]
+    
+    forest = YieldPredictor('random_forest')
+    forest.train(X_train, y_train, X_test, y_test)
+    forest.configure_serving(max_threads=1)
+    compiled = YieldPredictor('random_forest')
+    compiled.model, compiled.is_trained = forest.model, True
+    compiled.compile()
+    boosting = YieldPredictor('hist_gradient_boosting')
+    boosting.train(X_train, y_train, X_test, y_test)
+    
+    print(f"\n{'model':<24} {'method':<16} {'coverage':>9} {'mean width':>11}")
+    for name, model in [('random_forest', forest), ('hist_gradient_boosting', boosting)]:
+        predictions, lower, upper, method = model.predict_interval(X_test, coverage)
+        covered = np.mean((y_test >= lower) & (y_test <= upper))
+        print(f"{name:<24} {method:<16} {covered:>9.3f} {np.mean(upper - lower):>11.3f}")
+    print()
+    
+    rng = np.random.RandomState(0)
+    for batch_size in batch_sizes:
+        X_batch = X[rng.randint(0, len(X), batch_size)]
+        repeat = max(3, min(200, 200000 // batch_size))
+        warmup = max(1, repeat // 10)
+        
+        for name, model in [('sklearn', forest), ('compiled', compiled), ('hgb', boosting)]:
+            point = time_callable(lambda: model.predict(X_batch), warmup, repeat)
+            interval = time_callable(lambda: model.predict_interval(X_batch, coverage), warmup, repeat)
+            print(format_timing(f'{name:<8} point    batch {batch_size}', point))
+            print(format_timing(f'{name:<8} interval batch {batch_size}', interval))
+            print(f"  overhead (p50) {interval['p50_us'] / point['p50_us'] - 1:+.0%}\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark model-derived prediction intervals')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 1000, 100000])
+    parser.add_argument('--samples', type=int, default=5000)
+    parser.add_argument('--coverage', type=float, default=0.9)
+    args = parser.parse_args()
+    benchmark_intervals(args.batch_sizes, args.samples, args.coverage)
\ No newline at end of file
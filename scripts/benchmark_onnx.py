@@ -0,0 +1,69 @@
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.ml_model import YieldPredictor
+from app.models.data_processor import DataProcessor
+from app.models.onnx_model import OnnxPredictor, onnx_export_available, onnx_runtime_available
+from scripts.generate_sample_data import generate_sample_data
+from scripts.benchmark_utils import time_callable, format_timing
+
+def benchmark_onnx(batch_sizes=(1, 32, 1000, 100000), n_samples=5000, n_estimators=200, threads=(1, 2)):
+    """Compare the sklearn, compiled and ONNX backends from raw inputs to predictions with intervals"""
+    if not (onnx_export_available() and onnx_runtime_available()):
+        raise SystemExit("skl2onnx and onnxruntime are required for this benchmark")
+    
+    print(f"Training random forest on {n_samples} samples ({n_estimators} trees)...")
+    processor = DataProcessor()
+    df = generate_sample_data(n_samples)
+    X, y = processor.preprocess(df, fit=True)
+    processor.compile()
+    X_raw = df[processor.input_columns].to_numpy(dtype=np.float64)
+    
+    model = YieldPredictor('random_forest', params={'n_estimators': n_estimators})
+    model.train(X, y)
+    model.configure_serving(max_threads=1)
+    compiled = YieldPredictor('random_forest')
+    compiled.model, compiled.is_trained = model.model, True
+    compiled.compile()
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'model.onnx')
+        model.export_onnx(path, processor)
+        print(f"ONNX graph: {os.path.getsize(path) / 1e6:.1f} MB\n")
+        backends = [
+            ('sklearn', lambda X_batch: model.predict_interval(processor.prepare_batch(X_batch))),
+            ('compiled', lambda X_batch: compiled.predict_interval(processor.prepare_batch(X_batch)))
+        ]
+        for n_threads in threads:
+            onnx_model = OnnxPredictor(path, threads=n_threads)
+            backends.append((f'onnx x{n_threads}', onnx_model.predict_interval))
+        
+        rng = np.random.RandomState(0)
+        for batch_size in batch_sizes:
+            X_batch = X_raw[rng.randint(0, len(X_raw), batch_size)]
+            repeat = max(3, min(200, 200000 // batch_size))
+            warmup = max(1, repeat // 10)
+            
+            reference = backends[0][1](X_batch)[0]
+            baseline = None
+            for name, predict_interval in backends:
+                max_error = np.abs(predict_interval(X_batch)[0] - reference).max()
+                stats = time_callable(lambda: predict_interval(X_batch), warmup, repeat)
+                baseline = baseline or stats['p50_us']
+                print(format_timing(f'{name:<9} batch {batch_size}', stats))
+                print(f"  vs sklearn (p50) {baseline / stats['p50_us']:.1f}x, max |diff| {max_error:.2e}")
+            print()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the ONNX inference backend against sklearn')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 1000, 100000])
+    parser.add_argument('--samples', type=int, default=5000)
+    parser.add_argument('--trees', type=int, default=200)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2])
+    args = parser.parse_args()
+    benchmark_onnx(args.batch_sizes, args.samples, args.trees, args.threads)
\ No newline at end of file
@@ -0,0 +1,36 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.data_processor import DataProcessor
+from scripts.generate_sample_data import generate_sample_data
+from scripts.benchmark_utils import time_callable, format_timing
+
+def benchmark_prepare_input(repeat=5000):
+    """Compare the pandas and compiled single-row inference paths"""
+    df = generate_sample_data(1000)
+    
+    processor = DataProcessor()
+    processor.preprocess(df.copy(), fit=True)
+    record = df.drop(columns=['yield_tons_per_hectare']).iloc[0].to_dict()
+    
+    pandas_stats = time_callable(lambda: processor.prepare_input(record), repeat=repeat)
+    expected = processor.prepare_input(record)
+    
+    processor.compile()
+    compiled_stats = time_callable(lambda: processor.prepare_input(record), repeat=repeat)
+    actual = processor.prepare_input(record)
+    
+    print(format_timing('prepare_input (pandas)', pandas_stats))
+    print(format_timing('prepare_input (compiled)', compiled_stats))
+    print(f"Speedup (p50): {pandas_stats['p50_us'] / compiled_stats['p50_us']:.1f}x")
+    print(f"Bit-identical: {np.array_equal(expected, actual)}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark DataProcessor.prepare_input')
+    parser.add_argument('--repeat', type=int, default=5000)
+    args = parser.parse_args()
+    benchmark_prepare_input(args.repeat)
\ No newline at end of file
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+import joblib
+import numpy as np
+import sklearn
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from app.models.ml_model import YieldPredictor
+from app.models.data_processor import DataProcessor
+from scripts.generate_sample_data import generate_sample_data
+from scripts.benchmark_utils import time_callable, format_timing
+
+def _metadata(args):
+    """Describe the environment so runs are only compared like for like"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'args': vars(args)
+    }
+
+def _build_artifacts(workdir, n_samples, n_estimators):
+    """Train throwaway model artifacts and point Config at them"""
+    processor = DataProcessor()
+    X, y = processor.preprocess(generate_sample_data(n_samples), fit=True)
+    model = YieldPredictor(model_type='random_forest', params={'n_estimators': n_estimators})
+    model.train(X, y)
+    
+    models_dir = os.path.join(workdir, 'models')
+    os.makedirs(models_dir)
+    Config.MODEL_PATH = os.path.join(models_dir, 'yield_predictor.pkl')
+    Config.SCALER_PATH = os.path.join(models_dir, 'scaler.pkl')
+    Config.MODEL_ARRAYS_PATH = os.path.join(models_dir, 'yield_predictor_arrays')
+    # Keep a real model bundle from taking precedence over the throwaway artifacts
+    Config.MODEL_BUNDLE_PATH = os.path.join(models_dir, 'missing_bundle')
+    model.save(Config.MODEL_PATH)
+    model.save_arrays(Config.MODEL_ARRAYS_PATH)
+    joblib.dump(processor.scaler, Config.SCALER_PATH)
+
+def _write_history(workdir, n_rows):
+    """Write a synthetic history CSV and return its data directory"""
+    data_dir = os.path.join(workdir, f'data_{n_rows}')
+    os.makedirs(os.path.join(data_dir, 'raw'))
+    generate_sample_data(n_rows).to_csv(os.path.join(data_dir, 'raw', 'sample_data.csv'), index=False)
+    return data_dir
+
+def run_suite(args):
+    """Run every benchmark case and return {case: timing stats}"""
+    results = {}
+    
+    def record(name, func, warmup=None, repeat=None):
+        stats = time_callable(func, args.warmup if warmup is None else warmup,
+                              args.repeat if repeat is None else repeat)
+        results[name] = stats
+        print(format_timing(name, stats))
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Training throwaway model on {args.samples} samples ({args.trees} trees)...")
+        _build_artifacts(workdir, args.samples, args.trees)
+        Config.COLUMNAR_DATA_PATH = os.path.join(workdir, 'missing.parquet')
+        Config.METRICS_DIR = None
+        Config.JOBS_DIR = os.path.join(workdir, 'jobs')
+        records = generate_sample_data(1000).drop(columns=['yield_tons_per_hectare']).to_dict('records')
+        
+        # Imported after Config points at the throwaway artifacts
+        from app import create_app
+        from app.services.prediction_service import PredictionService
+        from app.services.data_service import DataService
+        from app.services.statistics_cache import statistics_cache
+        
+        # Model load
+        record('load_pickle', lambda: YieldPredictor().load(Config.MODEL_PATH, serving=True), 1, args.load_repeat)
+        record('load_arrays', lambda: YieldPredictor().load(Config.MODEL_ARRAYS_PATH, serving=True), 1,
+               args.load_repeat)
+        record('load_prediction_service', PredictionService, 1, args.load_repeat)
+        
+        # Single predictions; distinct inputs so the prediction cache only helps the cached case
+        Config.PREDICTION_CACHE_SIZE = 0
+        service = PredictionService()
+        inputs = itertools.cycle(records)
+        record('predict_yield', lambda: service.predict_yield(next(inputs)))
+        
+        app = create_app('development')
+        client = app.test_client()
+        record('api_predict', lambda: client.post('/api/predict', json=next(inputs)))
+        
+        Config.PREDICTION_CACHE_SIZE = 10000
+        cached_service = PredictionService()
+        record('predict_yield_cached', lambda: cached_service.predict_yield(records[0]))
+        
+        # History reads at several file sizes
+        for n_rows in args.file_sizes:
+            data_service = DataService()
+            data_service.data_dir = _write_history(workdir, n_rows)
+            record(f'statistics_cold_{n_rows}',
+                   lambda: (statistics_cache.clear(), data_service.get_statistics()), 1, args.load_repeat)
+            record(f'statistics_{n_rows}', data_service.get_statistics)
+            record(f'historical_100_{n_rows}', lambda: data_service.get_historical_data(100))
+    
+    return results
+
+def compare(results, baseline, threshold):
+    """Print p50 ratios against a baseline run and return the regressed cases"""
+    regressions = []
+    print(f"\n{'case':<36} {'baseline p50':>14} {'current p50':>14} {'ratio':>7}")
+    for name, stats in results.items():
+        if name not in baseline:
+            print(f"{name:<36} {'-':>14} {stats['p50_us']:>11.1f} us {'new':>7}")
+            continue
+        ratio = stats['p50_us'] / baseline[name]['p50_us']
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<36} {baseline[name]['p50_us']:>11.1f} us {stats['p50_us']:>11.1f} us {ratio:>7.2f}{flag}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the serving path and check for regressions')
+    parser.add_argument('--samples', type=int, default=5000, help='Training samples for the throwaway model')
+    parser.add_argument('--trees', type=int, default=200, help='Trees in the throwaway forest')
+    parser.add_argument('--file-sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='History file sizes (rows) for the DataService cases')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=300)
+    parser.add_argument('--load-repeat', type=int, default=5, help='Repeats for the load and cold cases')
+    parser.add_argument('--output', default=None, help='Write results as JSON')
+    parser.add_argument('--compare', default=None, help='Baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed fractional p50 slowdown before a case counts as a regression')
+    args = parser.parse_args()
+    
+    results = run_suite(args)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'metadata': _metadata(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        baseline_args = {k: v for k, v in baseline['metadata']['args'].items() if k not in ('output', 'compare')}
+        current_args = {k: v for k, v in vars(args).items() if k not in ('output', 'compare')}
+        if baseline_args != current_args or baseline['metadata']['cpu_count'] != os.cpu_count():
+            print("\nWarning: baseline was recorded with different arguments or hardware")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}: "
+                  f"{', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
\ No newline at end of file
@@ -0,0 +1,78 @@
+import time
+import resource
+from contextlib import contextmanager
+import numpy as np
+
+def time_callable(func, warmup=50, repeat=1000):
+    """Time repeated calls of func and return latency statistics in microseconds"""
+    for _ in range(warmup):
+        func()
+    
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings[i] = time.perf_counter() - start
+    
+    timings *= 1e6
+    return {
+        'mean_us': float(timings.mean()),
+        'p50_us': float(np.percentile(timings, 50)),
+        'p99_us': float(np.percentile(timings, 99)),
+        'min_us': float(timings.min()),
+        'repeat': repeat
+    }
+
+def _reset_peak_rss():
+    """Reset this process' peak RSS counter where the kernel allows it"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class StageTimer:
+    """Record wall time and peak memory for the named stages of a script"""
+    
+    def __init__(self):
+        self.stages = []
+    
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one stage"""
+        _reset_peak_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                'stage': name,
+                'seconds': time.perf_counter() - start,
+                'peak_rss_mb': peak_rss_mb(),
+                # Largest finished worker process so far; not reset between stages
+                'children_peak_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            })
+    
+    def report(self):
+        """Format the recorded stages as a table"""
+        lines = [f"{'stage':<24} {'wall s':>10} {'peak RSS MB':>12} {'worker peak MB':>15}"]
+        for stage in self.stages:
+            lines.append(f"{stage['stage']:<24} {stage['seconds']:>10.2f} "
+                         f"{stage['peak_rss_mb']:>12.1f} {stage['children_peak_rss_mb']:>15.1f}")
+        return "\n".join(lines)
+
+def format_timing(name, stats):
+    """Format a timing result as a single report line"""
+    return (f"{name:<40} mean {stats['mean_us']:>10.1f} us  "
+            f"p50 {stats['p50_us']:>10.1f} us  p99 {stats['p99_us']:>10.1f} us")
\ No newline at end of file
@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.ml_model import MODEL_CLASSES, YieldPredictor
+from app.models.data_processor import DataProcessor
+from scripts.generate_sample_data import generate_sample_data
+from scripts.benchmark_utils import time_callable
+
+def compare_models(model_types=tuple(MODEL_CLASSES), n_samples=20000):
+    """Compare training time, single-row latency, artifact size and RMSE across model types"""
+    print(f"Generating {n_samples} samples...")
+    processor = DataProcessor()
+    X, y = processor.preprocess(generate_sample_data(n_samples), fit=True)
+    X_train, X_test, y_train, y_test = processor.split_data(X, y)
+    
+    results = []
+    for model_type in model_types:
+        print(f"Training {model_type}...")
+        model = YieldPredictor(model_type=model_type)
+        
+        start = time.perf_counter()
+        metrics = model.train(X_train, y_train, X_test, y_test)
+        train_seconds = time.perf_counter() - start
+        
+        model.configure_serving(max_threads=1)
+        row = X_test[:1]
+        latency = time_callable(lambda: model.predict(row), warmup=20, repeat=500)
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'model.pkl')
+            model.save(path)
+            size_mb = os.path.getsize(path) / 1e6
+        
+        results.append((model_type, train_seconds, latency['p50_us'], latency['p99_us'], size_mb, metrics['rmse']))
+    
+    print(f"\n{'model':<24} {'train s':>9} {'p50 us':>9} {'p99 us':>9} {'size MB':>9} {'rmse':>8}")
+    for model_type, train_seconds, p50, p99, size_mb, rmse in results:
+        print(f"{model_type:<24} {train_seconds:>9.2f} {p50:>9.1f} {p99:>9.1f} {size_mb:>9.2f} {rmse:>8.4f}")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the supported model types')
+    parser.add_argument('--model-types', nargs='+', default=list(MODEL_CLASSES), choices=list(MODEL_CLASSES))
+    parser.add_argument('--samples', type=int, default=20000)
+    args = parser.parse_args()
+    compare_models(args.model_types, args.samples)
\ No newline at end of file
@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.storage import convert_csv
+from config.config import Config
+
+def convert_to_columnar(output_path=None, chunksize=100000):
+    """Convert the raw historical CSV to the columnar store read by training and the API"""
+    csv_path = os.path.join(Config.DATA_DIR, 'raw', 'sample_data.csv')
+    output_path = output_path or Config.COLUMNAR_DATA_PATH
+    
+    print(f"Converting {csv_path} -> {output_path}")
+    start = time.perf_counter()
+    convert_csv(csv_path, output_path, chunksize=chunksize)
+    elapsed = time.perf_counter() - start
+    
+    csv_mb = os.path.getsize(csv_path) / (1024 * 1024)
+    output_mb = os.path.getsize(output_path) / (1024 * 1024)
+    print(f"Done in {elapsed:.1f}s ({csv_mb:.1f} MB CSV -> {output_mb:.1f} MB)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert historical data to Parquet or Feather')
+    parser.add_argument('--output', help='Output path (.parquet or .feather); defaults to COLUMNAR_DATA_PATH')
+    parser.add_argument('--chunksize', type=int, default=100000,
+                        help='Rows per Parquet row group / Feather record batch')
+    args = parser.parse_args()
+    convert_to_columnar(args.output, args.chunksize)
\ No newline at end of file
@@ -9,23 +9,26 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.models.ml_model import YieldPredictor
 from app.models.data_processor import DataProcessor
+from app.models.bundle import load_bundle
+from app.services.storage import open_store
 from config.config import Config
 
 def evaluate_model():
     """Evaluate the trained model"""
     print("Loading model and data...")
     
-    # Initialize
-    processor = DataProcessor()
-    model = YieldPredictor()
-    
-    # Load model and scaler
-    model.load(Config.MODEL_PATH)
-    processor.scaler = joblib.load(Config.SCALER_PATH)
+    # Load model and scaler, from the bundle when there is one
+    if os.path.isdir(Config.MODEL_BUNDLE_PATH):
+        model, processor, _ = load_bundle(Config.MODEL_BUNDLE_PATH, prefer_arrays=False)
+    else:
+        processor = DataProcessor()
+        model = YieldPredictor()
+        model.load(Config.MODEL_PATH)
+        processor.scaler = joblib.load(Config.SCALER_PATH)
     
     # Load data
     data_path = os.path.join(Config.DATA_DIR, 'raw', 'sample_data.csv')
-    df = processor.load_data(data_path)
+    df = open_store(data_path, Config.COLUMNAR_DATA_PATH).read()
     
     # Preprocess
     X, y = processor.preprocess(df, fit=False)
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.ml_model import YieldPredictor
+from app.models.data_processor import DataProcessor
+from scripts.generate_sample_data import generate_sample_data
+
+def _train(n_samples):
+    """Train a production-sized forest and return it with a pool of input rows"""
+    processor = DataProcessor()
+    X, y = processor.preprocess(generate_sample_data(n_samples), fit=True)
+    model = YieldPredictor(model_type='random_forest')
+    model.train(X, y)
+    return model, X
+
+def _worker(model, X, serving, n_requests, seed, results):
+    """Issue sequential single-row predictions the way one gunicorn worker would"""
+    if serving:
+        model.configure_serving(max_threads=1)
+    else:
+        model.model.set_params(n_jobs=-1)
+    
+    rng = np.random.RandomState(seed)
+    rows = rng.randint(0, len(X), n_requests)
+    latencies = np.empty(n_requests)
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        model.predict(X[row:row + 1])
+        latencies[i] = time.perf_counter() - start
+    results.put(latencies)
+
+def run_load_test(workers=4, requests_per_worker=200, n_samples=2000, batch_rows=100000, threads=4):
+    """Compare single-row latency under concurrent workers before and after serving mode"""
+    print(f"Training model on {n_samples} samples...")
+    model, X = _train(n_samples)
+    
+    # Plain (non-daemonic) processes, like gunicorn workers, so joblib keeps its thread pool
+    ctx = multiprocessing.get_context('fork')
+    for label, serving in [('before (n_jobs=-1)', False), ('after (serving mode)', True)]:
+        results = ctx.Queue()
+        processes = [
+            ctx.Process(target=_worker, args=(model, X, serving, requests_per_worker, seed, results))
+            for seed in range(workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        latencies = np.concatenate([results.get() for _ in processes]) * 1000
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+        print(f"{label:<22} workers {workers}  p50 {np.percentile(latencies, 50):8.2f} ms  "
+              f"p99 {np.percentile(latencies, 99):8.2f} ms  throughput {len(latencies) / elapsed:8.1f} req/s")
+    
+    X_batch = X[np.random.RandomState(0).randint(0, len(X), batch_rows)]
+    for label, max_threads in [('batch, 1 thread', 1), (f'batch, {threads} threads', threads)]:
+        model.configure_serving(max_threads=max_threads, parallel_min_rows=1000)
+        start = time.perf_counter()
+        model.predict(X_batch)
+        print(f"{label:<22} rows {batch_rows}  {time.perf_counter() - start:8.3f} s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test single-row inference under concurrent workers')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--batch-rows', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+    run_load_test(args.workers, args.requests, args.samples, args.batch_rows, args.threads)
\ No newline at end of file
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from app.models.ml_model import YieldPredictor
+from app.models.data_processor import DataProcessor
+from app.models.bundle import save_bundle
+from scripts.generate_sample_data import generate_sample_data
+
+def _build_bundle(workdir, n_samples, n_estimators):
+    """Train a throwaway forest and write it as a model bundle"""
+    processor = DataProcessor()
+    X, y = processor.preprocess(generate_sample_data(n_samples), fit=True)
+    model = YieldPredictor(model_type='random_forest', params={'n_estimators': n_estimators})
+    model.train(X, y)
+    path = os.path.join(workdir, 'bundle')
+    save_bundle(path, model, processor)
+    return path
+
+def _start_server(kind, port, workers, workdir, env):
+    """Start the sync gunicorn or the ASGI server and wait until it answers"""
+    if kind == 'gunicorn (sync)':
+        command = ['gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+                   '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--timeout', '120', '--preload',
+                   'run:app']
+    else:
+        command = ['uvicorn', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(workers), '--log-level', 'warning', '--no-access-log', 'asgi:app']
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"{kind} did not start on port {port}")
+
+async def _client(port, bodies, deadline, latencies, failures):
+    """Send single predictions back to back, one connection per request, until the deadline"""
+    i = 0
+    while time.perf_counter() < deadline:
+        body = bodies[i % len(bodies)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'POST /api/predict HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                         b'Connection: close\r\nContent-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 60)
+            writer.close()
+            ok = response.startswith(b'HTTP/1.1 200')
+        except (OSError, asyncio.TimeoutError):
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            failures.append(1)
+
+async def _run_clients(port, bodies, clients, duration):
+    latencies, failures = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*[_client(port, bodies, deadline, latencies, failures) for _ in range(clients)])
+    return np.array(latencies) * 1000, len(failures)
+
+def run_load_test(clients=(50, 100, 200, 500), duration=10.0, workers=4, n_samples=5000, n_estimators=200,
+                  window_ms=2.0, max_batch=64, port=5051):
+    """Compare /api/predict throughput of the sync gunicorn and the micro-batching ASGI servers"""
+    records = generate_sample_data(1000).drop(columns=['yield_tons_per_hectare']).to_dict('records')
+    bodies = [json.dumps(record).encode() for record in records]
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Training throwaway model on {n_samples} samples ({n_estimators} trees)...")
+        env = dict(
+            os.environ,
+            PYTHONPATH=ROOT,
+            MODEL_BUNDLE_PATH=_build_bundle(workdir, n_samples, n_estimators),
+            MODEL_LOADING='startup',
+            FLASK_ENV='production',
+            PREDICTION_CACHE_SIZE='0',
+            METRICS_DIR=os.path.join(workdir, 'metrics'),
+            JOBS_DIR=os.path.join(workdir, 'jobs'),
+            PREDICT_BATCH_WINDOW_MS=str(window_ms),
+            PREDICT_BATCH_MAX_SIZE=str(max_batch)
+        )
+        
+        print(f"{workers} workers, {duration:.0f}s per run, batching window {window_ms} ms / {max_batch} requests\n")
+        for kind in ['gunicorn (sync)', 'asgi (micro-batching)']:
+            process = _start_server(kind, port, workers, workdir, env)
+            try:
+                asyncio.run(_run_clients(port, bodies, min(clients), 2.0))  # warm up
+                for n_clients in clients:
+                    latencies, failures = asyncio.run(_run_clients(port, bodies, n_clients, duration))
+                    p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (np.nan, np.nan)
+                    print(f"{kind:<22} clients {n_clients:>4}  throughput {len(latencies) / duration:8.1f} req/s  "
+                          f"p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  failed {failures}")
+            finally:
+                process.terminate()
+                process.wait()
+            print()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare /api/predict throughput of the WSGI and ASGI servers')
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 100, 200, 500])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--samples', type=int, default=5000)
+    parser.add_argument('--trees', type=int, default=200)
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--port', type=int, default=5051)
+    args = parser.parse_args()
+    run_load_test(args.clients, args.duration, args.workers, args.samples, args.trees, args.window_ms,
+                  args.max_batch, args.port)
\ No newline at end of file
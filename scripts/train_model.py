@@ -1,41 +1,72 @@
 import os
 import sys
+import json
+import argparse
 import joblib
 import pandas as pd
+from joblib.externals.loky import get_reusable_executor
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.models.ml_model import YieldPredictor
+from app.models.ml_model import MODEL_CLASSES, YieldPredictor, artifact_digest
+from app.models.bundle import save_bundle
 from app.models.data_processor import DataProcessor
+from app.services.storage import open_store
 from config.config import Config
+from scripts.benchmark_utils import StageTimer
 
-def train_model():
+def train_model(export_arrays=False, streaming=False, chunksize=100000, cv_jobs=-1, params_path=None,
+                model_type=None, legacy_artifacts=False, export_onnx=False):
     """Train the yield prediction model"""
     print("Starting model training...")
+    timer = StageTimer()
     
     # Initialize
     processor = DataProcessor()
-    model = YieldPredictor(model_type='random_forest')
+    params = None
+    if params_path:
+        with open(params_path) as f:
+            tuned = json.load(f)
+        if model_type and model_type != tuned['model_type']:
+            raise ValueError(f"Model type {model_type} does not match the tuned {tuned['model_type']} parameters")
+        model_type, params = tuned['model_type'], tuned['params']
+        print(f"Using {model_type} parameters from {params_path}: {params}")
+    model_type = model_type or 'random_forest'
+    model = YieldPredictor(model_type=model_type, params=params)
     
     # Load data
     data_path = os.path.join(Config.DATA_DIR, 'raw', 'sample_data.csv')
-    print(f"Loading data from {data_path}")
-    df = processor.load_data(data_path)
-    print(f"Loaded {len(df)} records")
+    store = open_store(data_path, Config.COLUMNAR_DATA_PATH)
+    print(f"Loading data from {store.path}")
+    if streaming:
+        # Out-of-core: never hold the raw table, only the float32 feature matrix
+        print(f"Streaming in chunks of {chunksize} rows...")
+        with timer.stage('load + preprocess'):
+            X, y = processor.preprocess_batches(lambda: store.iter_batches(batch_size=chunksize))
+        print(f"Loaded {len(X)} records")
+    else:
+        with timer.stage('load'):
+            df = store.read()
+        print(f"Loaded {len(df)} records")
     
-    # Preprocess
-    print("Preprocessing data...")
-    X, y = processor.preprocess(df, fit=True)
+        # Preprocess
+        print("Preprocessing data...")
+        with timer.stage('preprocess'):
+            X, y = processor.preprocess(df, fit=True)
+            del df
     
     # Split data
-    X_train, X_test, y_train, y_test = processor.split_data(X, y)
+    with timer.stage('split'):
+        X_train, X_test, y_train, y_test = processor.split_data(X, y)
+        del X, y
     print(f"Training set: {len(X_train)} samples")
     print(f"Test set: {len(X_test)} samples")
     
     # Train model
     print("Training model...")
-    metrics = model.train(X_train, y_train, X_test, y_test)
+    with timer.stage('train'):
+        metrics = model.train(X_train, y_train, X_test, y_test)
     
     # Print metrics
     print("\n" + "="*50)
@@ -46,11 +77,14 @@ def train_model():
     
     # Cross-validation
     print("\nPerforming cross-validation...")
-    cv_metrics = model.cross_validate(X_train, y_train)
+    with timer.stage('cross-validation'):
+        cv_metrics = model.cross_validate(X_train, y_train, n_jobs=cv_jobs)
+        # Reap the fold workers so their peak memory is reported
+        get_reusable_executor().shutdown(wait=True)
     print(f"CV RMSE Mean: {cv_metrics['cv_rmse_mean']:.4f} (+/- {cv_metrics['cv_rmse_std']:.4f})")
     
     # Feature importance
-    feature_importance = model.get_feature_importance()
+    feature_importance = model.get_feature_importance(X_test, y_test)
     if feature_importance is not None:
         print("\nFeature Importance:")
         feature_names = processor.feature_columns
@@ -60,18 +94,55 @@ def train_model():
         }).sort_values('importance', ascending=False)
         print(importance_df)
     
-    # Save model and scaler
-    os.makedirs(os.path.join(Config.DATA_DIR, 'models'), exist_ok=True)
+    # Save the model bundle: estimator, scaler parameters and feature manifest
+    os.makedirs(os.path.dirname(Config.MODEL_BUNDLE_PATH), exist_ok=True)
+    with timer.stage('save'):
+        manifest = save_bundle(
+            Config.MODEL_BUNDLE_PATH, model, processor,
+            metrics=dict(metrics, **cv_metrics),
+            data_hash=artifact_digest(store.path, length=64),
+            export_arrays=export_arrays,
+            export_onnx=export_onnx
+        )
+    print(f"\nModel bundle saved to {Config.MODEL_BUNDLE_PATH} ({len(manifest['checksums'])} files)")
     
-    model_path = Config.MODEL_PATH
-    scaler_path = Config.SCALER_PATH
+    if legacy_artifacts:
+        os.makedirs(os.path.dirname(Config.MODEL_PATH), exist_ok=True)
+        model.save(Config.MODEL_PATH)
+        joblib.dump(processor.scaler, Config.SCALER_PATH)
+        print(f"Model saved to {Config.MODEL_PATH}")
+        print(f"Scaler saved to {Config.SCALER_PATH}")
     
-    model.save(model_path)
-    joblib.dump(processor.scaler, scaler_path)
+        if export_arrays:
+            try:
+                model.save_arrays(Config.MODEL_ARRAYS_PATH)
+                print(f"Memory-mappable model arrays saved to {Config.MODEL_ARRAYS_PATH}")
+            except ValueError as e:
+                print(f"Skipping array export: {str(e)}")
     
-    print(f"\nModel saved to {model_path}")
-    print(f"Scaler saved to {scaler_path}")
+    print("\n" + timer.report())
     print("\nTraining complete!")
 
 if __name__ == '__main__':
-    train_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the yield prediction model')
+    parser.add_argument('--model-type', default=None, choices=list(MODEL_CLASSES),
+                        help='Model type to train (default: random_forest, or the type in --params)')
+    parser.add_argument('--export-arrays', action='store_true',
+                        help='Also write the memory-mappable array artifact used for serving')
+    parser.add_argument('--export-onnx', action='store_true',
+                        help='Also write the ONNX graph used by the onnx inference backend (needs skl2onnx)')
+    parser.add_argument('--legacy-artifacts', action='store_true',
+                        help='Also write the separate model and scaler files used before model bundles')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Read the data in chunks instead of loading the whole table')
+    parser.add_argument('--chunksize', type=int, default=100000,
+                        help='Rows per chunk in streaming mode')
+    parser.add_argument('--cv-jobs', type=int, default=-1,
+                        help='Worker processes for cross-validation folds (-1 = all cores)')
+    parser.add_argument('--params', default=None,
+                        help='JSON file with model_type and params, as written by tune_model.py --output')
+    args = parser.parse_args()
+    train_model(export_arrays=args.export_arrays, streaming=args.streaming,
+                chunksize=args.chunksize, cv_jobs=args.cv_jobs, params_path=args.params,
+                model_type=args.model_type, legacy_artifacts=args.legacy_artifacts,
+                export_onnx=args.export_onnx)
\ No newline at end of file
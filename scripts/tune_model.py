@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.ml_model import YieldPredictor
+from app.models.data_processor import DataProcessor
+from app.services.storage import open_store
+from config.config import Config
+from scripts.benchmark_utils import time_callable
+
+# Candidate values per hyperparameter; configurations are sampled from the grid
+SEARCH_SPACE = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200, 400],
+        'max_depth': [8, 12, 15, 20, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': [1.0, 0.5, 'sqrt']
+    },
+    'gradient_boosting': {
+        'n_estimators': [100, 200, 400],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_depth': [3, 4, 5, 6],
+        'subsample': [0.8, 1.0],
+        'min_samples_leaf': [1, 5, 20]
+    },
+    'hist_gradient_boosting': {
+        'max_iter': [100, 200, 400],
+        'learning_rate': [0.05, 0.1, 0.2],
+        'max_leaf_nodes': [15, 31, 63],
+        'min_samples_leaf': [10, 20, 50],
+        'l2_regularization': [0.0, 1.0]
+    }
+}
+
+CACHE_DIR = os.path.join(Config.DATA_DIR, 'models', 'tuning_cache')
+
+# Training/validation data for the worker processes, set once per worker
+_worker_data = {}
+
+def data_hash(*arrays):
+    """Hash the exact contents of the training and validation arrays"""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()[:16]
+
+def sample_configurations(model_types, n_per_type, seed):
+    """Draw distinct random configurations from the search space"""
+    rng = np.random.RandomState(seed)
+    configurations = []
+    for model_type in model_types:
+        space = SEARCH_SPACE[model_type]
+        seen = set()
+        n_total = math.prod(len(values) for values in space.values())
+        while len(seen) < min(n_per_type, n_total):
+            params = {name: values[rng.randint(len(values))] for name, values in space.items()}
+            key = json.dumps(params, sort_keys=True)
+            if key not in seen:
+                seen.add(key)
+                configurations.append({'model_type': model_type, 'params': params})
+    return configurations
+
+class TrialCache:
+    """Completed trials stored as JSON files keyed by data hash, config and budget"""
+    
+    def __init__(self, cache_dir, data_key):
+        self.cache_dir = cache_dir
+        self.data_key = data_key
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def _path(self, configuration, budget):
+        key = json.dumps({
+            'data': self.data_key,
+            'model_type': configuration['model_type'],
+            'params': configuration['params'],
+            'budget': budget
+        }, sort_keys=True)
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest() + '.json')
+    
+    def get(self, configuration, budget):
+        path = self._path(configuration, budget)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+    
+    def put(self, configuration, budget, result):
+        # Write then rename so an interrupted search never leaves a partial entry
+        path = self._path(configuration, budget)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(result, f)
+        os.replace(path + '.tmp', path)
+
+def _init_worker(X_train, y_train, X_val, y_val):
+    _worker_data.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+
+def run_trial(configuration, budget):
+    """Train one configuration on the first budget rows and measure accuracy and latency"""
+    X_train, y_train = _worker_data['X_train'][:budget], _worker_data['y_train'][:budget]
+    X_val, y_val = _worker_data['X_val'], _worker_data['y_val']
+    
+    # One process per trial, so each fit stays single-threaded
+    params = dict(configuration['params'])
+    if configuration['model_type'] == 'random_forest':
+        params['n_jobs'] = 1
+    model = YieldPredictor(configuration['model_type'], params=params)
+    
+    start = time.perf_counter()
+    metrics = model.train(X_train, y_train, X_val, y_val)
+    train_seconds = time.perf_counter() - start
+    
+    model.configure_serving()
+    row = X_val[:1]
+    latency = time_callable(lambda: model.predict(row), warmup=5, repeat=100)
+    
+    return {
+        'model_type': configuration['model_type'],
+        'params': configuration['params'],
+        'budget': budget,
+        'rmse': float(metrics['rmse']),
+        'r2': float(metrics['r2_score']),
+        'train_seconds': train_seconds,
+        'latency_p50_us': latency['p50_us'],
+        'latency_p99_us': latency['p99_us']
+    }
+
+def successive_halving(configurations, X_train, y_train, X_val, y_val, min_budget, eta=3, jobs=None,
+                       cache=None):
+    """Evaluate configurations on growing sample budgets, keeping the best 1/eta at each rung"""
+    max_budget = len(X_train)
+    n_rungs = max(1, int(math.log(max(max_budget / min_budget, 1), eta)) + 1)
+    survivors = list(configurations)
+    history = []
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(X_train, y_train, X_val, y_val)) as executor:
+        for rung in range(n_rungs):
+            budget = max_budget if rung == n_rungs - 1 else int(min_budget * eta ** rung)
+            
+            results = [cache.get(configuration, budget) if cache else None for configuration in survivors]
+            pending = [i for i, result in enumerate(results) if result is None]
+            futures = {i: executor.submit(run_trial, survivors[i], budget) for i in pending}
+            for i, future in futures.items():
+                results[i] = future.result()
+                if cache:
+                    cache.put(survivors[i], budget, results[i])
+            
+            print(f"Rung {rung}: {len(survivors)} configurations on {budget} samples "
+                  f"({len(survivors) - len(pending)} cached)")
+            history.extend(results)
+            
+            ranked = sorted(range(len(results)), key=lambda i: results[i]['rmse'])
+            n_keep = max(1, len(survivors) // eta)
+            if rung < n_rungs - 1:
+                survivors = [survivors[i] for i in ranked[:n_keep]]
+    
+    return history
+
+def pareto_front(results):
+    """Indices of results not beaten on both RMSE and p50 latency"""
+    front = []
+    for i, a in enumerate(results):
+        dominated = any(
+            b['rmse'] <= a['rmse'] and b['latency_p50_us'] <= a['latency_p50_us'] and
+            (b['rmse'] < a['rmse'] or b['latency_p50_us'] < a['latency_p50_us'])
+            for b in results
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+def tune_model(model_types, n_configurations=12, min_budget=1000, eta=3, jobs=None, seed=42,
+               output=None, use_cache=True):
+    """Search hyperparameters for the yield prediction model"""
+    processor = DataProcessor()
+    data_path = os.path.join(Config.DATA_DIR, 'raw', 'sample_data.csv')
+    store = open_store(data_path, Config.COLUMNAR_DATA_PATH)
+    print(f"Loading data from {store.path}")
+    X, y = processor.preprocess(store.read(), fit=True)
+    X_train, X_val, y_train, y_val = processor.split_data(X, y)
+    y_train, y_val = np.asarray(y_train), np.asarray(y_val)
+    print(f"Training set: {len(X_train)} samples, validation set: {len(X_val)} samples")
+    
+    cache = TrialCache(CACHE_DIR, data_hash(X_train, y_train, X_val, y_val)) if use_cache else None
+    configurations = sample_configurations(model_types, n_configurations, seed)
+    history = successive_halving(configurations, X_train, y_train, X_val, y_val,
+                                 min_budget=min(min_budget, len(X_train)), eta=eta, jobs=jobs, cache=cache)
+    
+    # Each configuration is reported at the largest budget it reached
+    final = {}
+    for result in history:
+        key = json.dumps([result['model_type'], result['params']], sort_keys=True)
+        if key not in final or result['budget'] > final[key]['budget']:
+            final[key] = result
+    candidates = sorted(final.values(), key=lambda r: (-r['budget'], r['rmse']))
+    # Accuracy is only comparable between candidates trained on the same budget
+    front = set()
+    for budget in {r['budget'] for r in candidates}:
+        group = [i for i, r in enumerate(candidates) if r['budget'] == budget]
+        front.update(group[j] for j in pareto_front([candidates[i] for i in group]))
+    
+    print("\n" + "=" * 100)
+    print("ACCURACY VS SINGLE-ROW LATENCY")
+    print("=" * 100)
+    print(f"{'model':<18} {'samples':>8} {'rmse':>8} {'r2':>7} {'p50 us':>9} {'p99 us':>9} {'fit s':>7}  params")
+    for i, result in enumerate(candidates):
+        marker = '*' if i in front else ' '
+        print(f"{result['model_type']:<18} {result['budget']:>8} {result['rmse']:>8.4f} {result['r2']:>7.4f} "
+              f"{result['latency_p50_us']:>9.1f} {result['latency_p99_us']:>9.1f} "
+              f"{result['train_seconds']:>7.2f} {marker}{json.dumps(result['params'], sort_keys=True)}")
+    print("* = Pareto-optimal (RMSE vs p50 latency) among configurations with the same sample budget")
+    
+    best = candidates[0]
+    print(f"\nBest: {best['model_type']} {json.dumps(best['params'], sort_keys=True)} (RMSE {best['rmse']:.4f})")
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'model_type': best['model_type'], 'params': best['params']}, f, indent=2)
+        print(f"Best parameters saved to {output} (use with train_model.py --params)")
+    
+    return candidates
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tune model hyperparameters with successive halving')
+    parser.add_argument('--model-types', nargs='+', default=list(SEARCH_SPACE),
+                        choices=list(SEARCH_SPACE), help='Model types to search')
+    parser.add_argument('--configurations', type=int, default=12,
+                        help='Configurations sampled per model type')
+    parser.add_argument('--min-samples', type=int, default=1000,
+                        help='Training samples used in the first rung')
+    parser.add_argument('--eta', type=int, default=3,
+                        help='Keep the best 1/eta configurations at each rung')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None,
+                        help='Write the best configuration as JSON')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignore and do not write the trial cache')
+    args = parser.parse_args()
+    tune_model(args.model_types, n_configurations=args.configurations, min_budget=args.min_samples,
+               eta=args.eta, jobs=args.jobs, seed=args.seed, output=args.output,
+               use_cache=not args.no_cache)
\ No newline at end of file
@@ -1,6 +1,19 @@
+import os
 import unittest
 import json
+import asyncio
+import tempfile
+from unittest import mock
 from app import create_app
+from app.routes import api
+from app.services.model_registry import model_registry
+from app.services.micro_batch import PredictionBatcher
+from tests.test_services import make_trained_service
+
+try:
+    from asgi import BatchingApp
+except ImportError:  # asgiref is only needed for ASGI serving
+    BatchingApp = None
 
 class TestAPI(unittest.TestCase):
     
@@ -14,6 +27,7 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertEqual(data['status'], 'healthy')
+        self.assertIn('model_version', data)
     
     def test_predict_missing_fields(self):
         """Test prediction with missing fields"""
@@ -21,10 +35,180 @@ class TestAPI(unittest.TestCase):
                                    json={'temperature_avg': 25})
         self.assertEqual(response.status_code, 400)
     
+    def test_predict_rejects_out_of_range_values(self):
+        """Test prediction with a physically impossible value"""
+        record = {field: 10 for field in ['temperature_avg', 'rainfall_mm', 'humidity_percent', 'soil_ph',
+                                          'soil_nitrogen', 'soil_phosphorus', 'soil_potassium',
+                                          'fertilizer_used_kg', 'irrigation_hours', 'area_hectares']}
+        response = self.client.post('/api/predict', json=dict(record, soil_ph=20))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('soil_ph', json.loads(response.data)['error'])
+    
+    def test_huge_integers_are_invalid_values(self):
+        """Test an integer too large for a float is a 400 naming the field, and the row in a batch"""
+        service, records = make_trained_service(50)
+        record = json.dumps(records[0]).replace('"soil_ph": ', '"soil_ph": 1' + '0' * 400 + ', "_": ', 1)
+        
+        response = self.client.post('/api/predict', data=record, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['error'], 'Invalid value for field: soil_ph')
+        
+        with mock.patch.object(model_registry, '_prediction_service', service):
+            response = self.client.post('/api/predict/batch', data=f'[{json.dumps(records[1])}, {record}]',
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['succeeded'], 1)
+        self.assertEqual(data['errors'], [{'index': 1, 'error': 'Invalid value for field: soil_ph'}])
+    
+    def test_predict_batch_requires_records(self):
+        """Test batch prediction rejects an empty payload"""
+        response = self.client.post('/api/predict/batch', json={'records': []})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_predict_batch_rejects_malformed_json(self):
+        """Test batch prediction answers an unparseable body with 400"""
+        response = self.client.post('/api/predict/batch', data='{"records": [', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non-empty list of records', json.loads(response.data)['error'])
+    
+    def test_predict_stream_returns_ndjson(self):
+        """Test the streaming endpoint answers each line with NDJSON"""
+        response = self.client.post('/api/predict/stream', data=b'{not json\n\n[1, 2]\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.splitlines()]
+        self.assertEqual(lines[0], {'index': 0, 'error': 'Invalid JSON'})
+    
+    def test_historical_rejects_negative_limit(self):
+        """Test historical data rejects invalid paging parameters"""
+        response = self.client.get('/api/historical?limit=-1')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.get('/api/historical?cursor=12345')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_jobs_reject_empty_payload_and_unknown_ids(self):
+        """Test job submission validation and lookup of unknown jobs"""
+        response = self.client.post('/api/jobs', json={'records': []})
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.get('/api/jobs/does-not-exist')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_admin_reload_requires_token(self):
+        """Test the reload endpoint is disabled without a configured token and checks it otherwise"""
+        response = self.client.post('/api/admin/reload')
+        self.assertEqual(response.status_code, 403)
+        
+        self.app.config['ADMIN_TOKEN'] = 'secret'
+        response = self.client.post('/api/admin/reload', headers={'X-Admin-Token': 'wrong'})
+        self.assertEqual(response.status_code, 403)
+    
+    def test_metrics_endpoint(self):
+        """Test request metrics are exposed in Prometheus text format"""
+        self.client.get('/api/health')
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'agri_http_requests_total{endpoint="/api/health",method="GET",status="200"}', response.data)
+    
     def test_statistics_endpoint(self):
         """Test statistics endpoint"""
         response = self.client.get('/api/statistics')
         self.assertEqual(response.status_code, 200)
 
+    def test_statistics_of_a_single_record(self):
+        """Test one data row reports no standard deviation instead of invalid JSON"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, 'raw'))
+            with open(os.path.join(tmpdir, 'raw', 'sample_data.csv'), 'w') as f:
+                f.write('soil_ph,yield_tons_per_hectare\n6.5,4.2\n')
+            with mock.patch.object(api.data_service, 'data_dir', tmpdir), \
+                    mock.patch.object(api.data_service, 'columnar_path', os.path.join(tmpdir, 'missing')):
+                response = self.client.get('/api/statistics')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'NaN', response.data)
+        data = json.loads(response.data)['data']
+        self.assertEqual((data['total_records'], data['average_yield'], data['std_yield']), (1, 4.2, None))
+
+async def _asgi_request(app, method, path, body=b'', headers=()):
+    """Send one HTTP request through an ASGI app and return (status, parsed JSON body)"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+    
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+             'headers': [(b'content-type', b'application/json')] + list(headers),
+             'server': ('testserver', 80), 'client': ('127.0.0.1', 1234)}
+    await app(scope, receive, send)
+    body = b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+    return sent[0]['status'], json.loads(body)
+
+@unittest.skipUnless(BatchingApp is not None, 'asgiref is optional')
+class TestBatchingApp(unittest.TestCase):
+    
+    def setUp(self):
+        self.service, self.records = make_trained_service()
+        self.service.cache = None
+        self.app = create_app('development')
+        self.batcher = PredictionBatcher(service_provider=lambda: self.service)
+        self.asgi_app = BatchingApp(self.app, self.batcher)
+        self.batcher.window, self.batcher.max_size = 0.05, 8
+    
+    def tearDown(self):
+        self.batcher.close()
+    
+    def test_concurrent_predictions_are_batched(self):
+        """Test concurrent /api/predict calls share model calls and get the single-prediction answers"""
+        async def run():
+            requests = [_asgi_request(self.asgi_app, 'POST', '/api/predict', json.dumps(record).encode())
+                        for record in self.records[:20]]
+            return await asyncio.gather(*requests)
+        
+        responses = asyncio.run(run())
+        
+        # 8 requests fill the first batch; the 12 arriving while it is scored form the second
+        self.assertEqual(self.batcher.stats()['batches'], 2)
+        for (status, payload), record in zip(responses, self.records):
+            self.assertEqual(status, 200)
+            self.assertEqual(payload, {'success': True, 'data': self.service.predict_yield(record)})
+    
+    def test_errors_and_other_routes_keep_the_flask_contract(self):
+        """Test validation errors match the Flask endpoint and other routes are served by Flask"""
+        client = self.app.test_client()
+        for body in [json.dumps({'temperature_avg': 25}).encode(), b'{not json']:
+            status, payload = asyncio.run(_asgi_request(self.asgi_app, 'POST', '/api/predict', body))
+            response = client.post('/api/predict', data=body, content_type='application/json')
+            self.assertEqual((status, payload), (response.status_code, json.loads(response.data)))
+        
+        status, payload = asyncio.run(_asgi_request(self.asgi_app, 'GET', '/api/health'))
+        self.assertEqual((status, payload['status']), (200, 'healthy'))
+    
+    def test_numeric_strings_match_the_flask_endpoint(self):
+        """Test batched records with numeric strings get the same body as the Flask endpoint"""
+        records = [dict(record, soil_ph='5', rainfall_mm='400') for record in self.records[:3]] + self.records[3:6]
+        
+        async def run():
+            return await asyncio.gather(*[
+                _asgi_request(self.asgi_app, 'POST', '/api/predict', json.dumps(record).encode()) for record in records
+            ])
+        
+        responses = asyncio.run(run())
+        
+        client = self.app.test_client()
+        with mock.patch.object(model_registry, '_prediction_service', self.service):
+            for (status, payload), record in zip(responses, records):
+                response = client.post('/api/predict', json=record)
+                self.assertEqual((status, payload), (response.status_code, json.loads(response.data)))
+        messages = [item['message'] for item in responses[0][1]['data']['recommendations']]
+        self.assertIn('Soil pH (5.0) is outside optimal range (6.0-7.5). Consider soil amendment.', messages)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,7 +1,15 @@
 import unittest
+import os
+import tempfile
 import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+from app.models.flat_forest import FlatForest
 from app.models.ml_model import YieldPredictor
 from app.models.data_processor import DataProcessor
+from app.models.schema import FeatureSchema, ValidationError
+from app.models.bundle import ONNX_NAME, load_bundle, save_bundle
+from app.models.onnx_model import OnnxPredictor, onnx_export_available, onnx_runtime_available
 
 class TestYieldPredictor(unittest.TestCase):
     
@@ -14,6 +22,16 @@ class TestYieldPredictor(unittest.TestCase):
         self.assertIsNotNone(self.model.model)
         self.assertFalse(self.model.is_trained)
     
+    def test_params_override_defaults(self):
+        """Test tuned parameters override only the given defaults"""
+        model = YieldPredictor('gradient_boosting', params={'n_estimators': 10, 'subsample': 0.8})
+        params = model.model.get_params()
+        
+        self.assertEqual((params['n_estimators'], params['subsample']), (10, 0.8))
+        self.assertEqual((params['max_depth'], params['random_state']), (5, 42))
+        with self.assertRaises(ValueError):
+            YieldPredictor('linear')
+    
     def test_data_processor(self):
         """Test data processor"""
         # Create sample data
@@ -37,5 +55,395 @@ class TestYieldPredictor(unittest.TestCase):
         
         self.assertEqual(len(predictions), 10)
 
+    def test_serving_mode_parallel_predictions(self):
+        """Test serving mode runs single-threaded and chunks large batches"""
+        X_train = np.random.rand(100, 12)
+        y_train = np.random.rand(100)
+        self.model.model.set_params(n_estimators=10)
+        self.model.train(X_train, y_train)
+        
+        X_test = np.random.rand(50, 12)
+        expected = self.model.predict(X_test)
+        
+        self.model.configure_serving(max_threads=3, parallel_min_rows=20)
+        self.assertEqual(self.model.model.n_jobs, 1)
+        np.testing.assert_allclose(self.model.predict(X_test), expected)
+        np.testing.assert_allclose(self.model.predict(X_test[:5]), expected[:5])
+    
+    def test_hist_gradient_boosting(self):
+        """Test the histogram booster trains, reports importances and round-trips"""
+        rng = np.random.RandomState(3)
+        X_train = rng.rand(300, 12)
+        y_train = 3 * X_train[:, 0] + rng.rand(300) * 0.1
+        model = YieldPredictor('hist_gradient_boosting', params={'max_iter': 20})
+        model.train(X_train, y_train)
+        
+        importance = model.get_feature_importance(X_train, y_train)
+        self.assertEqual(len(importance), 12)
+        self.assertEqual(int(np.argmax(importance)), 0)
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'model.pkl')
+            model.save(path)
+            loaded = YieldPredictor('hist_gradient_boosting')
+            loaded.load(path, serving=True)
+            np.testing.assert_array_equal(loaded.predict(X_train[:10]), model.predict(X_train[:10]))
+        
+        with self.assertRaises(ValueError):
+            model.compile()
+
+class TestFlatForest(unittest.TestCase):
+    
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        self.X_train = rng.rand(200, 12)
+        self.y_train = rng.rand(200)
+        self.X_test = rng.rand(50, 12)
+    
+    def test_matches_sklearn_predictions(self):
+        """Test flattened forests predict the same as their source estimators"""
+        model = YieldPredictor()
+        model.model.set_params(n_estimators=20)
+        model.train(self.X_train, self.y_train)
+        
+        boosting = GradientBoostingRegressor(n_estimators=20).fit(self.X_train, self.y_train)
+        
+        for estimator in [model.model, boosting]:
+            flat = FlatForest.from_estimator(estimator)
+            np.testing.assert_allclose(flat.predict(self.X_test), estimator.predict(self.X_test))
+    
+    def test_compiled_predictor_routes_small_batches(self):
+        """Test a compiled YieldPredictor matches sklearn on both sides of the routing threshold"""
+        model = YieldPredictor()
+        model.model.set_params(n_estimators=20)
+        model.train(self.X_train, self.y_train)
+        expected = model.model.predict(self.X_test)
+        
+        model.compile(max_rows=10)
+        self.assertIsNotNone(model.evaluator)
+        np.testing.assert_allclose(model.predict(self.X_test[:5]), expected[:5])
+        np.testing.assert_allclose(model.predict(self.X_test), expected)
+    
+    def test_memory_mapped_round_trip(self):
+        """Test an array artifact loads memory-mapped and predicts identically"""
+        model = YieldPredictor()
+        model.model.set_params(n_estimators=20)
+        model.train(self.X_train, self.y_train)
+        expected = model.predict(self.X_test)
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dirpath = os.path.join(tmpdir, 'arrays')
+            model.save_arrays(dirpath)
+            
+            loaded = YieldPredictor()
+            loaded.load(dirpath, serving=True)
+            self.assertIsInstance(loaded.model, FlatForest)
+            np.testing.assert_allclose(loaded.predict(self.X_test), expected)
+            del loaded
+
+class TestPredictionIntervals(unittest.TestCase):
+    
+    def setUp(self):
+        rng = np.random.RandomState(4)
+        self.X_train = rng.rand(300, 12)
+        self.y_train = 3 * self.X_train[:, 0] + rng.normal(0, 0.2, 300)
+        self.X_test = rng.rand(40, 12)
+        self.y_test = 3 * self.X_test[:, 0] + rng.normal(0, 0.2, 40)
+    
+    def test_forest_intervals_are_per_tree_quantiles(self):
+        """Test forest intervals match quantiles of the individual tree outputs on every path"""
+        model = YieldPredictor()
+        model.model.set_params(n_estimators=20, n_jobs=1)
+        model.train(self.X_train, self.y_train)
+        tree_outputs = np.column_stack([tree.predict(self.X_test) for tree in model.model.estimators_])
+        expected = np.quantile(tree_outputs, [0.05, 0.95], axis=1)
+        
+        predictions, lower, upper, method = model.predict_interval(self.X_test, coverage=0.9)
+        self.assertEqual(method, 'tree_quantiles')
+        np.testing.assert_allclose(predictions, model.predict(self.X_test))
+        np.testing.assert_allclose([lower, upper], expected)
+        
+        model.compile(max_rows=10)
+        _, lower, upper, _ = model.predict_interval(self.X_test[:5], coverage=0.9)
+        np.testing.assert_allclose([lower, upper], expected[:, :5])
+    
+    def test_conformal_intervals_round_trip(self):
+        """Test boosting models fall back to the calibrated residual table, saved with the model"""
+        model = YieldPredictor('gradient_boosting', params={'n_estimators': 20})
+        model.train(self.X_train, self.y_train)
+        self.assertEqual(model.predict_interval(self.X_test)[3], 'heuristic')
+        
+        model.train(self.X_train, self.y_train, self.X_test, self.y_test)
+        predictions, lower, upper, method = model.predict_interval(self.X_test, coverage=0.9)
+        
+        self.assertEqual(method, 'conformal')
+        half_width = np.interp(0.9, model.calibration['levels'], model.calibration['half_widths'])
+        np.testing.assert_allclose(upper - predictions, half_width)
+        self.assertGreaterEqual(np.mean(np.abs(self.y_test - predictions) <= half_width), 0.9)
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'model.pkl')
+            model.save(path)
+            loaded = YieldPredictor('gradient_boosting')
+            loaded.load(path)
+            self.assertEqual(loaded.calibration, model.calibration)
+
+class TestModelBundle(unittest.TestCase):
+    
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        self.processor = DataProcessor()
+        df = pd.DataFrame(rng.uniform(1, 14, (120, len(self.processor.input_columns))),
+                          columns=self.processor.input_columns)
+        df['yield_tons_per_hectare'] = df['soil_nitrogen'] * 0.3 + rng.normal(0, 0.1, len(df))
+        X, y = self.processor.preprocess(df, fit=True)
+        self.model = YieldPredictor(params={'n_estimators': 10, 'n_jobs': 1})
+        self.model.train(X[:100], y[:100], X[100:], y[100:])
+        self.records = df.drop(columns=['yield_tons_per_hectare']).to_dict('records')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'bundle')
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_round_trip_builds_compiled_processor(self):
+        """Test a bundle reloads the model, calibration and a compiled processor that score identically"""
+        save_bundle(self.path, self.model, self.processor, metrics={'rmse': 0.5}, data_hash='abc')
+        model, processor, manifest = load_bundle(self.path)
+        
+        self.assertIsInstance(model.model, FlatForest)
+        self.assertTrue(processor.is_compiled)
+        self.assertEqual(processor.feature_columns, self.processor.feature_columns)
+        self.assertEqual((manifest['metrics'], manifest['data_hash']), ({'rmse': 0.5}, 'abc'))
+        self.assertEqual(model.version, manifest['version'])
+        self.assertEqual(model.calibration, self.model.calibration)
+        
+        X = np.vstack([self.processor.prepare_input(record) for record in self.records[:20]])
+        X_bundle = np.vstack([processor.prepare_input(record) for record in self.records[:20]])
+        np.testing.assert_allclose(X_bundle, X)
+        np.testing.assert_allclose(model.predict(X_bundle), self.model.predict(X))
+        
+        # The pandas path works with the rebuilt scaler too
+        df = pd.DataFrame(self.records[:20])
+        np.testing.assert_allclose(processor.preprocess(df, fit=False)[0], X)
+    
+    def test_large_batches_use_the_estimator_behind_the_arrays(self):
+        """Test arrays score small batches and larger ones go to the bundle's checked estimator"""
+        save_bundle(self.path, self.model, self.processor)
+        model, processor, _ = load_bundle(self.path, arrays_max_rows=10)
+        X = processor.prepare_batch(processor.records_to_matrix(self.records)[0])
+        
+        self.assertIs(model._batch_model(10), model.model)
+        self.assertIsInstance(model._batch_model(11), type(self.model.model))
+        np.testing.assert_allclose(model.predict(X[:10]), self.model.predict(X[:10]))
+        
+        predictions, lower, upper, _ = model.predict_interval(X)
+        expected = self.model.predict_interval(X)
+        np.testing.assert_allclose(predictions, expected[0])
+        np.testing.assert_allclose(np.c_[lower, upper], np.c_[expected[1], expected[2]])
+        
+        with open(os.path.join(self.path, 'model.pkl'), 'ab') as f:
+            f.write(b'x')
+        with self.assertRaises(ValueError):
+            load_bundle(self.path, arrays_max_rows=10)
+    
+    def test_replacing_a_bundle_keeps_loaded_models_serving(self):
+        """Test saves switch a link to a new version while models loaded from older ones keep scoring"""
+        save_bundle(self.path, self.model, self.processor)
+        # A bundle written as a plain directory is migrated on the next save
+        legacy = load_bundle(self.path)[2]['path']
+        os.remove(self.path)
+        os.rename(legacy, self.path)
+        
+        model, processor, _ = load_bundle(self.path, arrays_max_rows=10)
+        X = processor.prepare_batch(processor.records_to_matrix(self.records)[0])
+        expected = model.predict(X)
+        for i in range(3):
+            save_bundle(self.path, self.model, self.processor, data_hash=str(i))
+        
+        # Only the current and the previous version are kept
+        self.assertTrue(os.path.islink(self.path))
+        self.assertEqual(load_bundle(self.path)[2]['data_hash'], '2')
+        self.assertEqual(len([name for name in os.listdir(self.tmpdir.name) if name.startswith('bundle.v-')]), 2)
+        np.testing.assert_allclose(model.predict(X), expected)
+    
+    def test_tampered_or_mismatched_bundles_are_rejected(self):
+        """Test checksums and the feature manifest are validated on load"""
+        manifest = save_bundle(self.path, self.model, self.processor, export_arrays=False)
+        self.assertEqual(list(manifest['checksums']), ['model.pkl'])
+        
+        with open(os.path.join(self.path, 'model.pkl'), 'ab') as f:
+            f.write(b'x')
+        with self.assertRaises(ValueError):
+            load_bundle(self.path)
+        
+        features = dict(manifest['features'], feature_columns=manifest['features']['feature_columns'][::-1])
+        with self.assertRaises(ValueError):
+            DataProcessor.from_manifest(features, manifest['scaler'])
+        with self.assertRaises(ValueError):
+            DataProcessor.from_manifest(manifest['features'], dict(manifest['scaler'], mean=[0.0]))
+
+@unittest.skipUnless(onnx_export_available() and onnx_runtime_available(), 'skl2onnx and onnxruntime are optional')
+class TestOnnxExport(unittest.TestCase):
+    
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        self.processor = DataProcessor()
+        df = pd.DataFrame(rng.uniform(1, 14, (300, len(self.processor.input_columns))),
+                          columns=self.processor.input_columns)
+        df['yield_tons_per_hectare'] = (df['soil_nitrogen'] * 0.3 + df['temperature_avg'] * df['rainfall_mm'] * 0.01
+                                        + rng.normal(0, 0.1, len(df)))
+        self.X, self.y = self.processor.preprocess(df, fit=True)
+        self.X_raw = df[self.processor.input_columns].to_numpy()
+        self.tmpdir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def _export(self, model):
+        path = os.path.join(self.tmpdir.name, 'model.onnx')
+        model.export_onnx(path, self.processor)
+        return OnnxPredictor(path, calibration=model.calibration)
+    
+    def test_forest_graph_matches_sklearn_path(self):
+        """Test the exported forest scores raw inputs like preprocessing plus sklearn, intervals included"""
+        model = YieldPredictor(params={'n_estimators': 20, 'n_jobs': 1})
+        model.train(self.X[:250], self.y[:250], self.X[250:], self.y[250:])
+        onnx_model = self._export(model)
+        
+        expected = model.predict_interval(self.X, 0.8)
+        actual = onnx_model.predict_interval(self.X_raw, 0.8)
+        self.assertEqual(actual[3], 'tree_quantiles')
+        for expected_values, actual_values in zip(expected[:3], actual[:3]):
+            np.testing.assert_allclose(actual_values, expected_values, rtol=1e-5, atol=1e-5)
+        np.testing.assert_allclose(onnx_model.predict(self.X_raw[:1]), model.predict(self.X[:1]), rtol=1e-5)
+    
+    def test_boosting_graph_uses_conformal_intervals(self):
+        """Test a gradient boosting graph matches sklearn and keeps the calibrated intervals"""
+        model = YieldPredictor('gradient_boosting', params={'n_estimators': 30})
+        model.train(self.X[:250], self.y[:250], self.X[250:], self.y[250:])
+        onnx_model = self._export(model)
+        
+        expected = model.predict_interval(self.X)
+        actual = onnx_model.predict_interval(self.X_raw)
+        self.assertEqual((actual[3], expected[3]), ('conformal', 'conformal'))
+        for expected_values, actual_values in zip(expected[:3], actual[:3]):
+            np.testing.assert_allclose(actual_values, expected_values, rtol=1e-4, atol=1e-4)
+    
+    def test_bundle_includes_verified_graph(self):
+        """Test save_bundle writes the graph under the manifest checksums"""
+        model = YieldPredictor(params={'n_estimators': 5, 'n_jobs': 1})
+        model.train(self.X, self.y)
+        path = os.path.join(self.tmpdir.name, 'bundle')
+        manifest = save_bundle(path, model, self.processor, export_arrays=False, export_onnx=True)
+        self.assertIn(ONNX_NAME, manifest['checksums'])
+        load_bundle(path, verify_onnx=True)
+        
+        with open(os.path.join(path, ONNX_NAME), 'ab') as f:
+            f.write(b'x')
+        load_bundle(path)
+        with self.assertRaises(ValueError):
+            load_bundle(path, verify_onnx=True)
+
+class TestDataProcessor(unittest.TestCase):
+    
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.processor = DataProcessor()
+        self.df = pd.DataFrame(
+            rng.uniform(1, 14, (50, len(self.processor.input_columns))),
+            columns=self.processor.input_columns
+        )
+        self.processor.preprocess(self.df.copy(), fit=True)
+    
+    def test_compiled_prepare_input_is_bit_identical(self):
+        """Test the compiled inference path matches the pandas path exactly"""
+        records = self.df.to_dict('records')
+        expected = [self.processor.prepare_input(record) for record in records]
+        
+        self.processor.compile()
+        for record, X_expected in zip(records, expected):
+            np.testing.assert_array_equal(self.processor.prepare_input(record), X_expected)
+    
+    def test_prepare_batch_matches_prepare_input(self):
+        """Test batch preparation matches single-row preparation"""
+        records = self.df.to_dict('records')
+        expected = np.vstack([self.processor.prepare_input(record) for record in records])
+        
+        self.processor.compile()
+        X_raw, valid, errors, _ = self.processor.records_to_matrix(records)
+        self.assertTrue(valid.all())
+        np.testing.assert_array_equal(self.processor.prepare_batch(X_raw), expected)
+
+    def test_streamed_preprocessing_matches_in_memory(self):
+        """Test chunked preprocessing matches preprocess, including missing values"""
+        df = self.df.copy()
+        df['yield_tons_per_hectare'] = np.arange(len(df), dtype=float)
+        df.iloc[3, 0] = np.nan
+        df.iloc[40, 5] = np.nan
+        
+        expected_X, expected_y = DataProcessor().preprocess(df.copy(), fit=True)
+        
+        processor = DataProcessor()
+        X, y = processor.preprocess_batches(lambda: (df.iloc[i:i + 7] for i in range(0, len(df), 7)))
+        
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_allclose(X, expected_X, rtol=1e-5, atol=1e-5)
+        np.testing.assert_array_equal(y, expected_y.to_numpy())
+
+class TestFeatureSchema(unittest.TestCase):
+    
+    def setUp(self):
+        self.schema = FeatureSchema.from_processor(DataProcessor())
+        self.record = {
+            'temperature_avg': 25, 'rainfall_mm': 800.0, 'humidity_percent': 65,
+            'soil_ph': '6.5', 'soil_nitrogen': 20, 'soil_phosphorus': 15, 'soil_potassium': 18,
+            'fertilizer_used_kg': 100, 'irrigation_hours': 200, 'area_hectares': 5
+        }
+    
+    def test_validate_record_coerces_numeric_strings(self):
+        """Test numbers pass through unchanged and numeric strings become floats"""
+        clean = self.schema.validate_record(dict(self.record, extra='ignored'))
+        self.assertEqual(list(clean), self.schema.fields)
+        self.assertEqual(clean['soil_ph'], 6.5)
+        self.assertIs(type(clean['temperature_avg']), int)
+    
+    def test_validate_record_reports_first_error(self):
+        """Test missing, non-numeric and out-of-range values raise precise errors"""
+        cases = [
+            ([], 'Record must be a JSON object'),
+            (dict(self.record, rainfall_mm=None), 'Missing required field: rainfall_mm'),
+            (dict(self.record, soil_ph='acidic'), 'Invalid value for field: soil_ph'),
+            (dict(self.record, soil_ph=True), 'Invalid value for field: soil_ph'),
+            (dict(self.record, soil_ph='nan'), 'Invalid value for field: soil_ph'),
+            (dict(self.record, humidity_percent=120), 'Value out of range for field: humidity_percent (expected 0 to 100)')
+        ]
+        for record, message in cases:
+            with self.assertRaises(ValidationError) as context:
+                self.schema.validate_record(record)
+            self.assertEqual(str(context.exception), message)
+    
+    def test_validate_batch_matches_validate_record(self):
+        """Test the vectorized batch check reports the same errors and fields as single records"""
+        records = [
+            self.record, 'oops', dict(self.record, soil_ph=15), dict(self.record, rainfall_mm=None),
+            dict(self.record, area_hectares=False), dict(self.record, temperature_avg='warm', soil_ph=15),
+            dict(self.record, soil_ph='5', rainfall_mm=' 800.5')
+        ]
+        X, valid, errors, validated = self.schema.validate_batch(records)
+        
+        for i, record in enumerate(records):
+            try:
+                clean = self.schema.validate_record(record)
+            except ValidationError as e:
+                self.assertFalse(valid[i])
+                self.assertEqual(errors[i], str(e))
+            else:
+                self.assertTrue(valid[i])
+                np.testing.assert_array_equal(X[i], [float(clean[field]) for field in self.schema.fields])
+                self.assertEqual(validated[i], clean)
+                self.assertEqual([type(value) for value in validated[i].values()],
+                                 [type(value) for value in clean.values()])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
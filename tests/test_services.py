@@ -0,0 +1,651 @@
+import os
+import io
+import json
+import time
+import threading
+import asyncio
+import multiprocessing
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from app.models.ml_model import YieldPredictor
+from app.models.data_processor import DataProcessor
+from app.models.onnx_model import OnnxPredictor, onnx_export_available, onnx_runtime_available
+from app.services.prediction_service import PredictionService
+from app.services.model_registry import SMOKE_RECORD, ModelRegistry
+from app.services.prediction_cache import PredictionCache
+from app.services.recommendations import DEFAULT_RULES, RecommendationEngine
+from app.services.shadow import ShadowScorer
+from app.services.job_queue import JobQueue
+from app.services.micro_batch import PredictionBatcher
+from app.services.metrics import Metrics
+from app.services.statistics_cache import FileStatisticsCache
+from app.services.csv_tail import read_csv_tail
+from app.services.storage import CsvStore, columnar_available, convert_csv, open_store
+
+def make_trained_service(n_samples=200):
+    """Build a PredictionService backed by a small model trained on random data"""
+    rng = np.random.RandomState(0)
+    processor = DataProcessor()
+    df = pd.DataFrame({
+        'temperature_avg': rng.uniform(15, 35, n_samples),
+        'rainfall_mm': rng.uniform(300, 1500, n_samples),
+        'humidity_percent': rng.uniform(40, 90, n_samples),
+        'soil_ph': rng.uniform(5.5, 8.0, n_samples),
+        'soil_nitrogen': rng.uniform(10, 40, n_samples),
+        'soil_phosphorus': rng.uniform(5, 30, n_samples),
+        'soil_potassium': rng.uniform(10, 35, n_samples),
+        'fertilizer_used_kg': rng.uniform(50, 200, n_samples),
+        'irrigation_hours': rng.uniform(100, 400, n_samples),
+        'area_hectares': rng.uniform(1, 20, n_samples)
+    })
+    df['yield_tons_per_hectare'] = 0.1 * df['soil_nitrogen'] + 0.002 * df['rainfall_mm'] + rng.normal(0, 0.3, n_samples)
+    X, y = processor.preprocess(df, fit=True)
+    processor.compile()
+    
+    model = YieldPredictor()
+    model.model.set_params(n_estimators=10, n_jobs=1)
+    model.train(X, y)
+    
+    service = PredictionService(model=model, processor=processor, model_version='test')
+    
+    records = df.drop(columns=['yield_tons_per_hectare']).to_dict('records')
+    return service, records
+
+class TestPredictionService(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.service, cls.records = make_trained_service()
+    
+    def test_batch_matches_single_predictions(self):
+        """Test batch scoring returns the same results as single predictions"""
+        records = self.records[:20]
+        records[3] = dict(records[3], soil_ph=5.0, rainfall_mm=400)
+        records[4] = dict(records[4], soil_ph='5', rainfall_mm='400')
+        
+        result = self.service.predict_batch(records)
+        
+        self.assertEqual(result['succeeded'], 20)
+        for item in result['predictions']:
+            expected = self.service.predict_yield(records[item['index']])
+            self.assertEqual({k: v for k, v in item.items() if k != 'index'}, expected)
+    
+    @unittest.skipUnless(onnx_export_available() and onnx_runtime_available(), 'skl2onnx and onnxruntime are optional')
+    def test_onnx_backend_matches_sklearn_backend(self):
+        """Test single and batch predictions through the ONNX graph match the sklearn path"""
+        service, records = make_trained_service()
+        service.cache = None
+        expected = service.predict_batch(records[:20])
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'model.onnx')
+            service.model.export_onnx(path, service.processor)
+            service.onnx_model = OnnxPredictor(path)
+            result = service.predict_batch(records[:20])
+            single = service.predict_yield(records[0])
+        
+        for actual, wanted in zip(result['predictions'] + [dict(single, index=0)], expected['predictions']):
+            self.assertAlmostEqual(actual['predicted_yield'], wanted['predicted_yield'], delta=0.011)
+            self.assertEqual(actual['confidence_interval']['method'], 'tree_quantiles')
+    
+    def test_batch_reports_errors_by_index(self):
+        """Test invalid records are reported by index and the rest are scored"""
+        records = [dict(r) for r in self.records[:4]]
+        del records[1]['soil_ph']
+        records[2]['rainfall_mm'] = 'a lot'
+        records[3] = 'not a record'
+        
+        result = self.service.predict_batch(records)
+        
+        self.assertEqual([p['index'] for p in result['predictions']], [0])
+        self.assertEqual(result['errors'], [
+            {'index': 1, 'error': 'Missing required field: soil_ph'},
+            {'index': 2, 'error': 'Invalid value for field: rainfall_mm'},
+            {'index': 3, 'error': 'Record must be a JSON object'}
+        ])
+    
+    def test_stream_scores_in_order_across_micro_batches(self):
+        """Test NDJSON streaming keeps input order and reports bad lines by index"""
+        records = self.records[:5]
+        lines = [json.dumps(records[0]).encode(), b'', b'{not json', json.dumps(records[1]).encode(),
+                 b'"a string"'] + [json.dumps(record).encode() + b'\n' for record in records[2:]]
+        
+        results = list(self.service.predict_stream(iter(lines), batch_size=2))
+        
+        self.assertEqual([item['index'] for item in results], list(range(7)))
+        self.assertEqual(results[1], {'index': 1, 'error': 'Invalid JSON'})
+        self.assertEqual(results[3], {'index': 3, 'error': 'Record must be a JSON object'})
+        for position, record in zip([0, 2, 4, 5, 6], records):
+            self.assertEqual({k: v for k, v in results[position].items() if k != 'index'},
+                             self.service.predict_yield(record))
+        
+        too_long = list(self.service.predict_stream(iter([b'x' * 50]), max_line_bytes=10))
+        self.assertEqual(too_long, [{'index': 0, 'error': 'Line exceeds 10 bytes'}])
+
+def legacy_recommendations(input_data, predicted_yield):
+    """The hard-coded rules the rule table replaced"""
+    recommendations = []
+    if input_data['rainfall_mm'] < 500:
+        recommendations.append({'type': 'irrigation', 'priority': 'high',
+                                'message': 'Low rainfall detected. Increase irrigation to maintain optimal soil moisture.'})
+    if input_data['soil_nitrogen'] + input_data['soil_phosphorus'] + input_data['soil_potassium'] < 50:
+        recommendations.append({'type': 'fertilizer', 'priority': 'high',
+                                'message': 'Soil nutrient levels are low. Consider applying balanced NPK fertilizer.'})
+    if input_data['soil_ph'] < 6.0 or input_data['soil_ph'] > 7.5:
+        recommendations.append({'type': 'soil_management', 'priority': 'medium',
+                                'message': f'Soil pH ({input_data["soil_ph"]}) is outside optimal range (6.0-7.5). Consider soil amendment.'})
+    if predicted_yield < 3.0:
+        recommendations.append({'type': 'yield_optimization', 'priority': 'medium',
+                                'message': 'Predicted yield is below average. Review crop management practices and consider soil testing.'})
+    return recommendations
+
+class TestRecommendationEngine(unittest.TestCase):
+    
+    def setUp(self):
+        self.columns = DataProcessor().input_columns
+        self.engine = RecommendationEngine(self.columns)
+        rng = np.random.RandomState(3)
+        self.records = pd.DataFrame({
+            column: rng.uniform(0, 1000 if column == 'rainfall_mm' else 30, 200) for column in self.columns
+        }).assign(soil_ph=rng.uniform(5, 8.5, 200).round(1)).to_dict('records')
+        self.records.append(dict(self.records[0], soil_ph=5))
+        self.predictions = rng.uniform(1, 5, len(self.records))
+    
+    def test_rule_table_matches_legacy_rules(self):
+        """Test single and batch evaluation reproduce the original hard-coded rules"""
+        X_raw = np.array([[record[column] for column in self.columns] for record in self.records])
+        batch = self.engine.evaluate_batch(self.records, X_raw, self.predictions)
+        
+        for record, prediction, batch_recommendations in zip(self.records, self.predictions, batch):
+            expected = legacy_recommendations(record, prediction)
+            self.assertEqual(self.engine.evaluate(record, prediction), expected)
+            self.assertEqual(batch_recommendations, expected)
+        messages = [item['message'] for item in batch[-1] if item['type'] == 'soil_management']
+        self.assertEqual(messages[0][:12], 'Soil pH (5) ')
+    
+    def test_rules_load_from_json(self):
+        """Test thresholds can be changed through a rules file"""
+        rules = [dict(rule) for rule in DEFAULT_RULES]
+        rules[0]['below'] = 2000
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'rules.json')
+            with open(path, 'w') as f:
+                json.dump({'rules': rules}, f)
+            engine = RecommendationEngine.load(self.columns, path)
+        
+        record = dict(self.records[0], rainfall_mm=1500, soil_ph=6.5)
+        self.assertEqual(engine.evaluate(record, 4.0)[0]['type'], 'irrigation')
+        with self.assertRaises(Exception):
+            RecommendationEngine(self.columns, [dict(DEFAULT_RULES[0], feature='wind_speed')])
+
+class TestPredictionCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.now = 0.0
+        self.cache = PredictionCache(max_size=2, ttl_seconds=10, clock=lambda: self.now)
+    
+    def test_equivalent_inputs_share_a_key(self):
+        """Test keys are built from canonical float values and the model version"""
+        columns = ['a', 'b']
+        key = self.cache.make_key('v1', {'a': 25, 'b': '1.0'}, columns)
+        
+        self.assertEqual(key, self.cache.make_key('v1', {'a': 25.0000000001, 'b': 1}, columns))
+        self.assertNotEqual(key, self.cache.make_key('v2', {'a': 25, 'b': 1}, columns))
+        self.assertIsNone(self.cache.make_key(None, {'a': 25, 'b': 1}, columns))
+        self.assertIsNone(self.cache.make_key('v1', {'a': 25}, columns))
+    
+    def test_lru_eviction_and_ttl(self):
+        """Test the least recently used entry is evicted and stale entries expire"""
+        self.cache.put('a', 1.0)
+        self.cache.put('b', 2.0)
+        self.assertEqual(self.cache.get('a'), 1.0)
+        self.cache.put('c', 3.0)
+        
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3.0)
+        
+        self.now = 10.0
+        self.assertIsNone(self.cache.get('a'))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['evictions'], stats['expirations']), (2, 1, 1))
+    
+    def test_service_answers_repeats_from_cache(self):
+        """Test repeated predictions hit the cache and return identical results"""
+        service, records = make_trained_service()
+        
+        first = service.predict_yield(records[0])
+        second = service.predict_yield(dict(records[0]))
+        
+        self.assertEqual(first, second)
+        self.assertEqual(service.cache_stats()['hits'], 1)
+
+class TestShadowScorer(unittest.TestCase):
+    
+    def test_shadow_compares_sampled_calls_without_changing_results(self):
+        """Test sampled single and batch calls are scored by the shadow and responses are unchanged"""
+        service, records = make_trained_service()
+        shadow_service, _ = make_trained_service(100)
+        expected = service.predict_batch(records[:20])
+        
+        service.shadow = ShadowScorer(shadow_service.model, shadow_service.processor, version='candidate',
+                                      sample_rate=1.0)
+        self.assertEqual(service.predict_batch(records[:20]), expected)
+        for record in records[20:25]:
+            service.predict_yield(record)
+        service.shadow.close(wait=True)
+        
+        stats = service.shadow_stats()
+        self.assertEqual((stats['sampled'], stats['scored'], stats['dropped'], stats['failed']), (6, 6, 0, 0))
+        self.assertEqual(stats['rows'], 25)
+        self.assertEqual(stats['latency_seconds']['shadow']['count'], 6)
+        X_raw = service.processor.records_to_matrix(records[:25])[0]
+        delta = (shadow_service.model.predict(shadow_service.processor.prepare_batch(X_raw))
+                 - service.model.predict(service.processor.prepare_batch(X_raw)))
+        self.assertAlmostEqual(stats['delta']['mean'], delta.mean())
+        self.assertAlmostEqual(stats['abs_delta']['max'], np.abs(delta).max())
+    
+    def test_work_is_dropped_when_the_queue_is_full(self):
+        """Test calls beyond the pending limit are dropped instead of waiting for the shadow"""
+        service, records = make_trained_service(50)
+        release = threading.Event()
+        
+        class _SlowModel:
+            def predict_interval(self, X, coverage):
+                release.wait(10)
+                return service.model.predict_interval(X, coverage)
+        
+        shadow = ShadowScorer(_SlowModel(), service.processor, sample_rate=1.0, queue_size=1)
+        X_raw = service.processor.records_to_matrix(records[:1])[0]
+        results = [shadow.submit(X_raw, np.zeros(1), 0.001) for _ in range(5)]
+        release.set()
+        shadow.close(wait=True)
+        
+        self.assertEqual(results, [True, False, False, False, False])
+        stats = shadow.stats()
+        self.assertEqual((stats['sampled'], stats['scored'], stats['dropped']), (5, 1, 4))
+        self.assertFalse(shadow.submit(X_raw, np.zeros(1), 0.001))
+
+class _Upload:
+    """Minimal stand-in for an uploaded file"""
+    
+    def __init__(self, content):
+        self.content = content
+    
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.content)
+
+class TestJobQueue(unittest.TestCase):
+    
+    def setUp(self):
+        self.service, self.records = make_trained_service()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(service_provider=lambda: self.service)
+        self.queue.configure(self.tmpdir.name, workers=1, chunk_size=7)
+    
+    def tearDown(self):
+        self.queue.close()
+        self.tmpdir.cleanup()
+    
+    def wait_for(self, job_id, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.queue.get(job_id, limit=1000)
+            if job['status'] in ('completed', 'failed'):
+                return job
+            time.sleep(0.05)
+        self.fail(f"Job {job_id} did not finish")
+    
+    def test_records_job_matches_batch_scoring(self):
+        """Test a chunked job returns the same results as one batch call, in order"""
+        records = [dict(r) for r in self.records[:20]]
+        del records[9]['soil_ph']
+        
+        job = self.wait_for(self.queue.submit_records(records))
+        expected = self.service.predict_batch(records)
+        
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['processed'], job['succeeded'], job['failed']), (20, 19, 1))
+        self.assertEqual(job['results'], sorted(expected['predictions'] + expected['errors'],
+                                                key=lambda item: item['index']))
+        self.assertIsNone(job['next_offset'])
+        
+        page = self.queue.get(job['id'], offset=5, limit=3)
+        self.assertEqual([item['index'] for item in page['results']], [5, 6, 7])
+        self.assertEqual(page['next_offset'], 8)
+    
+    def test_csv_job_treats_empty_cells_as_missing(self):
+        """Test CSV uploads are counted and scored with per-row errors"""
+        df = pd.DataFrame(self.records[:10])
+        df.loc[4, 'rainfall_mm'] = np.nan
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False)
+        
+        job = self.wait_for(self.queue.submit_csv(_Upload(buffer.getvalue())))
+        
+        self.assertEqual((job['total'], job['succeeded'], job['failed']), (10, 9, 1))
+        self.assertEqual(job['results'][4], {'index': 4, 'error': 'Missing required field: rainfall_mm'})
+
+    def submit_elsewhere(self, records):
+        """Queue a job from another process' queue that never runs it"""
+        previous = JobQueue(service_provider=lambda: self.service)
+        previous.configure(self.tmpdir.name)
+        with mock.patch.object(previous, 'start'), mock.patch.object(previous, '_schedule'):
+            return previous.submit_records(records)
+    
+    def test_pending_jobs_resume_when_the_queue_starts(self):
+        """Test jobs queued before a restart run once a process starts its pool, without a new submission"""
+        job_id = self.submit_elsewhere(self.records[:5])
+        self.assertEqual(self.queue.get(job_id)['status'], 'queued')
+        
+        self.queue.start()
+        
+        self.assertEqual(self.wait_for(job_id)['succeeded'], 5)
+    
+    def test_jobs_going_stale_after_start_are_resumed(self):
+        """Test a job whose worker dies after this pool started is picked up by the periodic rescan"""
+        self.queue.configure(self.tmpdir.name, workers=1, chunk_size=7, stale_seconds=1, recovery_interval=0.1)
+        self.queue.start()
+        
+        job_id = self.submit_elsewhere(self.records[:5])
+        with self.queue._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), job_id))
+        time.sleep(0.3)
+        self.assertEqual(self.queue.get(job_id)['status'], 'running')
+        
+        self.assertEqual(self.wait_for(job_id)['succeeded'], 5)
+
+class _BlockingService:
+    """predict_many stub that records batch sizes and holds the first batch until released"""
+    
+    def __init__(self):
+        self.sizes = []
+        self.release = threading.Event()
+    
+    def predict_many(self, records):
+        self.sizes.append(len(records))
+        self.release.wait(10)
+        return [{'index': record['index']} for record in records]
+
+class TestPredictionBatcher(unittest.TestCase):
+    
+    def test_requests_arriving_during_scoring_form_one_batch(self):
+        """Test requests that arrive while a batch is scored are scored together once it returns"""
+        service = _BlockingService()
+        batcher = PredictionBatcher(window_ms=1, max_size=4, service_provider=lambda: service)
+        
+        async def run():
+            first = asyncio.ensure_future(batcher.predict({'index': 0}))
+            await asyncio.sleep(0.05)
+            # Longer than the window and more than max_size requests while the first batch is held
+            rest = [asyncio.ensure_future(batcher.predict({'index': i})) for i in range(1, 7)]
+            await asyncio.sleep(0.05)
+            service.release.set()
+            return await asyncio.gather(first, *rest)
+        
+        results = asyncio.run(run())
+        batcher.close()
+        
+        self.assertEqual(service.sizes, [1, 6])
+        self.assertEqual(results, [{'index': i} for i in range(7)])
+        self.assertEqual(batcher.stats()['batches'], 2)
+
+class TestMetrics(unittest.TestCase):
+    
+    def test_histogram_buckets_and_exposition(self):
+        """Test observations land in cumulative le buckets with sum and count"""
+        metrics = Metrics()
+        for value in (0.00005, 0.001, 0.001, 20.0):
+            metrics.observe('agri_prediction_stage_seconds', value, stage='predict')
+        metrics.inc('agri_http_requests_total', endpoint='/api/predict', method='POST', status='200')
+        
+        text = metrics.render()
+        
+        self.assertIn('# TYPE agri_prediction_stage_seconds histogram', text)
+        self.assertIn('agri_prediction_stage_seconds_bucket{stage="predict",le="0.0001"} 1', text)
+        self.assertIn('agri_prediction_stage_seconds_bucket{stage="predict",le="0.001"} 3', text)
+        self.assertIn('agri_prediction_stage_seconds_bucket{stage="predict",le="+Inf"} 4', text)
+        self.assertIn('agri_prediction_stage_seconds_count{stage="predict"} 4', text)
+        self.assertIn('agri_http_requests_total{endpoint="/api/predict",method="POST",status="200"} 1', text)
+    
+    def test_values_are_aggregated_across_processes(self):
+        """Test snapshots written by other worker processes are summed"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            metrics = Metrics(tmpdir, flush_seconds=0.01)
+            metrics.inc('agri_http_requests_total', endpoint='/api/health', method='GET', status='200')
+            
+            def serve_requests():
+                metrics.inc('agri_http_requests_total', 2, endpoint='/api/health', method='GET', status='200')
+                metrics.flush()
+            
+            worker = multiprocessing.get_context('fork').Process(target=serve_requests)
+            worker.start()
+            worker.join()
+            
+            # The forked worker starts from a copy of this process' values
+            self.assertIn('agri_http_requests_total{endpoint="/api/health",method="GET",status="200"} 4',
+                          metrics.render())
+
+class TestModelRegistry(unittest.TestCase):
+    
+    def test_prediction_service_is_loaded_once(self):
+        """Test the registry loads lazily and hands out a single shared service"""
+        registry = ModelRegistry()
+        self.assertFalse(registry.is_loaded)
+        
+        service = registry.prediction_service
+        self.assertTrue(registry.is_loaded)
+        self.assertIs(registry.prediction_service, service)
+
+    def test_reload_swaps_service_after_smoke_test(self):
+        """Test reload swaps in a new service, leaves the old one usable and rejects broken models"""
+        registry = ModelRegistry(service_factory=lambda: make_trained_service(50)[0], paths=lambda: [])
+        old_service = registry.prediction_service
+        
+        registry.reload()
+        self.assertIsNot(registry.prediction_service, old_service)
+        self.assertEqual(registry.model_version, 'test')
+        self.assertEqual(old_service.predict_batch([SMOKE_RECORD])['succeeded'], 1)
+        
+        current = registry.prediction_service
+        untrained, _ = make_trained_service(50)
+        untrained.model = YieldPredictor()
+        registry._service_factory = lambda: untrained
+        with self.assertRaises(Exception):
+            registry.reload()
+        self.assertIs(registry.prediction_service, current)
+    
+    def test_reload_stops_the_replaced_model_thread_pool(self):
+        """Test the replaced model's serving threads exit and it keeps scoring large batches without them"""
+        def factory():
+            service, _ = make_trained_service(50)
+            service.model.configure_serving(max_threads=2, parallel_min_rows=10)
+            return service
+        
+        registry = ModelRegistry(service_factory=factory, paths=lambda: [])
+        old_service = registry.prediction_service
+        records = make_trained_service(50)[1][:20]
+        expected = old_service.predict_batch(records)
+        executor = old_service.model._executor
+        self.assertTrue(executor._threads)
+        
+        registry.reload()
+        for thread in executor._threads:
+            thread.join(5)
+        self.assertFalse(any(thread.is_alive() for thread in executor._threads))
+        self.assertEqual(old_service.predict_batch(records), expected)
+    
+    def test_watcher_reloads_once_artifacts_settle(self):
+        """Test changed artifacts are reloaded only after they stay unchanged for a check"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'model.pkl')
+            with open(path, 'w') as f:
+                f.write('v1')
+            loads = []
+            registry = ModelRegistry(service_factory=lambda: loads.append(1) or make_trained_service(50)[0],
+                                     paths=lambda: [path])
+            registry.load()
+            self.assertFalse(registry.check_for_changes())
+            
+            with open(path, 'w') as f:
+                f.write('version 2')
+            self.assertFalse(registry.check_for_changes())
+            self.assertTrue(registry.check_for_changes())
+            self.assertEqual(len(loads), 2)
+            self.assertFalse(registry.check_for_changes())
+
+class TestStatisticsCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, 'data.csv')
+        self.rng = np.random.RandomState(3)
+        self.cache = FileStatisticsCache(chunksize=7)
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def _frame(self, n):
+        return pd.DataFrame({'a': self.rng.rand(n), 'yield_tons_per_hectare': self.rng.rand(n) * 5})
+    
+    def _assert_matches_full_read(self):
+        total_records, stats = self.cache.get(self.filepath, 'yield_tons_per_hectare')
+        df = pd.read_csv(self.filepath)
+        column = df['yield_tons_per_hectare']
+        self.assertEqual(total_records, len(df))
+        self.assertAlmostEqual(stats.mean, column.mean())
+        self.assertAlmostEqual(stats.std, column.std())
+        self.assertEqual(stats.min, column.min())
+        self.assertEqual(stats.max, column.max())
+    
+    def test_appended_rows_are_folded_in(self):
+        """Test statistics stay exact across appends and rewrites"""
+        df = self._frame(30)
+        df.to_csv(self.filepath, index=False)
+        self._assert_matches_full_read()
+        
+        appended = self._frame(12)
+        appended.to_csv(self.filepath, mode='a', header=False, index=False)
+        self._assert_matches_full_read()
+        
+        rewritten = self._frame(5)
+        rewritten.to_csv(self.filepath, index=False)
+        self._assert_matches_full_read()
+
+    def test_partly_written_line_is_folded_once_complete(self):
+        """Test an append caught mid-line only counts the line once the writer finishes it"""
+        self._frame(30).to_csv(self.filepath, index=False)
+        self._assert_matches_full_read()
+        
+        line = self._frame(1).to_csv(header=False, index=False)
+        with open(self.filepath, 'a') as f:
+            f.write(self._frame(3).to_csv(header=False, index=False) + line[:5])
+        total_records, _ = self.cache.get(self.filepath, 'yield_tons_per_hectare')
+        self.assertEqual(total_records, 33)
+        
+        with open(self.filepath, 'a') as f:
+            f.write(line[5:])
+        self._assert_matches_full_read()
+
+class TestCsvTail(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, 'data.csv')
+        rng = np.random.RandomState(4)
+        pd.DataFrame({'a': rng.rand(57), 'b': np.arange(57)}).to_csv(self.filepath, index=False)
+        self.df = pd.read_csv(self.filepath)
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_tail_matches_full_read(self):
+        """Test tail reads match DataFrame.tail with offsets and projection"""
+        for limit, offset in [(1, 0), (10, 0), (10, 5), (57, 0), (100, 0), (5, 55)]:
+            df, _ = read_csv_tail(self.filepath, limit, offset=offset)
+            expected = self.df.iloc[max(0, 57 - offset - limit):57 - offset]
+            self.assertEqual(df.to_dict('records'), expected.to_dict('records'))
+        
+        df, _ = read_csv_tail(self.filepath, 3, columns=['b'])
+        self.assertEqual(list(df.columns), ['b'])
+        self.assertEqual(df['b'].tolist(), [54, 55, 56])
+    
+    def test_cursor_walks_whole_history(self):
+        """Test following next_cursor returns every row exactly once"""
+        pages, cursor = [], None
+        while True:
+            df, cursor = read_csv_tail(self.filepath, 10, cursor=cursor)
+            pages.insert(0, df)
+            if cursor is None:
+                break
+        
+        self.assertEqual(len(pages), 6)
+        self.assertEqual(pd.concat(pages)['b'].tolist(), list(range(57)))
+
+@unittest.skipUnless(columnar_available(), 'pyarrow is not installed')
+class TestColumnarStorage(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmpdir.name, 'data.csv')
+        rng = np.random.RandomState(5)
+        pd.DataFrame({'a': rng.rand(95), 'b': np.arange(95)}).to_csv(self.csv_path, index=False)
+        self.df = pd.read_csv(self.csv_path)
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_columnar_stores_match_csv(self):
+        """Test Parquet and Feather copies read, filter and page like the CSV"""
+        for extension in ['parquet', 'feather']:
+            store = convert_csv(self.csv_path, os.path.join(self.tmpdir.name, f'data.{extension}'), chunksize=20)
+            
+            pd.testing.assert_frame_equal(store.read(), self.df)
+            self.assertEqual(store.read(columns=['b'], filters=[('b', '>=', 90)])['b'].tolist(), [90, 91, 92, 93, 94])
+            
+            df, cursor = store.tail(10, offset=2, columns=['b'])
+            self.assertEqual(df['b'].tolist(), list(range(83, 93)))
+            df, cursor = store.tail(10, cursor=cursor)
+            self.assertEqual(df['b'].tolist(), list(range(73, 83)))
+    
+    def test_open_store_prefers_fresh_columnar_copy(self):
+        """Test the columnar copy is used when present and not older than the CSV"""
+        parquet_path = os.path.join(self.tmpdir.name, 'data.parquet')
+        self.assertIsInstance(open_store(self.csv_path, parquet_path), CsvStore)
+        
+        convert_csv(self.csv_path, parquet_path)
+        self.assertEqual(open_store(self.csv_path, parquet_path).format, 'parquet')
+        
+        csv_mtime = os.path.getmtime(parquet_path) + 10
+        os.utime(self.csv_path, (csv_mtime, csv_mtime))
+        self.assertIsInstance(open_store(self.csv_path, parquet_path), CsvStore)
+
+    def test_cursors_are_rejected_by_other_files(self):
+        """Test a cursor only pages the file it came from, surviving CSV appends but not a store switch"""
+        parquet_path = os.path.join(self.tmpdir.name, 'data.parquet')
+        csv_store = CsvStore(self.csv_path)
+        _, csv_cursor = csv_store.tail(10)
+        parquet_store = convert_csv(self.csv_path, parquet_path)
+        _, parquet_cursor = parquet_store.tail(10)
+        
+        with self.assertRaises(ValueError):
+            parquet_store.tail(10, cursor=csv_cursor)
+        with self.assertRaises(ValueError):
+            csv_store.tail(10, cursor=parquet_cursor)
+        with self.assertRaises(ValueError):
+            csv_store.tail(10, cursor='12')
+        
+        with open(self.csv_path, 'a') as f:
+            f.write('0.5,95\n')
+        df, _ = csv_store.tail(10, cursor=csv_cursor)
+        self.assertEqual(df['b'].tolist(), list(range(75, 85)))
+        
+        convert_csv(self.csv_path, parquet_path)
+        with self.assertRaises(ValueError):
+            parquet_store.tail(10, cursor=parquet_cursor)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file